@@ -0,0 +1,270 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 3, An index of points for nearest-neighbor and radius queries
+
+Finding the waypoints within 5 NM of an anchorage with
+:func:`Chapter_03.ch03_r08.haversine` means computing the distance to
+every waypoint.
+
+A :class:`GeoIndex` puts the points into a grid of ``cell_size`` degree
+cells, and sorts them by cell; building the index is a sort, so it's
+O(n log n). The cells of one row of the grid are adjacent in the sorted
+order, so the points in a range of longitudes are one slice, found by
+bisection. A radius query examines only the points in the rows and
+longitude ranges of the bounding box of the circle. A k-nearest query
+is a radius query, with the radius doubled until there are k points
+inside it.
+
+Distances are in the units of ``R``: :data:`NM`, :data:`MI`, or :data:`KM`.
+The index refers to the points by their position in the original sequence.
+It can be saved to a file and loaded again.
+"""
+import argparse
+import bisect
+import random
+import struct
+import sys
+import time
+from array import array
+from math import asin, cos, degrees, pi, radians, sin
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from Chapter_03.ch03_r08 import KM, MI, NM, haversine
+
+MAGIC = b"GEOIDX1\n"
+HEADER = struct.Struct("<dQ")
+
+Found = Tuple[float, int]
+
+
+def lat_lon(point: Any) -> Tuple[float, float]:
+    """For ``Point`` records, with ``lat`` and ``lon`` attributes."""
+    return point.lat, point.lon
+
+
+class GeoIndex:
+    def __init__(
+        self, lat: Sequence[float], lon: Sequence[float], cell_size: float = 0.25
+    ) -> None:
+        self.cell_size = cell_size
+        self.rows = int(180 / cell_size) + 1
+        self.columns = int(360 / cell_size) + 1
+        keys = [self.key(p_lat, p_lon) for p_lat, p_lon in zip(lat, lon)]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = array("q", (keys[i] for i in order))
+        self.lat = array("d", (lat[i] for i in order))
+        self.lon = array("d", (lon[i] for i in order))
+        self.positions = array("Q", order)
+
+    @classmethod
+    def from_points(
+        cls,
+        points: Iterable[Any],
+        coordinates: Callable[[Any], Tuple[float, float]] = lat_lon,
+        cell_size: float = 0.25,
+    ) -> "GeoIndex":
+        """
+        ``coordinates`` extracts ``(lat, lon)`` from each point; for a
+        ``Chapter_10.ch10_r04.Waypoint``, it's ``attrgetter("lat_lon")``.
+        """
+        pairs = [coordinates(point) for point in points]
+        return cls([p[0] for p in pairs], [p[1] for p in pairs], cell_size)
+
+    def arrays(self) -> Tuple[array, ...]:
+        return self.keys, self.lat, self.lon, self.positions
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def row(self, lat: float) -> int:
+        return min(int((lat + 90) / self.cell_size), self.rows - 1)
+
+    def column(self, lon: float) -> int:
+        return int(((lon + 180) % 360) / self.cell_size)
+
+    def key(self, lat: float, lon: float) -> int:
+        return self.row(lat) * self.columns + self.column(lon)
+
+    def cell_slices(
+        self, lat: float, lon: float, angle: float
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        The ranges of positions in the sorted arrays which hold all the
+        points within ``angle`` radians of ``(lat, lon)``.
+        """
+        φ = radians(lat)
+        south, north = degrees(φ - angle), degrees(φ + angle)
+        if south <= -90 or north >= 90 or angle >= pi / 2:
+            # A pole is inside the circle: every longitude.
+            west, east = -180.0, 180.0
+        else:
+            Δλ = degrees(asin(min(1.0, sin(angle) / cos(φ))))
+            west, east = lon - Δλ, lon + Δλ
+        if east - west >= 360 - self.cell_size:
+            spans = [(0, self.columns - 1)]
+        else:
+            first, last = self.column(west), self.column(east)
+            if first <= last:
+                spans = [(first, last)]
+            else:
+                spans = [(first, self.columns - 1), (0, last)]
+        for row in range(self.row(max(south, -90)), self.row(min(north, 90)) + 1):
+            base = row * self.columns
+            for first, last in spans:
+                yield (
+                    bisect.bisect_left(self.keys, base + first),
+                    bisect.bisect_right(self.keys, base + last),
+                )
+
+    def _within(self, lat: float, lon: float, radius: float, R: float) -> List[Found]:
+        found = []
+        p_lat, p_lon = self.lat, self.lon
+        for start, stop in self.cell_slices(lat, lon, radius / R):
+            for i in range(start, stop):
+                d = haversine(lat, lon, p_lat[i], p_lon[i], R=R)
+                if d <= radius:
+                    found.append((d, i))
+        return found
+
+    def within(self, lat: float, lon: float, radius: float, R: float = NM) -> List[Found]:
+        """
+        The ``(distance, position)`` of each point within ``radius`` of
+        ``(lat, lon)``, nearest first.
+        """
+        return sorted(
+            (d, self.positions[i]) for d, i in self._within(lat, lon, radius, R)
+        )
+
+    def nearest(self, lat: float, lon: float, k: int = 1, R: float = NM) -> List[Found]:
+        """The ``(distance, position)`` of the ``k`` nearest points."""
+        angle = radians(self.cell_size)
+        while True:
+            found = self._within(lat, lon, angle * R, R)
+            if len(found) >= k or angle >= pi:
+                found.sort()
+                return [(d, self.positions[i]) for d, i in found[:k]]
+            angle *= 2
+
+    def save(self, path: Path) -> None:
+        with path.open("wb") as target:
+            target.write(MAGIC)
+            target.write(HEADER.pack(self.cell_size, len(self)))
+            for column in self.arrays():
+                if sys.byteorder == "big":
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                column.tofile(target)
+
+    @classmethod
+    def load(cls, path: Path) -> "GeoIndex":
+        with path.open("rb") as source:
+            if source.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a GeoIndex")
+            cell_size, count = HEADER.unpack(source.read(HEADER.size))
+            index = cls([], [], cell_size)
+            for column in index.arrays():
+                column.fromfile(source, count)
+                if sys.byteorder == "big":
+                    column.byteswap()
+        return index
+
+
+test_queries = """
+>>> from Chapter_07.ch07_r11 import Point
+>>> points = [
+...     Point(32.8321666666667, -79.9338333333333),  # Charleston
+...     Point(31.6714833333333, -80.93325),
+...     Point(30.7171666666667, -81.5525),
+...     Point(32.8400, -79.9000),
+...     Point(32.7500, -79.8700),
+... ]
+>>> index = GeoIndex.from_points(points)
+>>> [(round(d, 2), i) for d, i in index.within(32.8321666666667, -79.9338333333333, 5.0)]
+[(0.0, 0), (1.77, 3)]
+>>> [(round(d, 2), i) for d, i in index.nearest(32.0, -80.0, k=3, R=MI)]
+[(52.38, 4), (57.63, 0), (58.33, 3)]
+
+"""
+
+
+test_brute_force = """
+The queries find the same points as computing every distance.
+
+>>> rng = random.Random(42)
+>>> lat = [rng.uniform(-90, 90) for _ in range(2000)]
+>>> lon = [rng.uniform(-180, 180) for _ in range(2000)]
+>>> index = GeoIndex(lat, lon, cell_size=2.0)
+>>> centers = [(0.0, 179.9), (89.5, 10.0), (-60.0, -179.0), (45.0, 0.0)]
+>>> for center in centers:
+...     for radius, R in (300, NM), (1000, KM), (2500, MI):
+...         everything = sorted(
+...             (haversine(*center, lat[i], lon[i], R=R), i) for i in range(len(lat))
+...         )
+...         found = index.within(*center, radius, R=R)
+...         assert found == [(d, i) for d, i in everything if d <= radius], (center, radius)
+...         assert index.nearest(*center, k=7, R=R) == everything[:7], center
+>>> len(index.nearest(0.0, 0.0, k=5000))
+2000
+"""
+
+test_save_load = """
+>>> import tempfile
+>>> from operator import attrgetter
+>>> from Chapter_10.ch10_r04 import Waypoint, RawRow
+>>> waypoints = [
+...     Waypoint(RawRow("2012-11-27", "09:15:00", "32.8321666666667", "-79.9338333333333")),
+...     Waypoint(RawRow("2012-11-28", "00:00:00", "31.6714833333333", "-80.93325")),
+...     Waypoint(RawRow("2012-11-28", "11:35:00", "30.7171666666667", "-81.5525")),
+... ]
+>>> index = GeoIndex.from_points(waypoints, attrgetter("lat_lon"))
+>>> with tempfile.TemporaryDirectory() as working:
+...     path = Path(working) / "waypoints.geoidx"
+...     index.save(path)
+...     loaded = GeoIndex.load(path)
+>>> [(round(d, 1), i) for d, i in loaded.nearest(31.0, -81.0, k=2, R=KM)]
+[(61.4, 2), (75.0, 1)]
+>>> list(loaded.positions) == list(index.positions) and loaded.cell_size == index.cell_size
+True
+"""
+
+
+def benchmark(count: int, queries: int, radius: float, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    lat = [rng.uniform(25, 45) for _ in range(count)]
+    lon = [rng.uniform(-85, -65) for _ in range(count)]
+    start = time.perf_counter()
+    index = GeoIndex(lat, lon)
+    build = time.perf_counter() - start
+    centers = [(rng.uniform(25, 45), rng.uniform(-85, -65)) for _ in range(queries)]
+
+    start = time.perf_counter()
+    for center in centers:
+        index.within(*center, radius)
+    indexed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for center in centers:
+        [i for i in range(count) if haversine(*center, lat[i], lon[i], R=NM) <= radius]
+    scan = time.perf_counter() - start
+    print(f"build {count:,d} points {build:.2f}s")
+    print(f"within {radius} NM: index {queries / indexed:10,.1f} queries/s, scan {queries / scan:10,.1f} queries/s")
+
+
+def get_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--points", type=int, default=1_000_000)
+    parser.add_argument("-q", "--queries", type=int, default=10)
+    parser.add_argument("-r", "--radius", type=float, default=5.0)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(argv)
+    benchmark(options.points, options.queries, options.radius)
+
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 3, Computing many haversine distances at once
+
+:func:`Chapter_03.ch03_r08.haversine` converts both points to radians and
+computes both cosines for every leg. Along a track, each point is the end
+of one leg and the start of the next, so all of that is done twice.
+
+:func:`leg_distances` converts each point once, into ``array('d')``
+buffers, and computes the distances of all the consecutive legs.
+:func:`pairwise_distances` does the same for every pair of points from two
+sets. When the coordinates are NumPy arrays, and NumPy is installed, the
+same formula is evaluated with NumPy.
+
+A track which arrives one point at a time can keep each point's
+:class:`Fix`, so that :func:`fix_distance` converts each point once, too.
+"""
+import argparse
+import random
+import time
+from array import array
+from itertools import repeat
+from math import asin, cos, radians, sin, sqrt
+from typing import Any, Iterable, List, NamedTuple, Optional, Sequence
+
+from Chapter_03.ch03_r08 import KM, MI, NM, haversine
+
+try:
+    import numpy  # type: ignore
+except ImportError:  # pragma: no cover
+    numpy = None
+
+Coordinates = Sequence[float]
+
+
+def is_ndarray(values: Any) -> bool:
+    return numpy is not None and isinstance(values, numpy.ndarray)
+
+
+def to_radians(values: Coordinates) -> array:
+    return array("d", map(radians, values))
+
+
+def _numpy_distances(
+    lat_1: Any, lon_1: Any, lat_2: Any, lon_2: Any, R: float
+) -> Any:
+    φ_1, λ_1, φ_2, λ_2 = map(numpy.radians, (lat_1, lon_1, lat_2, lon_2))
+    a = numpy.sqrt(
+        numpy.sin((φ_2 - φ_1) / 2) ** 2
+        + numpy.cos(φ_1) * numpy.cos(φ_2) * numpy.sin((λ_2 - λ_1) / 2) ** 2
+    )
+    return R * 2 * numpy.arcsin(a)
+
+
+class Fix(NamedTuple):
+    """A point in radians, with the cosine of its latitude."""
+    φ: float
+    λ: float
+    cos_φ: float
+
+
+def fix(lat: float, lon: float) -> Fix:
+    φ = radians(lat)
+    return Fix(φ, radians(lon), cos(φ))
+
+
+def fix_distance(start: Fix, end: Fix, R: float = NM) -> float:
+    """
+    The distance of one leg, the same as :func:`Chapter_03.ch03_r08.haversine`.
+
+    >>> round(fix_distance(fix(36.12, -86.67), fix(33.94, -118.40), R=NM), 2)
+    1558.53
+    """
+    return R * 2 * asin(
+        sqrt(
+            sin((end.φ - start.φ) / 2) ** 2
+            + start.cos_φ * end.cos_φ * sin((end.λ - start.λ) / 2) ** 2
+        )
+    )
+
+
+def _distances(
+    φ_1: Iterable[float], λ_1: Iterable[float], cos_1: Iterable[float],
+    φ_2: Iterable[float], λ_2: Iterable[float], cos_2: Iterable[float],
+    R: float,
+) -> array:
+    """The haversine formula, for points already in radians."""
+    diameter = R * 2
+    return array(
+        "d",
+        (
+            diameter * asin(sqrt(sin((b_φ - a_φ) / 2) ** 2 + a_cos * b_cos * sin((b_λ - a_λ) / 2) ** 2))
+            for a_φ, a_λ, a_cos, b_φ, b_λ, b_cos in zip(φ_1, λ_1, cos_1, φ_2, λ_2, cos_2)
+        ),
+    )
+
+
+def distances(
+    lat_1: Coordinates, lon_1: Coordinates, lat_2: Coordinates, lon_2: Coordinates,
+    R: float = NM,
+) -> Any:
+    """
+    The distance from each point in the first set to the matching point
+    in the second.
+
+    >>> [round(d, 2) for d in distances([36.12, 0.0], [-86.67, 0.0], [33.94, 1.0], [-118.40, 0.0], R=NM)]
+    [1558.53, 60.04]
+    """
+    if is_ndarray(lat_1):
+        return _numpy_distances(lat_1, lon_1, lat_2, lon_2, R)
+    φ_1, φ_2 = to_radians(lat_1), to_radians(lat_2)
+    return _distances(
+        φ_1, to_radians(lon_1), array("d", map(cos, φ_1)),
+        φ_2, to_radians(lon_2), array("d", map(cos, φ_2)),
+        R,
+    )
+
+
+def leg_distances(lat: Coordinates, lon: Coordinates, R: float = NM) -> Any:
+    """
+    The distances between consecutive points; one fewer than the points.
+
+    >>> legs = leg_distances([32.8321666666667, 31.6714833333333, 30.7171666666667],
+    ...                      [-79.9338333333333, -80.93325, -81.5525])
+    >>> [round(d, 4) for d in legs]
+    [86.2044, 65.5311]
+    """
+    if is_ndarray(lat):
+        return _numpy_distances(lat[:-1], lon[:-1], lat[1:], lon[1:], R)
+    φ, λ = to_radians(lat), to_radians(lon)
+    cos_φ = array("d", map(cos, φ))
+    return _distances(φ, λ, cos_φ, φ[1:], λ[1:], cos_φ[1:], R)
+
+
+def pairwise_distances(
+    lat_1: Coordinates, lon_1: Coordinates,
+    lat_2: Optional[Coordinates] = None, lon_2: Optional[Coordinates] = None,
+    R: float = NM,
+) -> Any:
+    """
+    A matrix of the distances from each point in the first set to each
+    point in the second set, or to each other point of the first set.
+    A list of rows, each an ``array('d')``; or a 2-D NumPy array.
+
+    >>> matrix = pairwise_distances([0.0, 0.0, 1.0], [0.0, 1.0, 0.0], R=NM)
+    >>> [[round(d, 2) for d in row] for row in matrix]
+    [[0.0, 60.04, 60.04], [60.04, 0.0, 84.91], [60.04, 84.91, 0.0]]
+    """
+    if lat_2 is None or lon_2 is None:
+        lat_2, lon_2 = lat_1, lon_1
+    if is_ndarray(lat_1):
+        return _numpy_distances(
+            numpy.asarray(lat_1)[:, numpy.newaxis], numpy.asarray(lon_1)[:, numpy.newaxis],
+            lat_2, lon_2, R,
+        )
+    φ_2, λ_2 = to_radians(lat_2), to_radians(lon_2)
+    cos_2 = array("d", map(cos, φ_2))
+    matrix: List[array] = []
+    for a_φ, a_λ in zip(to_radians(lat_1), to_radians(lon_1)):
+        matrix.append(
+            _distances(repeat(a_φ), repeat(a_λ), repeat(cos(a_φ)), φ_2, λ_2, cos_2, R)
+        )
+    return matrix
+
+
+test_accuracy = """
+The batch results match the scalar function, for random points and for
+very short legs, like consecutive GPS fixes.
+
+>>> rng = random.Random(42)
+>>> lat = [rng.uniform(-89, 89) for _ in range(1000)]
+>>> lon = [rng.uniform(-180, 180) for _ in range(1000)]
+>>> scalar = [haversine(lat[i], lon[i], lat[i+1], lon[i+1], R=KM) for i in range(999)]
+>>> max(abs(a - b) for a, b in zip(leg_distances(lat, lon, R=KM), scalar))
+0.0
+
+>>> fixes_lat = [32.8321666666667 + i * 1e-6 for i in range(100)]
+>>> fixes_lon = [-79.9338333333333 + i * 2e-6 for i in range(100)]
+>>> legs = leg_distances(fixes_lat, fixes_lon, R=MI)
+>>> all(
+...     abs(d - haversine(fixes_lat[i], fixes_lon[i], fixes_lat[i+1], fixes_lon[i+1], R=MI)) <= 1e-12 * d
+...     for i, d in enumerate(legs)
+... )
+True
+
+>>> matrix = pairwise_distances(lat[:20], lon[:20], lat[20:50], lon[20:50], R=NM)
+>>> len(matrix), len(matrix[0])
+(20, 30)
+>>> max(
+...     abs(matrix[i][j] - haversine(lat[i], lon[i], lat[20+j], lon[20+j], R=NM))
+...     for i in range(20) for j in range(30)
+... )
+0.0
+
+>>> fixes = [fix(a, b) for a, b in zip(lat, lon)]
+>>> [fix_distance(a, b, R=KM) for a, b in zip(fixes, fixes[1:])] == scalar
+True
+
+>>> leg_distances([1.0], [2.0])
+array('d')
+"""
+
+
+def benchmark(count: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    lat = array("d", (rng.uniform(-89, 89) for _ in range(count)))
+    lon = array("d", (rng.uniform(-180, 180) for _ in range(count)))
+
+    start = time.perf_counter()
+    scalar = [
+        haversine(lat_1, lon_1, lat_2, lon_2, R=NM)
+        for lat_1, lon_1, lat_2, lon_2 in zip(lat, lon, lat[1:], lon[1:])
+    ]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = leg_distances(lat, lon, R=NM)
+    batch_time = time.perf_counter() - start
+    assert list(batch) == scalar
+
+    print(f"scalar haversine {count / scalar_time:12,.0f} legs/s")
+    print(f"leg_distances    {count / batch_time:12,.0f} legs/s")
+
+
+def get_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--points", type=int, default=1_000_000)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(argv)
+    benchmark(options.points)
+
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,11 @@ import csv
 from pathlib import Path
 from math import radians, sin, cos, sqrt, asin
 from functools import partial
+from itertools import islice
 from pathlib import Path
+from typing import Dict, List
+
+from Chapter_03.ch03_haversine import leg_distances
 
 MI = 3959
 NM = 3440
@@ -39,19 +43,24 @@ def haversine(
 nm_haversine = partial(haversine, R=NM)
 
 
-def distances(source_path: Path = Path("data/waypoints.csv")) -> None:
+def distances(
+    source_path: Path = Path("data/waypoints.csv"), batch_size: int = 10_000
+) -> None:
     with source_path.open() as source_file:
         reader = csv.DictReader(source_file)
-        start = next(reader)  # Seed pairing with the first row
-        for point in reader:
-            d = nm_haversine(
-                float(start["lat"]),
-                float(start["lon"]),
-                float(point["lat"]),
-                float(point["lon"]),
+        # The last point of a batch starts the first leg of the next.
+        last: List[Dict[str, str]] = []
+        while batch := list(islice(reader, batch_size)):
+            points = last + batch
+            # All the legs of a batch at once; see Chapter_03.ch03_haversine.
+            legs = leg_distances(
+                [float(point["lat"]) for point in points],
+                [float(point["lon"]) for point in points],
+                R=NM,
             )
-            print(start, point, d)
-            start = point
+            for start, point, d in zip(points, points[1:], legs):
+                print(start, point, d)
+            last = points[-1:]
 
 
 def test_distance(capsys):
@@ -67,5 +76,13 @@ def test_distance(capsys):
     ]
 
 
+def test_distance_batches(capsys):
+    distances()
+    expected, _ = capsys.readouterr()
+    distances(batch_size=1)
+    out, err = capsys.readouterr()
+    assert out == expected
+
+
 if __name__ == "__main__":
     distances()
@@ -0,0 +1,191 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 5, Correlating the lines of each request, with eviction.
+
+The :func:`Chapter_05.ch05_r02.request_iter_t` and ``request_iter_d``
+generators keep the lines of a request until its ``status=`` line arrives.
+A request which never finishes is kept forever.
+
+A :class:`Correlator` keeps only a small summary of each open request: the
+first and last timestamps, the number of lines, and the ``key=value``
+parameters. Open requests are kept in order of their last activity, so
+requests idle for longer than ``ttl`` seconds, in log time, can be
+evicted from the front. The number of open requests is limited to
+``max_open``; the ``overflow`` policy decides what happens beyond that.
+
+-   ``"evict"``: the least-recently active request is evicted.
+-   ``"drop"``: lines for new requests are dropped, and counted.
+-   ``"raise"``: an ``OverflowError`` is raised.
+"""
+import collections
+import datetime
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, cast
+
+from ch05_r01 import param_parser
+from ch05_r02 import LogRec, log_parser_t
+from Chapter_09.ch09_timestamp import log_timestamp
+
+TIME_FORMAT = "%Y/%m/%d:%H:%M:%S,%f"
+
+POLICIES = ("evict", "drop", "raise")
+
+
+def parse_time(text: str) -> datetime.datetime:
+    """
+    Equivalent to ``datetime.datetime.strptime(text, TIME_FORMAT)``, with
+    the fast path of :func:`Chapter_09.ch09_timestamp.log_timestamp`.
+
+    >>> parse_time("2019/11/12:08:09:10,123")
+    datetime.datetime(2019, 11, 12, 8, 9, 10, 123000)
+    >>> parse_time("2019/11/12:08:09:10,5"), parse_time("2019/11/12:08:09:10,123456")
+    (datetime.datetime(2019, 11, 12, 8, 9, 10, 500000), datetime.datetime(2019, 11, 12, 8, 9, 10, 123456))
+    >>> parse_time("2019/11/12:08:09:10,123zzz")
+    Traceback (most recent call last):
+    ...
+    ValueError: unconverted data remains: zzz
+    """
+    return log_timestamp(text, TIME_FORMAT)
+
+
+class RequestSummary(NamedTuple):
+    id: str
+    start: datetime.datetime
+    end: datetime.datetime
+    lines: int
+    params: Dict[str, str]
+    outcome: str
+
+    @property
+    def latency(self) -> float:
+        """Seconds from the first line to the last."""
+        return (self.end - self.start).total_seconds()
+
+
+class OpenRequest:
+    __slots__ = ("id", "start", "end", "lines", "params")
+
+    def __init__(self, id: str, start: datetime.datetime) -> None:
+        self.id = id
+        self.start = self.end = start
+        self.lines = 0
+        self.params: Dict[str, str] = {}
+
+    def add(self, time: datetime.datetime, message: str) -> None:
+        self.end = time
+        self.lines += 1
+        for name, value in param_parser.findall(message):
+            self.params[name] = value.strip('"')
+
+    def summary(self, outcome: str) -> RequestSummary:
+        return RequestSummary(
+            self.id, self.start, self.end, self.lines, self.params, outcome
+        )
+
+
+class Correlator:
+    def __init__(
+        self, ttl: float = 60.0, max_open: int = 10_000, overflow: str = "evict"
+    ) -> None:
+        if overflow not in POLICIES:
+            raise ValueError(f"overflow must be one of {POLICIES}, not {overflow!r}")
+        self.ttl = datetime.timedelta(seconds=ttl)
+        self.max_open = max_open
+        self.overflow = overflow
+        self.open: "collections.OrderedDict[str, OpenRequest]" = collections.OrderedDict()
+        self.dropped = 0
+
+    def add(self, record: LogRec) -> List[RequestSummary]:
+        """
+        Add a parsed line. Return the summary of the request, if this line
+        completes it, and the summaries of any requests evicted.
+        """
+        time_text, severity, id, message = record
+        time = parse_time(time_text)
+        done = list(self.expire(time))
+        if (request := self.open.get(id)) is not None:
+            self.open.move_to_end(id)
+        else:
+            if len(self.open) >= self.max_open:
+                if self.overflow == "drop":
+                    self.dropped += 1
+                    return done
+                if self.overflow == "raise":
+                    raise OverflowError(f"more than {self.max_open} open requests")
+                _, oldest = self.open.popitem(last=False)
+                done.append(oldest.summary("evicted"))
+            request = self.open[id] = OpenRequest(id, time)
+        request.add(time, message)
+        if message.startswith("status"):
+            del self.open[id]
+            done.append(request.summary("complete"))
+        return done
+
+    def expire(self, now: datetime.datetime) -> Iterator[RequestSummary]:
+        """Evict requests with no lines for ``ttl`` before ``now``."""
+        limit = now - self.ttl
+        while self.open:
+            id, oldest = next(iter(self.open.items()))
+            if oldest.end >= limit:
+                break
+            del self.open[id]
+            yield oldest.summary("expired")
+
+    def flush(self) -> Iterator[RequestSummary]:
+        """At the end of the log, the open requests are dangling."""
+        while self.open:
+            _, request = self.open.popitem(last=False)
+            yield request.summary("dangling")
+
+
+def correlate(
+    source: Iterable[str],
+    ttl: float = 60.0,
+    max_open: int = 10_000,
+    overflow: str = "evict",
+) -> Iterator[RequestSummary]:
+    correlator = Correlator(ttl, max_open, overflow)
+    for line in source:
+        if (match := log_parser_t.match(line)) is not None:
+            match = cast(re.Match, match)  # https://github.com/python/mypy/issues/7316
+            yield from correlator.add(match.groups())
+    yield from correlator.flush()
+
+
+test_correlate = """
+>>> from ch05_r02 import log
+>>> for r in correlate(log.splitlines()):
+...     print(r.id, r.outcome, r.lines, f"{r.latency:.3f}", r.params)
+#PJQXB^eRwnEGG?2%32U complete 2 0.222 {'path': '/openapi.yaml', 'method': 'GET', 'status': '200', 'bytes': '11234'}
+9DiC!B^nXxnEGG?2%32U complete 3 0.222 {'path': '/items?limit=x', 'method': 'GET', 'error': 'invalid query', 'status': '404', 'bytes': '987'}
+>UL>PB_R>&nEGG?2%32U dangling 1 0.000 {'path': '/category/42', 'method': 'GET'}
+"""
+
+test_eviction = """
+>>> lines = [
+...     '[2019/11/12:08:09:10,000] INFO aaaa path="/a" method=GET',
+...     '[2019/11/12:08:09:11,000] INFO bbbb path="/b" method=GET',
+...     '[2019/11/12:08:09:12,000] INFO cccc path="/c" method=GET',
+...     '[2019/11/12:08:09:13,000] INFO bbbb status="200" bytes="1"',
+...     '[2019/11/12:08:10:30,000] INFO dddd path="/d" method=GET',
+... ]
+>>> [(r.id, r.outcome) for r in correlate(lines, ttl=60, max_open=2)]
+[('aaaa', 'evicted'), ('bbbb', 'complete'), ('cccc', 'expired'), ('dddd', 'dangling')]
+
+>>> correlator = Correlator(max_open=2, overflow="drop")
+>>> [correlator.add(log_parser_t.match(line).groups()) for line in lines[:3]]
+[[], [], []]
+>>> correlator.dropped, list(correlator.open)
+(1, ['aaaa', 'bbbb'])
+
+>>> list(correlate(lines, max_open=2, overflow="raise"))
+Traceback (most recent call last):
+...
+OverflowError: more than 2 open requests
+>>> Correlator(overflow="ignore")
+Traceback (most recent call last):
+...
+ValueError: overflow must be one of ('evict', 'drop', 'raise'), not 'ignore'
+"""
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
@@ -0,0 +1,245 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 7, Fingerprinting a tree of files
+
+:func:`Chapter_07.ch07_r11a.file_facts` calls ``path.stat()`` twice, and
+reads each whole file into memory for ``md5()``. The files are done one
+at a time.
+
+:func:`fingerprint` makes one ``stat()`` call, and hashes the file in
+``chunk_size`` pieces, read into one reusable buffer. ``hashlib`` releases
+the GIL while it hashes a large piece, so :func:`fingerprint_tree` can
+hash several files at once in a pool of threads. The results are
+:class:`Chapter_07.ch07_r11a.FileFacts`, in the order of the paths.
+
+A :class:`FactsCache` keeps the facts from a previous run. A file with the
+same size and modification time isn't read again. The cache is for one
+hash algorithm; ``blake2b`` and ``sha1`` are usually faster than ``md5``.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import time
+from concurrent import futures
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from Chapter_07.ch07_pool import ordered_map
+from Chapter_07.ch07_r11a import FileFacts, file_facts
+
+CHUNK_SIZE = 1 << 20
+
+ALGORITHMS = ["md5", "sha1", "sha256", "blake2b", "blake2s"]
+
+
+def fingerprint(
+    path: Path, algorithm: str = "md5", chunk_size: int = CHUNK_SIZE
+) -> FileFacts:
+    """
+    The facts about one file, like ``file_facts()``, with any algorithm.
+
+    The modification time is from the same ``stat()`` as the size, before
+    the file is read. A small file gets a buffer of its own size.
+    """
+    status = path.stat()
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(min(chunk_size, status.st_size + 1))
+    view = memoryview(buffer)
+    with path.open("rb", buffering=0) as source:
+        while size := source.readinto(buffer):
+            digest.update(view[:size])
+    return FileFacts(
+        name=path,
+        modified=datetime.datetime.fromtimestamp(status.st_mtime).isoformat(),
+        size=status.st_size,
+        checksum=digest.hexdigest(),
+    )
+
+
+class FactsCache:
+    """
+    The facts of files, by path, for one algorithm. ``hits`` and
+    ``misses`` count the lookups.
+    """
+
+    def __init__(self, algorithm: str = "md5") -> None:
+        self.algorithm = algorithm
+        self.facts: Dict[Path, FileFacts] = {}
+        self.hits = self.misses = 0
+
+    def get(self, path: Path) -> Optional[FileFacts]:
+        """The previous facts, if the file's size and modification time are unchanged."""
+        previous = self.facts.get(path)
+        if previous is not None:
+            status = path.stat()
+            modified = datetime.datetime.fromtimestamp(status.st_mtime).isoformat()
+            if (status.st_size, modified) == (previous.size, previous.modified):
+                self.hits += 1
+                return previous
+        self.misses += 1
+        return None
+
+    def put(self, facts: FileFacts) -> None:
+        self.facts[facts.name] = facts
+
+    def save(self, path: Path) -> None:
+        document = {
+            "algorithm": self.algorithm,
+            "files": [[str(f.name), f.modified, f.size, f.checksum] for f in self.facts.values()],
+        }
+        path.write_text(json.dumps(document))
+
+    @classmethod
+    def load(cls, path: Path, algorithm: str = "md5") -> "FactsCache":
+        """An empty cache if the file doesn't exist, or is for another algorithm."""
+        cache = cls(algorithm)
+        if path.exists():
+            document = json.loads(path.read_text())
+            if document["algorithm"] == algorithm:
+                for name, modified, size, checksum in document["files"]:
+                    cache.put(FileFacts(Path(name), modified, size, checksum))
+        return cache
+
+
+def fingerprint_tree(
+    paths: Iterable[Path],
+    algorithm: str = "md5",
+    cache: Optional[FactsCache] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[FileFacts]:
+    """
+    The facts for each path, in order. Files not in the cache are hashed
+    in a pool of threads, by :func:`Chapter_07.ch07_pool.ordered_map`,
+    with at most two files per worker pending.
+
+    With one worker, there's no pool: the files are hashed in this thread.
+    """
+    if cache is not None and cache.algorithm != algorithm:
+        raise ValueError(f"the cache is for {cache.algorithm}, not {algorithm}")
+
+    def facts(item: Tuple[Path, Optional[FileFacts]]) -> FileFacts:
+        path, previous = item
+        if previous is None:
+            return fingerprint(path, algorithm, chunk_size)
+        return previous
+
+    # The cache is only used by this thread; the workers hash the files.
+    items = ((path, cache.get(path) if cache is not None else None) for path in paths)
+    for result in ordered_map(facts, items, workers, futures.ThreadPoolExecutor):
+        if cache is not None:
+            cache.put(result)
+        yield result
+
+
+test_fingerprint = """
+>>> import os, tempfile
+>>> working = tempfile.TemporaryDirectory()
+>>> directory = Path(working.name)
+>>> paths = [directory / f"file_{n}.dat" for n in range(5)]
+>>> for n, path in enumerate(paths):
+...     path.write_bytes(bytes(range(256)) * (n * 100 + 1))
+256
+25856
+51456
+77056
+102656
+>>> facts = list(fingerprint_tree(paths, workers=2, chunk_size=4096))
+>>> facts == [file_facts(path) for path in paths]
+True
+>>> list(fingerprint_tree(paths, workers=1, chunk_size=4096)) == facts
+True
+>>> facts[0].checksum
+'e2c865db4162bed963bfaa9ef6ac18f0'
+>>> fingerprint(paths[0], "blake2b").checksum[:16]
+'1ecc896f34d3f9ca'
+
+Unchanged files are taken from the cache.
+
+>>> cache = FactsCache()
+>>> _ = list(fingerprint_tree(paths, cache=cache))
+>>> cache.hits, cache.misses
+(0, 5)
+>>> paths[1].write_bytes(b"x" * 25856)
+25856
+>>> os.utime(paths[1], (0, 1_000_000_000))
+>>> again = list(fingerprint_tree(paths, cache=cache))
+>>> cache.hits, cache.misses
+(4, 6)
+>>> again[1] == file_facts(paths[1]), again[1].checksum == facts[1].checksum
+(True, False)
+
+The cache can be saved, and loaded for the next run.
+
+>>> cache.save(directory / "facts.json")
+>>> loaded = FactsCache.load(directory / "facts.json")
+>>> list(fingerprint_tree(paths, cache=loaded)) == again, loaded.hits
+(True, 5)
+>>> len(FactsCache.load(directory / "facts.json", "sha1").facts)
+0
+>>> list(fingerprint_tree(paths, "sha1", cache=loaded))
+Traceback (most recent call last):
+...
+ValueError: the cache is for md5, not sha1
+>>> working.cleanup()
+"""
+
+
+def benchmark(paths: List[Path], workers: Optional[int]) -> None:
+    size = sum(path.stat().st_size for path in paths) / 2**20
+
+    def report(name: str, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        print(f"{name:24s} {len(paths) / elapsed:10,.0f} files/s {size / elapsed:8,.1f} MiB/s")
+
+    start = time.perf_counter()
+    for path in paths:
+        file_facts(path)
+    report("ch07_r11a.file_facts", start)
+    for algorithm in "md5", "sha1", "blake2b":
+        start = time.perf_counter()
+        cache = FactsCache(algorithm)
+        for _ in fingerprint_tree(paths, algorithm, cache, workers):
+            pass
+        report(f"fingerprint_tree {algorithm}", start)
+    start = time.perf_counter()
+    for _ in fingerprint_tree(paths, "blake2b", cache, workers):
+        pass
+    report("cached blake2b", start)
+
+
+def get_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base", type=Path, nargs="?", default=Path.cwd())
+    parser.add_argument("-p", "--pattern", default="Chapter_*/*.py")
+    parser.add_argument("-a", "--algorithm", choices=ALGORITHMS, default="md5")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("-c", "--cache", type=Path, default=None)
+    parser.add_argument("-o", "--output", type=Path, default=Path("data/summary.dat"))
+    parser.add_argument("-b", "--benchmark", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(argv)
+    paths = sorted(p for p in options.base.glob(options.pattern) if p.is_file())
+    if options.benchmark:
+        benchmark(paths, options.workers)
+        return
+    cache = (
+        FactsCache.load(options.cache, options.algorithm)
+        if options.cache else FactsCache(options.algorithm)
+    )
+    with options.output.open("w") as summary_file:
+        for facts in fingerprint_tree(paths, options.algorithm, cache, options.workers):
+            print(facts, file=summary_file)
+    if options.cache:
+        cache.save(options.cache)
+    print(f"{len(paths)} files, {cache.hits} from the cache")
+
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 7, An ordered map over a pool of workers, with a bounded queue
+
+``Executor.map()`` submits every item before it yields the first result,
+so a long iterable of items is held in memory all at once.
+:func:`ordered_map` submits the items as it goes, with at most two items
+per worker pending, and yields the results in the order of the items.
+
+It's used by :func:`Chapter_07.ch07_fingerprint.fingerprint_tree`,
+:func:`Chapter_09.ch09_fuel_parallel.map_chunks`, and
+:func:`Chapter_10.ch10_mmap_log.map_ranges`.
+"""
+import collections
+import os
+from concurrent import futures
+from typing import Callable, Deque, Iterable, Iterator, Optional, Type, TypeVar, Union
+
+A = TypeVar("A")
+T = TypeVar("T")
+PoolExecutor = Union[futures.ProcessPoolExecutor, futures.ThreadPoolExecutor]
+
+
+def default_workers(executor_class: Type[PoolExecutor]) -> int:
+    """The number of workers the executor would start by default."""
+    cpus = os.cpu_count() or 1
+    if issubclass(executor_class, futures.ThreadPoolExecutor):
+        return min(32, cpus + 4)
+    return cpus
+
+
+def ordered_map(
+    function: Callable[[A], T],
+    items: Iterable[A],
+    workers: Optional[int] = None,
+    executor_class: Type[PoolExecutor] = futures.ProcessPoolExecutor,
+) -> Iterator[T]:
+    """
+    Apply the function to each item in a pool, yielding the results in
+    order. At most two items per worker are pending. For a process pool,
+    the function must be picklable, like a module-level function
+    or a ``functools.partial()`` of one.
+
+    With one worker, there's no pool: the items are processed in this process.
+    """
+    if workers == 1:
+        yield from map(function, items)
+        return
+    workers = workers or default_workers(executor_class)
+    limit = 2 * workers
+    with executor_class(max_workers=workers) as executor:
+        pending: Deque["futures.Future[T]"] = collections.deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= limit:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+test_ordered_map = """
+>>> import math
+>>> list(ordered_map(math.factorial, range(10), workers=2)) == list(map(math.factorial, range(10)))
+True
+>>> list(ordered_map(str.upper, "abc", workers=1))
+['A', 'B', 'C']
+
+The items are taken as they're needed, not all at once.
+
+>>> taken = []
+>>> def items():
+...     for n in range(100):
+...         taken.append(n)
+...         yield n
+>>> results = ordered_map(abs, items(), workers=2, executor_class=futures.ThreadPoolExecutor)
+>>> next(results), len(taken)
+(0, 4)
+>>> sum(results), len(taken)
+(4950, 100)
+>>> default_workers(futures.ThreadPoolExecutor) == min(32, (os.cpu_count() or 1) + 4)
+True
+"""
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
@@ -3,9 +3,10 @@
 Chapter 7, recipe 13, Managing multiple contexts with multiple resources
 """
 from Chapter_03.ch03_r08 import haversine, MI, NM, KM
+from Chapter_03.ch03_haversine import Fix, fix, fix_distance
 
 import csv
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field
 from pathlib import Path
 from types import TracebackType
 from typing import Optional, Type, List, Iterable, TextIO, Dict
@@ -38,26 +39,27 @@ class LegMaker:
 
     def __init__(self, r: float = NM) -> None:
         self.last_point: Optional[Point] = None
+        # The last point in radians; each point is converted once.
+        self.last_fix: Optional[Fix] = None
         self.last_leg: Optional[Leg] = None
         self.r = r
 
     def waypoint(self, next_point: Point) -> Optional[Leg]:
         leg: Optional[Leg]
-        if self.last_point is None:
+        next_fix = fix(next_point.lat, next_point.lon)
+        if self.last_point is None or self.last_fix is None:
             # Special case for the first leg
             leg = None
         else:
             leg = Leg(self.last_point, next_point)
-            d = haversine(
-                leg.start.lat, leg.start.lon,
-                leg.end.lat, leg.end.lon, self.r
-            )
+            d = fix_distance(self.last_fix, next_fix, self.r)
             leg.distance = round(d)
-        self.last_point = next_point
+        self.last_point, self.last_fix = next_point, next_fix
         return leg
 
     def end(self) -> None:
         self.last_point = None
+        self.last_fix = None
 
 
 test_leg_maker = """
@@ -82,13 +84,13 @@ Leg(start=Point(lat=37.5531, lon=-76.3403), end=Point(lat=36.8443, lon=-76.2922)
 
 
 def flat_dict(leg: Leg) -> Dict[str, float]:
-    struct = asdict(leg)
+    # Not asdict(leg), which makes a deep copy of each Point.
     return dict(
-        start_lat=struct["start"]["lat"],
-        start_lon=struct["start"]["lon"],
-        end_lat=struct["end"]["lat"],
-        end_lon=struct["end"]["lon"],
-        distance=struct["distance"],
+        start_lat=leg.start.lat,
+        start_lon=leg.start.lon,
+        end_lat=leg.end.lat,
+        end_lon=leg.end.lon,
+        distance=leg.distance,
     )
 
 test_flat_dict = """
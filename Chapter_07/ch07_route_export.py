@@ -0,0 +1,185 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 7, Streaming a route to a compressed CSV file
+
+:func:`Chapter_07.ch07_r12.make_route_file` creates a ``Leg`` for each
+pair of points, copies it into nested dictionaries with ``asdict()``,
+flattens those into another dictionary, and writes one row with
+``csv.DictWriter``.
+
+:func:`export_route` computes each row's tuple directly from the points
+and writes batches of rows with ``csv.writer.writerows()``. The output
+is plain text, or compressed with one of the :data:`CODECS`, with a
+choice of compression level and buffer size.
+"""
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import itertools
+import lzma
+import random
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from Chapter_03.ch03_r08 import NM, haversine
+from Chapter_07.ch07_r12 import HEADERS, Leg, Point
+
+Row = Tuple[float, float, float, float, int]
+
+
+def leg_row(leg: Leg) -> Row:
+    """The CSV row for an existing Leg; compare with ch07_r12.flat_dict()."""
+    start, end = leg.start, leg.end
+    return (start.lat, start.lon, end.lat, end.lon, leg.distance)  # type: ignore [return-value]
+
+
+def route_rows(points: Iterable[Point], r: float = NM) -> Iterator[Row]:
+    """
+    The rows for the legs between the points, like ``LegMaker``, without
+    creating the intermediate ``Leg`` objects.
+
+    >>> list(route_rows([Point(38.9784, -76.4922), Point(38.3185, -76.4541)]))
+    [(38.9784, -76.4922, 38.3185, -76.4541, 40)]
+    """
+    iterator = iter(points)
+    last = next(iterator, None)
+    if last is None:
+        return
+    last_lat, last_lon = last.lat, last.lon
+    for point in iterator:
+        lat, lon = point.lat, point.lon
+        yield (
+            last_lat, last_lon, lat, lon,
+            round(haversine(last_lat, last_lon, lat, lon, r)),
+        )
+        last_lat, last_lon = lat, lon
+
+
+Opener = Callable[[BinaryIO, int], io.BufferedIOBase]
+
+CODECS: Dict[str, Opener] = {
+    "bz2": lambda raw, level: bz2.BZ2File(raw, "wb", compresslevel=level),
+    "gzip": lambda raw, level: gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=level),
+    "lzma": lambda raw, level: lzma.LZMAFile(raw, "wb", preset=level),
+}
+
+SUFFIX: Dict[Optional[str], str] = {None: "", "bz2": ".bz2", "gzip": ".gz", "lzma": ".xz"}
+
+
+def export_route(
+    points: Iterable[Point],
+    target: Path,
+    codec: Optional[str] = None,
+    level: int = 6,
+    buffer_size: int = 1 << 20,
+    batch_size: int = 10_000,
+    r: float = NM,
+) -> int:
+    """
+    Write the route's CSV file, compressed with the given codec, if any.
+    Text is collected in a ``buffer_size`` buffer before it's compressed.
+    Returns the number of rows.
+    """
+    with target.open("wb") as raw:
+        compressed: Union[BinaryIO, io.BufferedIOBase]
+        compressed = CODECS[codec](raw, level) if codec else raw
+        try:
+            buffered = io.BufferedWriter(compressed, buffer_size)  # type: ignore [arg-type]
+            with io.TextIOWrapper(buffered, encoding="utf-8", newline="") as text:
+                writer = csv.writer(text)
+                writer.writerow(HEADERS)
+                rows = route_rows(points, r)
+                count = 0
+                while batch := list(itertools.islice(rows, batch_size)):
+                    writer.writerows(batch)
+                    count += len(batch)
+        finally:
+            if compressed is not raw:
+                compressed.close()
+    return count
+
+
+test_export_route = """
+>>> import tempfile
+>>> points = [
+...     Point(38.9784, -76.4922),
+...     Point(38.3185, -76.4541),
+...     Point(37.5531, -76.3403),
+...     Point(36.8443, -76.2922)
+... ]
+>>> openers = {None: open, "bz2": bz2.open, "gzip": gzip.open, "lzma": lzma.open}
+>>> with tempfile.TemporaryDirectory() as working:
+...     for codec, opener in openers.items():
+...         target = Path(working) / f"route.csv{SUFFIX[codec]}"
+...         count = export_route(points, target, codec=codec, level=1, batch_size=2)
+...         with opener(target, "rt", newline="") as source:
+...             print(codec, count, source.read().splitlines())
+None 3 ['start_lat,start_lon,end_lat,end_lon,distance', '38.9784,-76.4922,38.3185,-76.4541,40', '38.3185,-76.4541,37.5531,-76.3403,46', '37.5531,-76.3403,36.8443,-76.2922,43']
+bz2 3 ['start_lat,start_lon,end_lat,end_lon,distance', '38.9784,-76.4922,38.3185,-76.4541,40', '38.3185,-76.4541,37.5531,-76.3403,46', '37.5531,-76.3403,36.8443,-76.2922,43']
+gzip 3 ['start_lat,start_lon,end_lat,end_lon,distance', '38.9784,-76.4922,38.3185,-76.4541,40', '38.3185,-76.4541,37.5531,-76.3403,46', '37.5531,-76.3403,36.8443,-76.2922,43']
+lzma 3 ['start_lat,start_lon,end_lat,end_lon,distance', '38.9784,-76.4922,38.3185,-76.4541,40', '38.3185,-76.4541,37.5531,-76.3403,46', '37.5531,-76.3403,36.8443,-76.2922,43']
+
+>>> from Chapter_07.ch07_r12 import LegMaker
+>>> with LegMaker() as legger:
+...     legs = list(filter(None, map(legger.waypoint, points)))
+>>> [leg_row(leg) for leg in legs] == list(route_rows(points))
+True
+"""
+
+
+def synthetic_track(count: int, seed: int = 42) -> List[Point]:
+    """A random walk, like a GPS track."""
+    rng = random.Random(seed)
+    lat, lon = 38.9784, -76.4922
+    points = []
+    for _ in range(count):
+        lat += rng.uniform(-0.01, 0.01)
+        lon += rng.uniform(-0.01, 0.01)
+        points.append(Point(round(lat, 6), round(lon, 6)))
+    return points
+
+
+def benchmark(count: int, level: int, buffer_size: int, directory: Path) -> None:
+    from Chapter_07.ch07_r12 import make_route_bz2, make_route_file
+
+    points = synthetic_track(count)
+    rows = count - 1
+    print(f"{'':24s} {'rows/s':>12s} {'MiB':>8s}")
+    for name, original in ("make_route_file", make_route_file), ("make_route_bz2", make_route_bz2):
+        target = directory / f"{name}.csv"
+        start = time.perf_counter()
+        original(points, target)
+        elapsed = time.perf_counter() - start
+        print(f"{name:24s} {rows / elapsed:12,.0f} {target.stat().st_size / 2**20:8.1f}")
+        target.unlink()
+    for codec in None, "gzip", "bz2", "lzma":
+        target = directory / f"route.csv{SUFFIX[codec]}"
+        start = time.perf_counter()
+        export_route(points, target, codec, level, buffer_size)
+        elapsed = time.perf_counter() - start
+        name = f"export_route {codec or 'csv'}"
+        print(f"{name:24s} {rows / elapsed:12,.0f} {target.stat().st_size / 2**20:8.1f}")
+        target.unlink()
+
+
+def get_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--points", type=int, default=1_000_000)
+    parser.add_argument("-l", "--level", type=int, default=6)
+    parser.add_argument("-b", "--buffer-size", type=int, default=1 << 20)
+    parser.add_argument("-d", "--directory", type=Path, default=Path("data"))
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(argv)
+    benchmark(options.points, options.level, options.buffer_size, options.directory)
+
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
+
+if __name__ == "__main__":
+    main()
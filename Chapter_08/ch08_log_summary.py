@@ -0,0 +1,204 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 8, A single-pass log summary in bounded memory.
+
+:func:`Chapter_08.ch08_r05.summarize` keeps every ``Event`` in a list per
+module; the memory needed grows with the size of the log. A
+:class:`LogSummary` keeps only counts, the first and last timestamps, and a
+fixed-size random sample of events for each module. Message templates, the
+messages with numbers and quoted values replaced by ``<*>``, are counted up to
+a configurable limit.
+
+Summaries of separate chunks of a log can be merged, so the chunks
+can be summarized in parallel.
+"""
+import collections
+import random
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Counter, Dict, Iterable, List, Optional, Tuple
+
+from Chapter_08.ch08_r05 import Event
+
+OTHER = "<other>"
+
+variable_pattern = re.compile(
+    r"""
+    '[^']*'
+    | "[^"]*"
+    | \b0x[0-9a-fA-F]+\b
+    | (?<![\w.])\d+(?:\.\d+)?
+    """,
+    re.X,
+)
+
+
+def template(message: str) -> str:
+    """
+    The message with the variable parts replaced.
+
+    >>> template("Request 42 took 0.25s for 'alice' at 0x7f3a")
+    'Request <*> took <*>s for <*> at <*>'
+    """
+    return variable_pattern.sub("<*>", message)
+
+
+@dataclass
+class ModuleSummary:
+    count: int = 0
+    levels: Counter[str] = field(default_factory=collections.Counter)
+    first: Optional[str] = None
+    last: Optional[str] = None
+    sample: List[Event] = field(default_factory=list)
+
+    def add(self, event: Event, sample_size: int, rng: random.Random) -> None:
+        self.count += 1
+        self.levels[event.level] += 1
+        if self.first is None or event.timestamp < self.first:
+            self.first = event.timestamp
+        if self.last is None or event.timestamp > self.last:
+            self.last = event.timestamp
+        # Reservoir sampling: each event has an equal chance of being kept.
+        if len(self.sample) < sample_size:
+            self.sample.append(event)
+        elif (slot := rng.randrange(self.count)) < sample_size:
+            self.sample[slot] = event
+
+    def merge(self, other: "ModuleSummary", sample_size: int, rng: random.Random) -> None:
+        # Weighted sampling without replacement: each sampled event
+        # stands for count/len(sample) events of its chunk.
+        keyed: List[Tuple[float, Event]] = [
+            (rng.random() ** (len(summary.sample) / summary.count), event)
+            for summary in (self, other)
+            for event in summary.sample
+        ]
+        keyed.sort(key=lambda pair: pair[0], reverse=True)
+        self.sample = [event for key, event in keyed[:sample_size]]
+        self.count += other.count
+        self.levels.update(other.levels)
+        self.first = min(t for t in (self.first, other.first) if t is not None)
+        self.last = max(t for t in (self.last, other.last) if t is not None)
+
+
+class LogSummary:
+    """
+    Counts by module, by level, and by message template; first and last
+    timestamps and a sample of up to ``sample_size`` events per module.
+    At most ``max_templates`` distinct templates are counted; the rest
+    are counted as ``"<other>"``.
+
+    The ``templater`` function computes the template of each message.
+    With None, templates aren't counted here; they can be counted elsewhere,
+    then added with :meth:`count_template`.
+    """
+
+    def __init__(
+        self,
+        sample_size: int = 3,
+        max_templates: int = 1000,
+        seed: Optional[int] = None,
+        templater: Optional[Callable[[str], str]] = template,
+    ) -> None:
+        self.sample_size = sample_size
+        self.max_templates = max_templates
+        self.templater = templater
+        self.rng = random.Random(seed)
+        self.modules: Dict[str, ModuleSummary] = {}
+        self.levels: Counter[str] = collections.Counter()
+        self.templates: Counter[str] = collections.Counter()
+
+    def add(self, event: Event) -> None:
+        if event.module not in self.modules:
+            self.modules[event.module] = ModuleSummary()
+        self.modules[event.module].add(event, self.sample_size, self.rng)
+        self.levels[event.level] += 1
+        if self.templater:
+            self.count_template(self.templater(event.message), 1)
+
+    def count_template(self, key: str, count: int) -> None:
+        if key in self.templates or len(self.templates) < self.max_templates:
+            self.templates[key] += count
+        else:
+            self.templates[OTHER] += count
+
+    def update(self, events: Iterable[Optional[Event]]) -> "LogSummary":
+        for event in events:
+            if event:
+                self.add(event)
+        return self
+
+    def merge(self, other: "LogSummary") -> "LogSummary":
+        """Add the other summary, of a different chunk, into this one."""
+        for name, module in other.modules.items():
+            if name in self.modules:
+                self.modules[name].merge(module, self.sample_size, self.rng)
+            else:
+                self.modules[name] = ModuleSummary(
+                    module.count, module.levels.copy(), module.first, module.last,
+                    module.sample[:self.sample_size],
+                )
+        self.levels.update(other.levels)
+        for key, count in other.templates.most_common():
+            self.count_template(key, count)
+        return self
+
+    @property
+    def count(self) -> int:
+        return sum(self.levels.values())
+
+
+def summarize(data: Iterable[Optional[Event]], **config: Any) -> LogSummary:
+    return LogSummary(**config).update(data)
+
+
+test_summarize = """
+>>> data = [
+...     '[2016-04-24 11:05:01,462] INFO in module1: Sample Message One',
+...     '[2016-04-24 11:06:02,624] DEBUG in module2: Debugging',
+...     '[2016-04-24 11:07:03,246] WARNING in module1: Something might have gone wrong',
+...     '[2016-04-24 11:08:04,112] INFO in module1: Request 17 took 12ms',
+...     '[2016-04-24 11:09:05,889] INFO in module1: Request 18 took 9ms',
+... ]
+>>> summary = summarize((Event.from_line(txt) for txt in data), sample_size=2, seed=42)
+>>> summary.count, summary.levels
+(5, Counter({'INFO': 3, 'DEBUG': 1, 'WARNING': 1}))
+>>> module1 = summary.modules['module1']
+>>> module1.count, module1.first, module1.last
+(4, '2016-04-24 11:05:01,462', '2016-04-24 11:09:05,889')
+>>> len(module1.sample)
+2
+>>> summary.templates.most_common(1)
+[('Request <*> took <*>ms', 2)]
+"""
+
+test_merge = """
+>>> levels = ["INFO", "DEBUG", "WARNING"]
+>>> events = [
+...     Event(f"2016-04-24 11:{n // 60:02d}:{n % 60:02d},000", levels[n % 3], f"module{n % 4}", f"Message {n}")
+...     for n in range(1200)
+... ]
+>>> whole = summarize(events, sample_size=5, max_templates=10, seed=1)
+>>> merged = summarize(events[:500], sample_size=5, max_templates=10, seed=2).merge(
+...     summarize(events[500:], sample_size=5, max_templates=10, seed=3))
+>>> merged.levels == whole.levels and merged.templates == whole.templates
+True
+>>> all(
+...     (m.count, m.levels, m.first, m.last) == (w.count, w.levels, w.first, w.last)
+...     for m, w in ((merged.modules[name], whole.modules[name]) for name in whole.modules)
+... )
+True
+>>> all(len(m.sample) == 5 for m in merged.modules.values())
+True
+>>> merged.modules["module0"].first, merged.modules["module3"].last
+('2016-04-24 11:00:00,000', '2016-04-24 11:19:59,000')
+"""
+
+test_templates_bounded = """
+>>> summary = LogSummary(max_templates=2)
+>>> for n, message in enumerate(["alpha 1", "beta 2", "alpha 3", "gamma", "delta"]):
+...     summary.add(Event(f"2016-04-24 11:05:0{n},000", "INFO", "module1", message))
+>>> summary.templates
+Counter({'alpha <*>': 2, '<other>': 2, 'beta <*>': 1})
+"""
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
@@ -0,0 +1,204 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 9, Following a growing log file.
+
+The generator pipelines of :mod:`Chapter_09.ch09_r01` and
+:mod:`Chapter_09.ch09_r04` work with any iterable of lines. A
+:class:`LogFollower` is an iterable of lines which doesn't end at the
+end of the file: it waits for more lines to be appended, like ``tail -F``.
+
+-   A rotated log (renamed, and replaced by a new file) is read to the end,
+    then the new file is read from the beginning.
+
+-   A truncated log is read again from the beginning.
+
+-   The offset of the last line consumed is saved in a small JSON state file,
+    so a new follower resumes where the last one stopped.
+
+:func:`add_events` keeps running aggregates, like the
+:class:`Chapter_08.ch08_r05.ModuleEvents` per-module lists,
+up to date as the lines arrive.
+"""
+import json
+import os
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional
+
+from Chapter_08.ch08_r05 import Event, ModuleEvents
+
+
+class LogFollower:
+    """
+    Yield the complete lines of a log file as they're appended.
+    An incomplete last line is held until its newline arrives.
+
+    The ``stop`` function is evaluated when there's no new data;
+    when it returns True, iteration ends. The default never stops.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        state_path: Optional[Path] = None,
+        poll_interval: float = 1.0,
+        from_end: bool = False,
+        stop: Callable[[], bool] = lambda: False,
+        block_size: int = 64 * 1024,
+    ) -> None:
+        self.path = path
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.from_end = from_end
+        self.stop = stop
+        self.block_size = block_size
+        self.inode = 0
+        self.offset = 0
+
+    def load_state(self) -> None:
+        if self.state_path and self.state_path.exists():
+            state = json.loads(self.state_path.read_text())
+            self.inode, self.offset = state["inode"], state["offset"]
+
+    def save_state(self) -> None:
+        if self.state_path:
+            self.state_path.write_text(
+                json.dumps({"inode": self.inode, "offset": self.offset})
+            )
+
+    def open(self, resume: bool) -> BinaryIO:
+        """
+        Open the file. If resuming, and it's the same file, and it's not
+        shorter than the saved offset, continue from that offset.
+        """
+        source = self.path.open("rb")
+        status = os.fstat(source.fileno())
+        if resume and status.st_ino == self.inode and status.st_size >= self.offset:
+            source.seek(self.offset)
+        elif resume and self.from_end and not self.inode:
+            self.offset = source.seek(0, os.SEEK_END)
+        else:
+            self.offset = 0
+        self.inode = status.st_ino
+        return source
+
+    def rotated(self) -> bool:
+        """Is there a new file at the path?"""
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except FileNotFoundError:
+            # Between the rename and the creation of the new file.
+            return False
+
+    def __iter__(self) -> Iterator[str]:
+        self.load_state()
+        source = self.open(resume=True)
+        partial = b""
+        try:
+            while True:
+                block = source.read(self.block_size)
+                if block:
+                    *lines, partial = (partial + block).split(b"\n")
+                    for line in lines:
+                        yield line.decode("utf-8") + "\n"
+                        self.offset += len(line) + 1
+                    self.save_state()
+                elif self.rotated():
+                    # The old file is finished; any incomplete line is, too.
+                    if partial:
+                        yield partial.decode("utf-8")
+                        partial = b""
+                    source.close()
+                    source = self.open(resume=False)
+                    self.save_state()
+                elif os.fstat(source.fileno()).st_size < source.tell():
+                    source.seek(0)
+                    self.offset = 0
+                    partial = b""
+                    self.save_state()
+                elif self.stop():
+                    break
+                else:
+                    time.sleep(self.poll_interval)
+        finally:
+            source.close()
+            self.save_state()
+
+
+def add_events(lines: Iterable[str], module_details: ModuleEvents) -> Iterator[Event]:
+    """
+    Add each event to the running per-module lists, and yield it.
+    Lines which aren't events, like tracebacks, are skipped.
+    """
+    for line in lines:
+        if event := Event.from_line(line):
+            module_details.add_event(event)
+            yield event
+
+
+test_follow = """
+>>> import tempfile
+>>> from Chapter_09.ch09_r01 import parse_line_iter, parse_date_iter
+>>> from Chapter_09.ch09_r04 import module_iter
+
+The ``stop`` function makes changes to the log while the follower is
+waiting. It returns True when there are no more changes to make.
+
+>>> def changes(*actions):
+...     pending = iter(actions)
+...     def stop():
+...         for action in pending:
+...             action()
+...             return False
+...         return True
+...     return stop
+>>> def append(path, text):
+...     def action():
+...         with path.open("a") as target:
+...             _ = target.write(text)
+...     return action
+>>> def rotate(path, text):
+...     def action():
+...         path.rename(path.with_suffix(".1"))
+...         path.write_text(text)
+...     return action
+>>> def truncate(path, text):
+...     def action():
+...         path.write_text(text)
+...     return action
+
+>>> with tempfile.TemporaryDirectory() as working:
+...     log = Path(working) / "app.log"
+...     state = Path(working) / "app.state"
+...     _ = log.write_text(
+...         "[2016-04-24 11:05:01,462] INFO in module1: Sample Message One\\n"
+...         "[2016-04-24 11:06:02,624] DEBUG in module2: Debug"
+...     )
+...     stop = changes(
+...         append(log, "ging\\n"),
+...         append(log, "[2016-04-24 11:07:03,246] WARNING in module1: Something\\n"),
+...         rotate(log, "[2016-04-24 12:00:00,000] INFO in module2: Rotated\\n"),
+...     )
+...     follower = LogFollower(log, state, poll_interval=0, stop=stop)
+...     module_details = ModuleEvents()
+...     events = list(add_events(follower, module_details))
+...     resumed = LogFollower(log, state, poll_interval=0, stop=changes(
+...         append(log, "[2016-04-24 12:00:01,000] DEBUG in module2: Resumed\\n"),
+...         truncate(log, "[2016-04-24 13:00:00,000] INFO in module1: Truncated\\n"),
+...     ))
+...     module2 = list(module_iter(parse_date_iter(parse_line_iter(resumed))))
+...     saved = json.loads(state.read_text())
+...     size = log.stat().st_size
+
+>>> [event.message for event in events]
+['Sample Message One', 'Debugging', 'Something', 'Rotated']
+>>> {module: len(events) for module, events in module_details.items()}
+{'module1': 2, 'module2': 2}
+>>> for item in module2:
+...     print(item)
+DatedLog(date=datetime.datetime(2016, 4, 24, 12, 0, 1), level='DEBUG', module='module2', message='Resumed')
+>>> saved["offset"] == size
+True
+"""
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
@@ -0,0 +1,242 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 9, Processing a long fuel log in parallel chunks.
+
+:func:`Chapter_09.ch09_r03.row_merge` combines each group of three
+rows into one. A group starts with a row that has a date. The groups don't
+depend on each other, so :func:`record_chunks` splits the rows into
+chunks before a dated row. The chunks are processed in a pool of processes by
+:func:`Chapter_09.ch09_r06.clean_data_iter`, and the ``Leg`` objects
+are put back in their original order.
+
+Each chunk also yields a :class:`Chapter_09.ch09_r06.FuelStats` of partial
+results; those of all the chunks are merged to compute the total fuel,
+and the mean and standard deviation of the fuel used per hour.
+"""
+import argparse
+import csv
+import datetime
+import functools
+import random
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from Chapter_07.ch07_pool import ordered_map
+from Chapter_09.ch09_r03 import log_rows, row_merge
+from Chapter_09.ch09_r06 import FuelStats, Leg, clean_data_iter, summary
+
+RawRow = List[str]
+T = TypeVar("T")
+
+
+def record_chunks(source: Iterable[RawRow], chunk_size: int) -> Iterator[List[RawRow]]:
+    """
+    Lists of at least ``chunk_size`` rows, split before a row with a date.
+
+    >>> from Chapter_09.ch09_r03 import log_rows
+    >>> [len(chunk) for chunk in record_chunks(log_rows, 2)]
+    [3, 3, 3]
+    >>> [chunk[0][0] for chunk in record_chunks(log_rows, 4)]
+    ['date', '10/26/13']
+    """
+    chunk: List[RawRow] = []
+    for row in source:
+        if row and row[0] and len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+        chunk.append(row)
+    if chunk:
+        yield chunk
+
+
+def line_chunks(source: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    """
+    Like :func:`record_chunks`, for the lines of a CSV file, so the
+    workers can parse them. A line with a date doesn't start with ``,``.
+    """
+    chunk: List[str] = []
+    for line in source:
+        if len(chunk) >= chunk_size and line[:1] not in (",", "\n", "\r", ""):
+            yield chunk
+            chunk = []
+        chunk.append(line)
+    if chunk:
+        yield chunk
+
+
+def process_lines(lines: List[str], keep_legs: bool = True) -> Tuple[List[Leg], FuelStats]:
+    return process_chunk(list(csv.reader(lines)), keep_legs)
+
+
+def process_chunk(rows: List[RawRow], keep_legs: bool = True) -> Tuple[List[Leg], FuelStats]:
+    """The legs of a chunk, if they're wanted, and their partial results."""
+    legs: List[Leg] = []
+    stats = FuelStats()
+    for leg in clean_data_iter(row_merge(rows)):
+        stats.add(leg)
+        if keep_legs:
+            legs.append(leg)
+    return legs, stats
+
+
+def map_chunks(
+    worker: Callable[[List[Any], bool], T],
+    chunks: Iterable[List[Any]],
+    keep_legs: bool,
+    workers: Optional[int] = None,
+) -> Iterator[T]:
+    """
+    Apply the worker to each chunk in a process pool, with
+    :func:`Chapter_07.ch07_pool.ordered_map`, yielding the results
+    in order. At most two chunks per worker are pending.
+
+    With one worker, there's no pool: the chunks are processed in this process.
+    """
+    return ordered_map(functools.partial(worker, keep_legs=keep_legs), chunks, workers)
+
+
+def parallel_legs(
+    source: Iterable[RawRow], chunk_size: int = 30_000, workers: Optional[int] = None
+) -> Iterator[Leg]:
+    """All the legs, in order, like ``clean_data_iter(row_merge(source))``."""
+    chunks = record_chunks(source, chunk_size)
+    for legs, _ in map_chunks(process_chunk, chunks, True, workers):
+        yield from legs
+
+
+def parallel_stats(
+    source: Iterable[RawRow], chunk_size: int = 30_000, workers: Optional[int] = None
+) -> FuelStats:
+    """Only the merged results; the legs aren't sent back from the workers."""
+    chunks = record_chunks(source, chunk_size)
+    return sum(
+        (stats for _, stats in map_chunks(process_chunk, chunks, False, workers)),
+        FuelStats(),
+    )
+
+
+def parallel_file_stats(
+    path: Path, chunk_size: int = 30_000, workers: Optional[int] = None
+) -> FuelStats:
+    """Like :func:`parallel_stats`, with the CSV parsing done by the workers."""
+    with path.open(newline="") as source:
+        chunks = line_chunks(source, chunk_size)
+        return sum(
+            (stats for _, stats in map_chunks(process_lines, chunks, False, workers)),
+            FuelStats(),
+        )
+
+
+def parallel_summary(
+    source: Iterable[RawRow], chunk_size: int = 30_000, workers: Optional[int] = None
+) -> None:
+    """The report of :func:`Chapter_09.ch09_r06.summary`."""
+    stats = parallel_stats(source, chunk_size, workers)
+    print(f"Fuel use {stats.mean:.2f} ±{2 * stats.stdev:.2f}")
+
+
+test_parallel = """
+>>> from Chapter_09.ch09_r03 import log_rows
+>>> from Chapter_09.ch09_r06 import total_fuel, avg_fuel_per_hour, stdev_fuel_per_hour
+>>> rows = log_rows + make_rows(200, seed=1)
+>>> serial = list(clean_data_iter(row_merge(rows)))
+>>> list(parallel_legs(rows, chunk_size=50, workers=2)) == serial
+True
+>>> stats = parallel_stats(rows, chunk_size=50, workers=2)
+>>> stats.count, round(stats.total_fuel, 6) == round(total_fuel(serial), 6)
+(202, True)
+>>> abs(stats.mean - avg_fuel_per_hour(serial)) < 1e-12
+True
+>>> abs(stats.stdev - stdev_fuel_per_hour(serial)) < 1e-9
+True
+>>> import io
+>>> text = io.StringIO()
+>>> csv.writer(text).writerows(rows)
+>>> chunks = list(line_chunks(io.StringIO(text.getvalue()), 50))
+>>> [len(c) for c in chunks][:3], [c[0][:9] for c in chunks][:3]
+([51, 51, 51], ['date,engi', '11/10/13,', '11/27/13,'])
+>>> sum(
+...     (stats for _, stats in map_chunks(process_lines, chunks, False, 2)), FuelStats()
+... ) == stats
+True
+>>> parallel_summary(log_rows, chunk_size=1, workers=1)
+Fuel use 0.48 ±0.18
+>>> summary(log_rows)
+Fuel use 0.48 ±0.18
+"""
+
+
+def generate_rows(legs: int, seed: int = 42) -> Iterator[RawRow]:
+    """
+    The header, then three rows for each leg, one day after another,
+    repeating the same ten years.
+    """
+    rng = random.Random(seed)
+    first_day = datetime.date(2013, 10, 27)
+    one_day = datetime.timedelta(days=1)
+    yield from log_rows[:3]
+    for n in range(legs):
+        day = first_day + (n % 3650) * one_day
+        start = datetime.time(rng.randint(6, 10), rng.randrange(60))
+        end = datetime.time(rng.randint(13, 18), rng.randrange(60))
+        height = rng.randint(20, 40)
+        yield [f"{day:%m/%d/%y}", f"{start:%I:%M:%S %p}", str(height)]
+        yield ["", f"{end:%I:%M:%S %p}", str(height - rng.randint(1, 8))]
+        yield ["", "generated", ""]
+
+
+def make_rows(legs: int, seed: int = 42) -> List[RawRow]:
+    """Three rows for each of the legs, without the header."""
+    return list(generate_rows(legs, seed))[3:]
+
+
+def make_fuel_log(path: Path, legs: int, seed: int = 42) -> None:
+    with path.open("w", newline="") as target:
+        csv.writer(target).writerows(generate_rows(legs, seed))
+
+
+def benchmark(path: Path, chunk_size: int, workers: Optional[int]) -> None:
+    start = time.perf_counter()
+    with path.open(newline="") as source:
+        serial = FuelStats.from_legs(clean_data_iter(row_merge(csv.reader(source))))
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with path.open(newline="") as source:
+        parallel = parallel_stats(csv.reader(source), chunk_size, workers)
+    parallel_time = time.perf_counter() - start
+    assert parallel.count == serial.count
+
+    start = time.perf_counter()
+    by_lines = parallel_file_stats(path, chunk_size, workers)
+    lines_time = time.perf_counter() - start
+    assert by_lines.count == serial.count
+
+    print(f"serial              {serial.count / serial_time:10,.0f} legs/s")
+    print(f"parallel_stats      {parallel.count / parallel_time:10,.0f} legs/s")
+    print(f"parallel_file_stats {by_lines.count / lines_time:10,.0f} legs/s")
+    print(f"Fuel use {parallel.mean:.2f} ±{2 * parallel.stdev:.2f}, total {parallel.total_fuel:,.0f}")
+
+
+def get_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=Path)
+    parser.add_argument("-n", "--legs", type=int, default=1_000_000,
+        help="create a synthetic log of this many legs if the path doesn't exist")
+    parser.add_argument("-c", "--chunk-size", type=int, default=30_000)
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(argv)
+    if not options.path.exists():
+        make_fuel_log(options.path, options.legs)
+    benchmark(options.path, options.chunk_size, options.workers)
+
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 9, Windowed queries over large log files.
+
+A query for the records between two times shouldn't have to parse
+the whole file with :func:`Chapter_09.ch09_r01.parse_line_iter`.
+
+There are two ways to find the start of the window.
+
+-   A sidecar index, ``name.log.idx``, of byte offsets at regular timestamp
+    intervals. :func:`update_index` scans only the lines appended since
+    the last update, and rebuilds if the log was truncated or replaced.
+
+-   Without an index, the timestamps are monotone, so :func:`bisect_offset`
+    can do a binary search over the byte offsets of the file.
+
+Either way, :func:`query` seeks to the offset and parses only the
+lines in the window.
+"""
+import bisect
+import datetime
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from Chapter_09.ch09_r01 import DatedLog, parse_date_iter, parse_line_iter
+from Chapter_09.ch09_timestamp import log_timestamp
+
+Entry = Tuple[datetime.datetime, int]
+
+
+@dataclass
+class LogIndex:
+    """
+    The offsets of the first line at or after each interval.
+    ``size`` is the number of bytes (complete lines) scanned so far.
+    """
+
+    interval: datetime.timedelta
+    size: int = 0
+    entries: List[Entry] = field(default_factory=list)
+
+    def offset(self, start: datetime.datetime) -> int:
+        """
+        The offset of a line with a timestamp no later than ``start``;
+        all the lines before it are earlier than ``start``.
+        """
+        times = [timestamp for timestamp, offset in self.entries]
+        i = bisect.bisect_right(times, start) - 1
+        return self.entries[i][1] if i >= 0 else 0
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "interval": self.interval.total_seconds(),
+                "size": self.size,
+                "entries": [
+                    [timestamp.isoformat(), offset]
+                    for timestamp, offset in self.entries
+                ],
+            }
+        )
+
+    @classmethod
+    def from_json(cls, text: str) -> "LogIndex":
+        document = json.loads(text)
+        return cls(
+            interval=datetime.timedelta(seconds=document["interval"]),
+            size=document["size"],
+            entries=[
+                (datetime.datetime.fromisoformat(timestamp), offset)
+                for timestamp, offset in document["entries"]
+            ],
+        )
+
+
+def line_timestamp(line: bytes) -> Optional[datetime.datetime]:
+    """
+    The timestamp of a log line, or None for other lines, like tracebacks.
+
+    >>> line_timestamp(b"[2016-04-24 11:05:01,462] INFO in module1: Sample")
+    datetime.datetime(2016, 4, 24, 11, 5, 1, 462000)
+    >>> line_timestamp(b"Traceback (most recent call last):") is None
+    True
+    """
+    if line[:1] != b"[" or (end := line.find(b"]")) < 0:
+        return None
+    try:
+        return log_timestamp(line[1:end].decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def index_path(path: Path) -> Path:
+    return path.with_suffix(path.suffix + ".idx")
+
+
+def mark_text(mark: Optional[datetime.datetime]) -> bytes:
+    """The fixed-width form of a timestamp, for comparison with line bytes."""
+    if mark is None:
+        return b""
+    return f"{mark:%Y-%m-%d %H:%M:%S},{mark.microsecond // 1000:03d}".encode("ascii")
+
+
+def scan(source: BinaryIO, index: LogIndex) -> LogIndex:
+    """
+    Extend the index with the lines after ``index.size``.
+    An incomplete last line is left for the next scan.
+
+    Fixed-width timestamps sort as bytes, so most lines are skipped
+    by comparing bytes, without parsing the timestamp.
+    """
+    if index.entries:
+        next_mark: Optional[datetime.datetime] = index.entries[-1][0] + index.interval
+    else:
+        next_mark = None
+    mark = mark_text(next_mark)
+    source.seek(index.size)
+    offset = index.size
+    for line in source:
+        if not line.endswith(b"\n"):
+            break
+        if line[24:25] != b"]" or line[1:24] >= mark:
+            timestamp = line_timestamp(line)
+            if timestamp and (next_mark is None or timestamp >= next_mark):
+                index.entries.append((timestamp, offset))
+                next_mark = timestamp + index.interval
+                mark = mark_text(next_mark)
+        offset += len(line)
+    index.size = offset
+    return index
+
+
+def is_current(source: BinaryIO, index: LogIndex) -> bool:
+    """
+    Was the index built from this file? After a truncation or rotation,
+    the file is shorter, or the first indexed line is different.
+    """
+    source.seek(0, 2)
+    if source.tell() < index.size:
+        return False
+    if index.entries:
+        timestamp, offset = index.entries[0]
+        source.seek(offset)
+        return line_timestamp(source.readline()) == timestamp
+    return True
+
+
+def update_index(
+    path: Path, interval: datetime.timedelta = datetime.timedelta(minutes=1)
+) -> LogIndex:
+    """Load, extend, and save the sidecar index for a log file."""
+    sidecar = index_path(path)
+    with path.open("rb") as source:
+        index: Optional[LogIndex] = None
+        if sidecar.exists():
+            index = LogIndex.from_json(sidecar.read_text())
+            if index.interval != interval or not is_current(source, index):
+                index = None
+        index = scan(source, index or LogIndex(interval))
+    sidecar.write_text(index.to_json())
+    return index
+
+
+def next_line(source: BinaryIO, position: int) -> Tuple[int, Optional[datetime.datetime]]:
+    """
+    The offset and timestamp of the first timestamped line
+    starting at or after ``position``. At the end, the timestamp is None.
+    """
+    if position == 0:
+        source.seek(0)
+    else:
+        source.seek(position - 1)
+        source.readline()
+    offset = source.tell()
+    for line in source:
+        if timestamp := line_timestamp(line):
+            return offset, timestamp
+        offset += len(line)
+    return offset, None
+
+
+def bisect_offset(source: BinaryIO, start: datetime.datetime) -> int:
+    """
+    Binary search for the offset of the first line at or after ``start``.
+    """
+    source.seek(0, 2)
+    low, high = 0, source.tell()
+    while low < high:
+        middle = (low + high) // 2
+        offset, timestamp = next_line(source, middle)
+        if timestamp is None or timestamp >= start:
+            high = middle
+        else:
+            # Every position up to this line finds this line, which is too early.
+            low = offset + 1
+    return next_line(source, low)[0]
+
+
+def query(
+    path: Path,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    index: Optional[LogIndex] = None,
+) -> Iterator[DatedLog]:
+    """
+    The records with ``start <= date < end``. Uses the index, if one is
+    provided; otherwise, a binary search finds the start of the window.
+    """
+    with path.open("rb") as source:
+        offset = index.offset(start) if index else bisect_offset(source, start)
+        source.seek(offset)
+        lines = (line.decode("utf-8") for line in source)
+        for item in parse_date_iter(parse_line_iter(lines)):
+            if item.date >= end:
+                break
+            if item.date >= start:
+                yield item
+
+
+test_query = """
+>>> import tempfile
+>>> from pprint import pprint
+>>> base = datetime.datetime(2016, 4, 24, 11, 0, 0)
+>>> def write_log(target, first, count):
+...     for n in range(first, first + count):
+...         when = base + datetime.timedelta(seconds=15 * n)
+...         target.write(f"[{when:%Y-%m-%d %H:%M:%S},{n % 1000:03d}] INFO in module{n % 3}: Message {n}\\n")
+...         if n % 7 == 0:
+...             target.write("Traceback (most recent call last):\\n")
+
+>>> with tempfile.TemporaryDirectory() as working:
+...     path = Path(working) / "sample.log"
+...     with path.open("w") as target:
+...         write_log(target, 0, 40)
+...     index = update_index(path)
+...     first_size, first_entries = index.size, len(index.entries)
+...     with path.open("a") as target:
+...         write_log(target, 40, 40)
+...         _ = target.write("[2016-04-24 11:20:00,000] INFO in module1: Incompl")
+...     index = update_index(path)
+...     saved = LogIndex.from_json(index_path(path).read_text())
+...     window = (datetime.datetime(2016, 4, 24, 11, 5), datetime.datetime(2016, 4, 24, 11, 6))
+...     indexed = list(query(path, *window, index=index))
+...     searched = list(query(path, *window))
+...     with path.open() as source:
+...         expected = [
+...             item for item in parse_date_iter(parse_line_iter(source))
+...             if window[0] <= item.date < window[1]
+...         ]
+...     with path.open("w") as target:
+...         write_log(target, 100, 10)
+...     rotated = update_index(path)
+...     with path.open("rb") as source:
+...         edges = [bisect_offset(source, base), bisect_offset(source, base + datetime.timedelta(hours=1))]
+...     size = path.stat().st_size
+
+>>> first_size < index.size, first_entries, len(index.entries)
+(True, 10, 20)
+>>> saved == index
+True
+>>> for item in indexed:
+...     pprint(item)
+DatedLog(date=datetime.datetime(2016, 4, 24, 11, 5, 0, 20000), level='INFO', module='module2', message='Message 20')
+DatedLog(date=datetime.datetime(2016, 4, 24, 11, 5, 15, 21000), level='INFO', module='module0', message='Message 21')
+DatedLog(date=datetime.datetime(2016, 4, 24, 11, 5, 30, 22000), level='INFO', module='module1', message='Message 22')
+DatedLog(date=datetime.datetime(2016, 4, 24, 11, 5, 45, 23000), level='INFO', module='module2', message='Message 23')
+>>> indexed == searched == expected
+True
+>>> rotated.entries[0]
+(datetime.datetime(2016, 4, 24, 11, 25, 0, 100000), 0)
+>>> edges == [0, size]
+True
+"""
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
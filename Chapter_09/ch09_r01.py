@@ -7,6 +7,8 @@ from pprint import pprint
 import re
 from typing import Tuple, Iterable, Iterator, NamedTuple, Match, cast
 
+from Chapter_09.ch09_timestamp import log_timestamp
+
 
 class RawLog(NamedTuple):
     date: str
@@ -51,12 +53,12 @@ class DatedLog(NamedTuple):
 
 def parse_date_iter(source: Iterable[RawLog]) -> Iterator[DatedLog]:
     for item in source:
-        date = datetime.datetime.strptime(item.date, "%Y-%m-%d %H:%M:%S,%f")
+        date = log_timestamp(item.date)
         yield DatedLog(date, item.level, item.module, item.message)
 
 
 def parse_date(item: RawLog) -> DatedLog:
-    date = datetime.datetime.strptime(item.date, "%Y-%m-%d %H:%M:%S,%f")
+    date = log_timestamp(item.date)
     return DatedLog(date, item.level, item.module, item.message)
 
 
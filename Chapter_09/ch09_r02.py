@@ -4,13 +4,14 @@ Chapter 9, recipe 2, Applying transformations to a collection
 """
 import datetime
 from Chapter_09.ch09_r01 import RawLog, DatedLog
+from Chapter_09.ch09_timestamp import log_timestamp
 from typing import Iterable, Iterator
 
 from pprint import pprint
 
 
 def parse_date(item: RawLog) -> DatedLog:
-    date = datetime.datetime.strptime(item.date, "%Y-%m-%d %H:%M:%S,%f")
+    date = log_timestamp(item.date)
     return DatedLog(date, item.level, item.module, item.message)
 
 
@@ -4,8 +4,10 @@ Chapter 9, recipe 6, Combining map and reduce transformations.
 
 """
 import datetime
-from typing import List, Iterable, Iterator
+from itertools import chain
+from typing import List, Iterable, Iterator, Union, cast
 from Chapter_09.ch09_r03 import row_merge, CombinedRow, log_rows
+from Chapter_09.ch09_timestamp import fuel_timestamp
 
 # from types import SimpleNamespace as Leg
 from dataclasses import dataclass, field
@@ -38,10 +40,7 @@ def make_Leg(row: CombinedRow) -> Leg:
 
 
 def timestamp(date_text: str, time_text: str) -> datetime.datetime:
-    date = datetime.datetime.strptime(date_text, "%m/%d/%y").date()
-    time = datetime.datetime.strptime(time_text, "%I:%M:%S %p").time()
-    combined_date_time = datetime.datetime.combine(date, time)
-    return combined_date_time
+    return fuel_timestamp(date_text, time_text)
 
 
 def start_datetime(row: Leg) -> Leg:
@@ -54,21 +53,33 @@ def end_datetime(row: Leg) -> Leg:
     return row
 
 
+def hours_between(start: datetime.datetime, end: datetime.datetime) -> float:
+    travel_time = end - start
+    return round(travel_time.total_seconds() / 60 / 60, 1)
+
+
+def height_change(start_fuel_height: str, end_fuel_height: str) -> float:
+    end_height = float(end_fuel_height)
+    start_height = float(start_fuel_height)
+    return start_height - end_height
+
+
+def rate(fuel_change: float, travel_hours: float) -> float:
+    return fuel_change / travel_hours
+
+
 def duration(row: Leg) -> Leg:
-    travel_time = row.end_timestamp - row.start_timestamp
-    row.travel_hours = round(travel_time.total_seconds() / 60 / 60, 1)
+    row.travel_hours = hours_between(row.start_timestamp, row.end_timestamp)
     return row
 
 
 def fuel_use(row: Leg) -> Leg:
-    end_height = float(row.end_fuel_height)
-    start_height = float(row.start_fuel_height)
-    row.fuel_change = start_height - end_height
+    row.fuel_change = height_change(row.start_fuel_height, row.end_fuel_height)
     return row
 
 
 def fuel_per_hour(row: Leg) -> Leg:
-    row.fuel_per_hour = row.fuel_change / row.travel_hours
+    row.fuel_per_hour = rate(row.fuel_change, row.travel_hours)
     return row
 
 
@@ -109,7 +120,8 @@ def avg_fuel_per_hour(source: Iterable[Leg]) -> float:
     return mean(row.fuel_per_hour for row in source)
 
 
-from statistics import stdev
+from math import sqrt
+from statistics import StatisticsError, stdev
 
 
 def stdev_fuel_per_hour(source: Iterable[Leg]) -> float:
@@ -120,16 +132,128 @@ def stdev_fuel_per_hour(source: Iterable[Leg]) -> float:
     return stdev(row.fuel_per_hour for row in source)
 
 
-def summary(raw_data: Iterable[List[str]]) -> None:
+@dataclass
+class FuelStats:
+    """
+    Partial results for :func:`total_fuel`, :func:`avg_fuel_per_hour`, and
+    :func:`stdev_fuel_per_hour`: the count, the total, and the running mean
+    and sum of squared deviations, ``m2``, of the fuel per hour, updated
+    with Welford's method. A sum of squares loses precision when the
+    values are large and close together; these don't. The results for
+    separate parts of a log can be merged with ``+``.
+
+    >>> stats = FuelStats.from_legs(clean_data_iter(row_merge(log_rows)))
+    >>> stats.count, stats.total_fuel, round(stats.mean, 3), round(stats.stdev, 4)
+    (2, 7.0, 0.48, 0.0897)
+    >>> big = FuelStats()
+    >>> for value in 1e9 + 4, 1e9 + 7, 1e9 + 13, 1e9 + 16:
+    ...     big.include(0.0, value)
+    >>> big.stdev ** 2
+    30.0
+    """
+
+    count: int = 0
+    total_fuel: float = 0.0
+    running_mean: float = 0.0
+    m2: float = 0.0
+
+    def include(self, fuel_change: float, fuel_per_hour: float) -> None:
+        self.count += 1
+        self.total_fuel += fuel_change
+        delta = fuel_per_hour - self.running_mean
+        self.running_mean += delta / self.count
+        self.m2 += delta * (fuel_per_hour - self.running_mean)
+
+    def add(self, row: Leg) -> None:
+        self.include(row.fuel_change, row.fuel_per_hour)
+
+    @classmethod
+    def from_legs(cls, source: Iterable[Leg]) -> "FuelStats":
+        stats = cls()
+        for row in source:
+            stats.add(row)
+        return stats
+
+    def __add__(self, other: "FuelStats") -> "FuelStats":
+        """
+        Chan's parallel update of the mean and ``m2``.
+
+        >>> legs = list(clean_data_iter(row_merge(log_rows)))
+        >>> merged = FuelStats.from_legs(legs[:1]) + FuelStats.from_legs(legs[1:])
+        >>> merged.count, merged.total_fuel, round(merged.mean, 3), round(merged.stdev, 4)
+        (2, 7.0, 0.48, 0.0897)
+        """
+        count = self.count + other.count
+        if count == 0:
+            return FuelStats()
+        delta = other.running_mean - self.running_mean
+        return FuelStats(
+            count,
+            self.total_fuel + other.total_fuel,
+            self.running_mean + delta * other.count / count,
+            self.m2 + other.m2 + delta * delta * self.count * other.count / count,
+        )
+
+    @property
+    def mean(self) -> float:
+        if self.count < 1:
+            raise StatisticsError("mean requires at least one data point")
+        return self.running_mean
+
+    @property
+    def stdev(self) -> float:
+        if self.count < 2:
+            raise StatisticsError("stdev requires at least two data points")
+        return sqrt(self.m2 / (self.count - 1))
+
+
+def raw_fuel_stats(source: Iterable[List[str]]) -> FuelStats:
+    """
+    The :class:`FuelStats` of the raw rows of a log, fused into one loop,
+    without creating any ``Leg`` objects.
+    """
+    stats = FuelStats()
+    include = stats.include
+    for row in row_merge(source):
+        if row.date == "date":
+            continue
+        # The formulas of the Leg stages, without the Leg.
+        travel_hours = hours_between(
+            timestamp(row.date, row.engine_on_time),
+            timestamp(row.date, row.engine_off_time),
+        )
+        fuel_change = height_change(row.engine_on_fuel_height, row.engine_off_fuel_height)
+        include(fuel_change, rate(fuel_change, travel_hours))
+    return stats
+
+
+def fuel_stats(data: Iterable[Union[List[str], Leg]]) -> FuelStats:
+    """
+    One pass over either ``Leg`` objects or the raw rows of a log.
+
+    >>> fuel_stats(log_rows) == fuel_stats(clean_data_iter(row_merge(log_rows)))
+    True
+    >>> fuel_stats([])
+    FuelStats(count=0, total_fuel=0.0, running_mean=0.0, m2=0.0)
+    """
+    data_iter = iter(data)
+    first = next(data_iter, None)
+    if first is None:
+        return FuelStats()
+    if isinstance(first, Leg):
+        return FuelStats.from_legs(chain([first], cast(Iterator[Leg], data_iter)))
+    return raw_fuel_stats(chain([first], cast(Iterator[List[str]], data_iter)))
+
+
+def summary(raw_data: Iterable[Union[List[str], Leg]]) -> None:
     """
     >>> summary(log_rows)
     Fuel use 0.48 ±0.18
+    >>> summary(clean_data_iter(row_merge(log_rows)))
+    Fuel use 0.48 ±0.18
     """
-    data = tuple(clean_data_iter(row_merge(raw_data)))
-    m = avg_fuel_per_hour(data)
-    s = 2 * stdev_fuel_per_hour(data)
-
-    print(f"Fuel use {m:.2f} ±{s:.2f}")
+    stats = fuel_stats(raw_data)
+    print(f"Fuel use {stats.mean:.2f} ±{2 * stats.stdev:.2f}")
 
 
 def summary_t(raw_data: Iterable[List[str]]):
@@ -168,3 +292,45 @@ def details(iterable):
     """
     for row in iterable:
         pprint(row)
+
+
+def summary_list(raw_data: Iterable[List[str]]) -> None:
+    """The previous summary(): a tuple of legs, and two more passes."""
+    data = tuple(clean_data_iter(row_merge(raw_data)))
+    m = avg_fuel_per_hour(data)
+    s = 2 * stdev_fuel_per_hour(data)
+    print(f"Fuel use {m:.2f} ±{s:.2f}")
+
+
+def benchmark(legs: int) -> None:
+    """
+    The time includes generating the rows. The peak memory, with
+    tracemalloc, is measured on a smaller log; it's slow.
+    """
+    import time
+    import tracemalloc
+    from collections import deque
+    from Chapter_09.ch09_fuel_parallel import generate_rows
+
+    start = time.perf_counter()
+    deque(generate_rows(legs), maxlen=0)
+    print(f"{'rows only':12s} {legs / (time.perf_counter() - start):10,.0f} legs/s")
+    sample = min(legs, 100_000)
+    for function in summary_list, summary:
+        start = time.perf_counter()
+        function(generate_rows(legs))
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        function(generate_rows(sample))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(
+            f"{function.__name__:12s} {legs / elapsed:10,.0f} legs/s, "
+            f"peak {peak / 2**20:6.1f} MiB for {sample:,d} legs"
+        )
+
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000)
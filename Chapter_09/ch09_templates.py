@@ -0,0 +1,335 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 9, Grouping log messages by template.
+
+Most log messages are made from a few templates with variable parts:
+``Request 17 took 12ms``. A :class:`TemplateMiner` learns the templates
+as messages arrive, with a fixed-depth tree like the Drain algorithm.
+
+1.  The messages are split into tokens. Tokens with digits, like ``42``,
+    ``12ms``, or ``user42``, and quoted tokens, like ``'alice'``, are
+    replaced by ``<*>``.
+
+2.  The first level of the tree is the number of tokens; the next
+    ``depth`` levels are the leading tokens. The last token is never part
+    of the path, so short messages which differ only at the end share a
+    leaf. A node has at most ``max_children`` children, counting the
+    ``<*>`` child which the other tokens share.
+
+3.  Each leaf has a list of templates. A message joins the most similar,
+    if at least ``similarity`` of the tokens match. Tokens which differ
+    become ``<*>``. Otherwise, it starts a new template.
+
+At most ``max_templates`` templates are created; after that, a message
+without a match is counted with the ``<other>`` template, id 0.
+"""
+import argparse
+import collections
+import operator
+import random
+import re
+import time
+from typing import Counter, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from Chapter_08.ch08_log_summary import LogSummary
+from Chapter_09.ch09_r01 import DatedLog
+
+WILDCARD = "<*>"
+OTHER = "<other>"
+
+# A digit anywhere, or a quote at either end, like template() in ch08_log_summary.
+variable_pattern = re.compile(r"\d|^['\"]|['\"]$")
+is_variable = variable_pattern.search
+
+# For ASCII text, set operations find the same tokens without the regex.
+DIGITS = frozenset("0123456789")
+QUOTES = frozenset("'\"")
+
+
+def mask(token: str) -> str:
+    """
+    >>> [mask(t) for t in "Request 17 took 12ms for 'a1b2' user".split()]
+    ['Request', '<*>', 'took', '<*>', 'for', '<*>', 'user']
+    >>> [mask(t) for t in ["'alice'", '"bob', 'smith"', "isn't"]]
+    ['<*>', '<*>', '<*>', "isn't"]
+
+    ``\\d`` matches any Unicode digit, so other text uses the pattern.
+
+    >>> [mask(t) for t in ["user\u0663", "caf\u00e9", "'caf\u00e9'", "caf\u00e9's"]]
+    ['<*>', 'café', '<*>', "café's"]
+    """
+    if token.isalpha():
+        return token
+    if token.isascii():
+        if DIGITS.isdisjoint(token) and token[0] not in QUOTES and token[-1] not in QUOTES:
+            return token
+    elif not is_variable(token):
+        return token
+    return WILDCARD
+
+
+class Template:
+    __slots__ = ("id", "tokens", "constants", "values", "count")
+
+    def __init__(self, id: int, tokens: List[str]) -> None:
+        self.id = id
+        self.count = 0
+        self.set_tokens(tokens)
+
+    def set_tokens(self, tokens: List[str]) -> None:
+        self.tokens = tokens
+        positions = [i for i, token in enumerate(tokens) if token != WILDCARD]
+        # Picks out the constant tokens of a message, to compare with ours.
+        self.constants = operator.itemgetter(*positions) if positions else None
+        self.values = self.constants(tokens) if self.constants else None
+
+    def same(self, tokens: List[str]) -> int:
+        """The number of tokens which match."""
+        return sum(map(operator.eq, self.tokens, tokens))
+
+    def merge(self, tokens: List[str]) -> None:
+        """Any constant token which differs becomes a wildcard."""
+        if self.constants and self.constants(tokens) != self.values:
+            self.set_tokens(
+                [
+                    mine if mine == theirs else WILDCARD
+                    for mine, theirs in zip(self.tokens, tokens)
+                ]
+            )
+
+    def __str__(self) -> str:
+        return " ".join(self.tokens)
+
+    def __repr__(self) -> str:
+        return f"Template({self.id}, {str(self)!r}, count={self.count})"
+
+
+class Node:
+    """A level of the tree: the children, by token; a leaf has templates."""
+    __slots__ = ("children", "templates")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, Node] = {}
+        self.templates: List[Template] = []
+
+
+class TemplateMiner:
+    def __init__(
+        self,
+        depth: int = 2,
+        similarity: float = 0.5,
+        max_children: int = 100,
+        max_templates: int = 1000,
+    ) -> None:
+        self.depth = depth
+        self.threshold = similarity
+        self.max_children = max_children
+        self.max_templates = max_templates
+        self.root: Dict[int, Node] = collections.defaultdict(Node)
+        # The leaf of each path through the tree, to skip the walk down.
+        self.leaves: Dict[Tuple[object, ...], List[Template]] = {}
+        self.other = Template(0, [OTHER])
+        self.by_id: List[Template] = [self.other]
+
+    def leaf(self, tokens: List[str]) -> List[Template]:
+        node = self.root[len(tokens)]
+        exact = True
+        for token in tokens[: min(self.depth, len(tokens) - 1)]:
+            children = node.children
+            if token not in children:
+                # Keep a place for the wildcard child.
+                if len(children) + (WILDCARD not in children) >= self.max_children:
+                    token, exact = WILDCARD, False
+                if token not in children:
+                    children[token] = Node()
+            node = children[token]
+        if exact:
+            # A token sent to the wildcard child isn't kept: there may be many.
+            self.leaves[self.path(tokens)] = node.templates
+        return node.templates
+
+    def path(self, tokens: List[str]) -> Tuple[object, ...]:
+        """The key of :attr:`leaves`: the length, and the tokens of the path."""
+        depth = self.depth if len(tokens) > self.depth else len(tokens) - 1
+        return (len(tokens), *tokens[:depth])
+
+    def match(self, message: str) -> Template:
+        """Find, or create, the template for a message."""
+        if message.isascii():
+            # mask(), inlined for ASCII text: this is the innermost loop.
+            tokens = [
+                token
+                if token.isalpha() or (
+                    DIGITS.isdisjoint(token)
+                    and token[0] not in QUOTES and token[-1] not in QUOTES
+                )
+                else WILDCARD
+                for token in message.split()
+            ] or [""]
+        else:
+            tokens = list(map(mask, message.split())) or [""]
+        # path(), inlined.
+        depth = self.depth if len(tokens) > self.depth else len(tokens) - 1
+        templates = self.leaves.get((len(tokens), *tokens[:depth]))
+        if templates is None:
+            templates = self.leaf(tokens)
+        best: Optional[Template] = None
+        best_same = -1
+        for candidate in templates:
+            # same(), inlined.
+            same = sum(map(operator.eq, candidate.tokens, tokens))
+            if same > best_same:
+                best, best_same = candidate, same
+        if best is not None and best_same >= self.threshold * len(tokens):
+            # Most messages don't change the template; skip the call to merge().
+            if best.constants and best.constants(tokens) != best.values:
+                best.merge(tokens)
+        elif len(self.by_id) <= self.max_templates:
+            best = Template(len(self.by_id), tokens)
+            self.by_id.append(best)
+            templates.append(best)
+        else:
+            best = self.other
+        return best
+
+    def add(self, message: str) -> int:
+        """Count the message; return its template id."""
+        template = self.match(message)
+        template.count += 1
+        return template.id
+
+    def __getitem__(self, id: int) -> Template:
+        return self.by_id[id]
+
+    def templates(self) -> Counter[str]:
+        """The counts of each template, by its final text."""
+        counts: Counter[str] = collections.Counter()
+        for template in self.by_id:
+            if template.count:
+                counts[str(template)] += template.count
+        return counts
+
+    def feed(self, summary: LogSummary) -> LogSummary:
+        """Add the template counts to a summary."""
+        for key, count in self.templates().most_common():
+            summary.count_template(key, count)
+        return summary
+
+
+def template_iter(
+    source: Iterable[DatedLog], miner: TemplateMiner
+) -> Iterator[Tuple[DatedLog, int]]:
+    """Each log record, with its template id."""
+    for item in source:
+        yield item, miner.add(item.message)
+
+
+test_template_miner = """
+>>> miner = TemplateMiner()
+>>> messages = [
+...     "Request 17 took 12ms",
+...     "Request 18 took 9ms",
+...     "Login for user alice from 10.0.0.1",
+...     "Login for user bob from 10.0.0.2",
+...     "Cache miss for key 'a1b2'",
+...     "Request 19 took 150ms",
+...     "Shutting down",
+... ]
+>>> [miner.add(m) for m in messages]
+[1, 1, 2, 2, 3, 1, 4]
+>>> miner[2]
+Template(2, 'Login for user <*> from <*>', count=2)
+>>> miner.templates().most_common(2)
+[('Request <*> took <*>', 3), ('Login for user <*> from <*>', 2)]
+"""
+
+test_mask_matches_pattern = """
+>>> import itertools
+>>> tokens = ["".join(t) for n in (1, 2, 3) for t in itertools.product("a1'\\"._", repeat=n)]
+>>> all(mask(t) == (WILDCARD if is_variable(t) else t) for t in tokens)
+True
+>>> miner = TemplateMiner()
+>>> miner.match("Caf\u00e9 user\u0663 'caf\u00e9' ok")
+Template(1, 'Café <*> <*> ok', count=0)
+"""
+
+test_bounded = """
+>>> miner = TemplateMiner(max_templates=2)
+>>> [miner.add(m) for m in ["alpha one", "beta two three", "gamma four five six", "alpha two"]]
+[1, 2, 0, 1]
+>>> sorted(miner.templates().items())
+[('<other>', 1), ('alpha <*>', 2), ('beta two three', 1)]
+"""
+
+test_max_children = """
+>>> miner = TemplateMiner(depth=1, max_children=3)
+>>> [miner.add(f"{name} started now") for name in ["alpha", "beta", "gamma", "delta"]]
+[1, 2, 3, 3]
+>>> sorted(miner.root[3].children)
+['<*>', 'alpha', 'beta']
+>>> sorted(miner.leaves)
+[(3, 'alpha'), (3, 'beta')]
+>>> miner[3]
+Template(3, '<*> started now', count=2)
+"""
+
+test_pipeline = """
+>>> from Chapter_08.ch08_log_summary import LogSummary
+>>> from Chapter_09.ch09_r01 import parse_line_iter, parse_date_iter
+>>> from Chapter_09.ch09_r04 import module_iter
+>>> log_lines = [
+...     '[2016-04-24 11:05:01,462] INFO in module1: Request 17 took 12ms',
+...     '[2016-04-24 11:06:02,624] DEBUG in module2: Cache miss for key a1',
+...     '[2016-04-24 11:06:03,624] DEBUG in module2: Cache miss for key b7',
+...     '[2016-04-24 11:07:03,246] INFO in module1: Request 18 took 9ms',
+... ]
+>>> miner = TemplateMiner()
+>>> module2 = module_iter(parse_date_iter(parse_line_iter(log_lines)))
+>>> [(item.date.second, id) for item, id in template_iter(module2, miner)]
+[(2, 1), (3, 1)]
+>>> summary = miner.feed(LogSummary(templater=None))
+>>> summary.templates
+Counter({'Cache miss for key <*>': 2})
+"""
+
+
+def benchmark(count: int, seed: int = 42) -> None:
+    formats = [
+        "Request {n} took {m}ms",
+        "Login for user{u} from 10.0.{m}.1",
+        "Cache miss for key k{n}",
+        "Worker {u} started job {n}",
+        "Connection reset by peer 10.1.{m}.2 port {n}",
+    ]
+    rng = random.Random(seed)
+    messages = [
+        rng.choice(formats).format(
+            n=rng.randrange(100_000), m=rng.randrange(1000), u=rng.randrange(5000)
+        )
+        for _ in range(count)
+    ]
+    miner = TemplateMiner()
+    start = time.perf_counter()
+    for message in messages:
+        miner.add(message)
+    elapsed = time.perf_counter() - start
+    print(f"{count / elapsed:,.0f} lines/s, {len(miner.by_id) - 1} templates")
+    for template, total in miner.templates().most_common():
+        print(f"{total:8d} {template}")
+
+
+def get_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--lines", type=int, default=1_000_000)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(argv)
+    benchmark(options.lines)
+
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 9, Fast timestamp parsing for fixed-format log and fuel-log dates.
+
+``datetime.datetime.strptime()`` is general, and slow: it interprets the format
+and matches a regular expression for each call. The log files have a fixed
+layout, ``2016-04-24 11:05:01,462``, so the fields can be sliced out and
+converted with ``int()``. Consecutive log lines usually share the date and
+time down to the second, so that prefix is parsed once and cached; only the
+fraction is converted for each line.
+
+Other logs use the same fields with other separators, like
+``2019/11/12:08:09:10,123``; :func:`log_timestamp` accepts any
+``%Y?%m?%d?%H?%M?%S?%f`` format.
+
+Anything which doesn't fit the fixed layout is handed to ``strptime()``,
+so the results, and the exceptions, are the same.
+"""
+import datetime
+from functools import lru_cache
+from typing import Optional
+
+LOG_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
+FUEL_DATE_FORMAT = "%m/%d/%y"
+FUEL_TIME_FORMAT = "%I:%M:%S %p"
+ISO_DATE_FORMAT = "%Y-%m-%d"
+ISO_TIME_FORMAT = "%H:%M:%S"
+
+DIGITS = frozenset("0123456789")
+
+#: Scale a fraction of 1 to 6 digits to microseconds.
+FRACTION_SCALE = (0, 100_000, 10_000, 1_000, 100, 10, 1)
+
+
+@lru_cache(maxsize=None)
+def separators(format: str) -> Optional[str]:
+    """
+    The six separators of a ``%Y?%m?%d?%H?%M?%S?%f`` format, or None
+    for any other format.
+
+    >>> separators(LOG_FORMAT)
+    '-- ::,'
+    >>> separators("%Y/%m/%d:%H:%M:%S,%f")
+    '//:::,'
+    >>> print(separators("%d/%m/%Y %H:%M"))
+    None
+    """
+    if len(format) == 20 and format[0::3] == "%" * 7 and format[1::3] == "YmdHMSf":
+        return format[2::3]
+    return None
+
+
+LOG_SEPARATORS = separators(LOG_FORMAT)
+
+
+@lru_cache(maxsize=1024)
+def log_seconds(prefix: str) -> datetime.datetime:
+    """
+    Parse the fields of ``YYYY-mm-dd HH:MM:SS``. The caller checks the
+    separators. Raises ValueError if the fields aren't digits, or aren't
+    valid; the caller falls back to ``strptime()``.
+    """
+    if len(prefix) != 19 or not DIGITS.issuperset(
+        prefix[0:4] + prefix[5:7] + prefix[8:10]
+        + prefix[11:13] + prefix[14:16] + prefix[17:19]
+    ):
+        raise ValueError(f"unexpected layout {prefix!r}")
+    return datetime.datetime(
+        int(prefix[0:4]), int(prefix[5:7]), int(prefix[8:10]),
+        int(prefix[11:13]), int(prefix[14:16]), int(prefix[17:19]),
+    )
+
+
+def log_timestamp(text: str, format: str = LOG_FORMAT) -> datetime.datetime:
+    """
+    Equivalent to ``datetime.datetime.strptime(text, format)``, where the
+    format is ``"%Y-%m-%d %H:%M:%S,%f"``, or the same fields with other
+    separators.
+
+    >>> log_timestamp("2016-04-24 11:05:01,462")
+    datetime.datetime(2016, 4, 24, 11, 5, 1, 462000)
+    >>> log_timestamp("2016-04-24 11:05:01,000462")
+    datetime.datetime(2016, 4, 24, 11, 5, 1, 462)
+    >>> log_timestamp("2019/11/12:08:09:10,5", "%Y/%m/%d:%H:%M:%S,%f")
+    datetime.datetime(2019, 11, 12, 8, 9, 10, 500000)
+
+    Unusual, but valid, values use ``strptime()``.
+
+    >>> log_timestamp("2016-4-24 11:05:01,5")
+    datetime.datetime(2016, 4, 24, 11, 5, 1, 500000)
+
+    Invalid values raise the same exception ``strptime()`` raises.
+
+    >>> log_timestamp("2016-04-24 25:05:01,462")
+    Traceback (most recent call last):
+    ...
+    ValueError: time data '2016-04-24 25:05:01,462' does not match format '%Y-%m-%d %H:%M:%S,%f'
+    """
+    layout = LOG_SEPARATORS if format == LOG_FORMAT else separators(format)
+    fraction = text[20:]
+    if (
+        text[4:20:3] == layout
+        and 0 < len(fraction) <= 6 and DIGITS.issuperset(fraction)
+    ):
+        try:
+            seconds = log_seconds(text[:19])
+        except ValueError:
+            pass
+        else:
+            return seconds.replace(
+                microsecond=int(fraction) * FRACTION_SCALE[len(fraction)]
+            )
+    return datetime.datetime.strptime(text, format)
+
+
+@lru_cache(maxsize=1024)
+def fuel_date(date_text: str) -> datetime.date:
+    """
+    Equivalent to ``datetime.datetime.strptime(date_text, "%m/%d/%y").date()``.
+
+    >>> fuel_date("10/25/13")
+    datetime.date(2013, 10, 25)
+    >>> fuel_date("1/2/99")
+    datetime.date(1999, 1, 2)
+    """
+    if (
+        len(date_text) == 8
+        and date_text[2] == "/" and date_text[5] == "/"
+        and DIGITS.issuperset(date_text[0:2] + date_text[3:5] + date_text[6:8])
+    ):
+        try:
+            year = int(date_text[6:8])
+            # The POSIX convention strptime() follows for %y.
+            year += 2000 if year < 69 else 1900
+            return datetime.date(year, int(date_text[0:2]), int(date_text[3:5]))
+        except ValueError:
+            pass
+    return datetime.datetime.strptime(date_text, FUEL_DATE_FORMAT).date()
+
+
+@lru_cache(maxsize=4096)
+def fuel_time(time_text: str) -> datetime.time:
+    """
+    Equivalent to ``datetime.datetime.strptime(time_text, "%I:%M:%S %p").time()``.
+
+    >>> fuel_time("08:24:00 AM")
+    datetime.time(8, 24)
+    >>> fuel_time("12:15:00 AM"), fuel_time("12:15:00 PM")
+    (datetime.time(0, 15), datetime.time(12, 15))
+    """
+    meridian = time_text[9:]
+    if (
+        len(time_text) == 11
+        and time_text[2] == ":" and time_text[5] == ":" and time_text[8] == " "
+        and meridian in ("AM", "PM")
+        and DIGITS.issuperset(time_text[0:2] + time_text[3:5] + time_text[6:8])
+    ):
+        hour = int(time_text[0:2])
+        if 1 <= hour <= 12:
+            try:
+                return datetime.time(
+                    hour % 12 + (12 if meridian == "PM" else 0),
+                    int(time_text[3:5]),
+                    int(time_text[6:8]),
+                )
+            except ValueError:
+                pass
+    return datetime.datetime.strptime(time_text, FUEL_TIME_FORMAT).time()
+
+
+@lru_cache(maxsize=4096)
+def iso_date(date_text: str) -> datetime.date:
+    """
+    Equivalent to ``datetime.datetime.strptime(date_text, "%Y-%m-%d").date()``.
+
+    >>> iso_date("2012-11-27")
+    datetime.date(2012, 11, 27)
+    """
+    if (
+        len(date_text) == 10 and date_text[4] == "-" and date_text[7] == "-"
+        and DIGITS.issuperset(date_text[0:4] + date_text[5:7] + date_text[8:10])
+    ):
+        try:
+            return datetime.date(
+                int(date_text[0:4]), int(date_text[5:7]), int(date_text[8:10])
+            )
+        except ValueError:
+            pass
+    return datetime.datetime.strptime(date_text, ISO_DATE_FORMAT).date()
+
+
+@lru_cache(maxsize=4096)
+def iso_time(time_text: str) -> datetime.time:
+    """
+    Equivalent to ``datetime.datetime.strptime(time_text, "%H:%M:%S").time()``.
+
+    >>> iso_time("09:15:00")
+    datetime.time(9, 15)
+    """
+    if (
+        len(time_text) == 8 and time_text[2] == ":" and time_text[5] == ":"
+        and DIGITS.issuperset(time_text[0:2] + time_text[3:5] + time_text[6:8])
+    ):
+        try:
+            return datetime.time(
+                int(time_text[0:2]), int(time_text[3:5]), int(time_text[6:8])
+            )
+        except ValueError:
+            pass
+    return datetime.datetime.strptime(time_text, ISO_TIME_FORMAT).time()
+
+
+def fuel_timestamp(date_text: str, time_text: str) -> datetime.datetime:
+    """
+    >>> fuel_timestamp("10/25/13", "01:15:00 PM")
+    datetime.datetime(2013, 10, 25, 13, 15)
+    """
+    return datetime.datetime.combine(fuel_date(date_text), fuel_time(time_text))
+
+
+test_log_timestamp_matches_strptime = """
+>>> import random
+>>> random.seed(42)
+>>> start = datetime.datetime(1999, 12, 31, 23, 59, 58)
+>>> texts = [
+...     (start + datetime.timedelta(milliseconds=random.randrange(10_000_000))).strftime(LOG_FORMAT)[:-3]
+...     for _ in range(1000)
+... ]
+>>> all(log_timestamp(t) == datetime.datetime.strptime(t, LOG_FORMAT) for t in texts)
+True
+>>> odd = ["2016-04-24T11:05:01,462", "2016-04-24 11:05:01.462", "2016-02-30 11:05:01,462",
+...     "2016-04-24 11:05:01,", "2016-04-24 11:05:1_0,462", "2016-04-24 11:05:01,1234567"]
+>>> def outcome(function, text):
+...     try:
+...         return function(text)
+...     except ValueError as ex:
+...         return str(ex)
+>>> all(
+...     outcome(log_timestamp, t) == outcome(lambda t: datetime.datetime.strptime(t, LOG_FORMAT), t)
+...     for t in odd
+... )
+True
+>>> slashes = "%Y/%m/%d:%H:%M:%S,%f"
+>>> all(
+...     outcome(lambda t: log_timestamp(t, slashes), t.replace("-", "/").replace(" ", ":"))
+...     == outcome(lambda t: datetime.datetime.strptime(t, slashes), t.replace("-", "/").replace(" ", ":"))
+...     for t in texts[:100] + odd
+... )
+True
+>>> log_timestamp("2016-04-24 11:05:01 462", "%Y-%m-%d %H:%M:%S %f")
+datetime.datetime(2016, 4, 24, 11, 5, 1, 462000)
+>>> iso = ["2012-11-27", "2012-2-3", "2013-02-29", "09:15:00", "9:05:00", "24:00:00", "23:59:60"]
+>>> [outcome(iso_date, t) == outcome(lambda t: datetime.datetime.strptime(t, ISO_DATE_FORMAT).date(), t)
+...     for t in iso[:3]]
+[True, True, True]
+>>> [outcome(iso_time, t) == outcome(lambda t: datetime.datetime.strptime(t, ISO_TIME_FORMAT).time(), t)
+...     for t in iso[3:]]
+[True, True, True, True]
+"""
+
+test_fuel_matches_strptime = """
+>>> times = [f"{h:02d}:{m:02d}:00 {p}" for h in range(1, 13) for m in (0, 59) for p in ("AM", "PM")]
+>>> all(
+...     fuel_time(t) == datetime.datetime.strptime(t, FUEL_TIME_FORMAT).time()
+...     for t in times
+... )
+True
+>>> fuel_time("8:24:00 am")
+datetime.time(8, 24)
+>>> dates = ["10/25/13", "01/01/68", "12/31/69", "02/29/00"]
+>>> all(
+...     fuel_date(d) == datetime.datetime.strptime(d, FUEL_DATE_FORMAT).date()
+...     for d in dates
+... )
+True
+"""
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
@@ -0,0 +1,324 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 10, Writing logs in a columnar format for analysis.
+
+:func:`Chapter_10.ch10_r05.copy` writes a CSV file. That's slow to write,
+and every field of every row must be parsed again to analyze it.
+
+:func:`export` writes parsed ``LogLine`` rows in a columnar format, using
+only the :mod:`array` and :mod:`struct` modules. The rows are written in row
+groups of a bounded size. Each row group has these columns:
+
+-   timestamps, as int64 microseconds since 1970-01-01 (the log's own,
+    naive, local time),
+-   level and module, dictionary-encoded: a list of distinct strings and
+    an array of uint32 codes,
+-   messages, as an array of uint64 offsets into one UTF-8 blob.
+
+A directory of section sizes precedes each row group. :func:`load` can
+filter on level or module using the codes; it seeks past the messages
+of a group with no matching rows, and decodes only the matching messages.
+"""
+import argparse
+import csv
+import datetime
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import (
+    BinaryIO, Collection, Dict, Iterable, Iterator, List, NamedTuple, Optional
+)
+
+from Chapter_09.ch09_r01 import DatedLog
+from Chapter_09.ch09_timestamp import log_timestamp
+from Chapter_10.ch10_r05 import LogLine, copy, log_parser
+
+MAGIC = b"LOGCOL1\n"
+GROUP_HEADER = struct.Struct("<4sI5Q")
+STRING_LENGTH = struct.Struct("<I")
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def to_microseconds(date_text: str) -> int:
+    """
+    >>> to_microseconds("2016-06-15 17:57:54,715")
+    1466013474715000
+    """
+    return (log_timestamp(date_text) - EPOCH) // MICROSECOND
+
+
+def little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def from_little_endian(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def encode_strings(strings: List[str]) -> bytes:
+    parts = [STRING_LENGTH.pack(len(strings))]
+    for text in strings:
+        encoded = text.encode("utf-8")
+        parts.append(STRING_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    return b"".join(parts)
+
+
+def decode_strings(data: bytes) -> List[str]:
+    (count,) = STRING_LENGTH.unpack_from(data, 0)
+    position = STRING_LENGTH.size
+    strings = []
+    for _ in range(count):
+        (size,) = STRING_LENGTH.unpack_from(data, position)
+        position += STRING_LENGTH.size
+        strings.append(data[position : position + size].decode("utf-8"))
+        position += size
+    return strings
+
+
+class RowGroupWriter:
+    """Accumulates the columns of one row group."""
+
+    def __init__(self) -> None:
+        self.timestamps = array("q")
+        self.level_codes = array("I")
+        self.module_codes = array("I")
+        self.levels: Dict[str, int] = {}
+        self.modules: Dict[str, int] = {}
+        self.offsets = array("Q", [0])
+        self.messages: List[bytes] = []
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, row: LogLine) -> None:
+        self.timestamps.append(to_microseconds(row.date))
+        self.level_codes.append(self.levels.setdefault(row.level, len(self.levels)))
+        self.module_codes.append(self.modules.setdefault(row.module, len(self.modules)))
+        message = row.message.encode("utf-8")
+        self.messages.append(message)
+        self.offsets.append(self.offsets[-1] + len(message))
+
+    def write(self, target: BinaryIO) -> None:
+        sections = [
+            encode_strings(list(self.levels)) + encode_strings(list(self.modules)),
+            little_endian(self.timestamps),
+            little_endian(self.level_codes) + little_endian(self.module_codes),
+            little_endian(self.offsets),
+            b"".join(self.messages),
+        ]
+        target.write(
+            GROUP_HEADER.pack(b"RGRP", len(self), *(len(s) for s in sections))
+        )
+        for section in sections:
+            target.write(section)
+
+
+def export(
+    source: Iterable[LogLine], target_path: Path, row_group_size: int = 65_536
+) -> int:
+    """Write the rows in columnar form. Returns the number of rows."""
+    count = 0
+    with target_path.open("wb") as target:
+        target.write(MAGIC)
+        group = RowGroupWriter()
+        for row in source:
+            group.append(row)
+            if len(group) == row_group_size:
+                group.write(target)
+                count += len(group)
+                group = RowGroupWriter()
+        if len(group):
+            group.write(target)
+            count += len(group)
+    return count
+
+
+def copy_columnar(data_path: Path, row_group_size: int = 65_536) -> Path:
+    """Like :func:`Chapter_10.ch10_r05.copy`, but columnar."""
+    target_path = data_path.with_suffix(".logcol")
+    with data_path.open() as data_file:
+        export(map(log_parser, data_file), target_path, row_group_size)
+    return target_path
+
+
+class RowGroup(NamedTuple):
+    """The decoded columns of one row group; messages aren't read."""
+
+    timestamps: array
+    levels: List[str]
+    level_codes: array
+    modules: List[str]
+    module_codes: array
+    offsets_size: int
+    messages_size: int
+
+
+def read_group(source: BinaryIO) -> Optional[RowGroup]:
+    """Read a row group, leaving the file at the start of the message offsets."""
+    header = source.read(GROUP_HEADER.size)
+    if not header:
+        return None
+    tag, rows, dict_size, ts_size, code_size, offsets_size, messages_size = (
+        GROUP_HEADER.unpack(header)
+    )
+    if tag != b"RGRP":
+        raise ValueError(f"Unexpected row group tag {tag!r}")
+    dictionaries = source.read(dict_size)
+    levels = decode_strings(dictionaries)
+    modules = decode_strings(dictionaries[len(encode_strings(levels)) :])
+    timestamps = from_little_endian("q", source.read(ts_size))
+    codes = from_little_endian("I", source.read(code_size))
+    return RowGroup(
+        timestamps, levels, codes[:rows], modules, codes[rows:],
+        offsets_size, messages_size,
+    )
+
+
+def read_groups(path: Path) -> Iterator[RowGroup]:
+    """All the row groups, without the messages."""
+    with path.open("rb") as source:
+        if source.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a columnar log")
+        while group := read_group(source):
+            source.seek(group.offsets_size + group.messages_size, 1)
+            yield group
+
+
+def load(
+    path: Path,
+    levels: Optional[Collection[str]] = None,
+    modules: Optional[Collection[str]] = None,
+) -> Iterator[DatedLog]:
+    """
+    The rows, optionally only those with the given levels and modules.
+    Only the messages of the matching rows are read and decoded.
+    """
+    with path.open("rb") as source:
+        if source.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a columnar log")
+        while group := read_group(source):
+            level_ok = [levels is None or name in levels for name in group.levels]
+            module_ok = [modules is None or name in modules for name in group.modules]
+            rows = [
+                i
+                for i, (level, module) in enumerate(
+                    zip(group.level_codes, group.module_codes)
+                )
+                if level_ok[level] and module_ok[module]
+            ]
+            if not rows:
+                source.seek(group.offsets_size + group.messages_size, 1)
+                continue
+            offsets = from_little_endian("Q", source.read(group.offsets_size))
+            blob = source.read(group.messages_size)
+            for i in rows:
+                yield DatedLog(
+                    EPOCH + group.timestamps[i] * MICROSECOND,
+                    group.levels[group.level_codes[i]],
+                    group.modules[group.module_codes[i]],
+                    blob[offsets[i] : offsets[i + 1]].decode("utf-8"),
+                )
+
+
+test_export = """
+>>> import tempfile
+>>> rows = [
+...     LogLine("2016-06-15 17:57:54,715", "INFO", "ch10_r10", "Sample Message One"),
+...     LogLine("2016-06-15 17:57:54,716", "DEBUG", "ch10_r10", "Debugging"),
+...     LogLine("2016-06-15 17:57:55,001", "WARNING", "other", "Something might have gone wrong ✓"),
+...     LogLine("2016-06-15 17:57:56,250", "INFO", "other", "Sample Message Two"),
+...     LogLine("2016-06-15 17:57:57,500", "DEBUG", "ch10_r10", "Debugging"),
+... ]
+>>> with tempfile.TemporaryDirectory() as working:
+...     path = Path(working) / "sample.logcol"
+...     export(rows, path, row_group_size=2)
+...     groups = list(read_groups(path))
+...     everything = list(load(path))
+...     info = list(load(path, levels={"INFO"}))
+...     other_warnings = list(load(path, levels={"WARNING", "ERROR"}, modules={"other"}))
+5
+>>> [len(g.timestamps) for g in groups]
+[2, 2, 1]
+>>> groups[1].levels, list(groups[1].level_codes)
+(['WARNING', 'INFO'], [0, 1])
+>>> [(r.date.isoformat(timespec="milliseconds"), r.level, r.module, r.message) for r in everything] == [
+...     (log_timestamp(r.date).isoformat(timespec="milliseconds"), r.level, r.module, r.message) for r in rows]
+True
+>>> [r.message for r in info]
+['Sample Message One', 'Sample Message Two']
+>>> other_warnings
+[DatedLog(date=datetime.datetime(2016, 6, 15, 17, 57, 55, 1000), level='WARNING', module='other', message='Something might have gone wrong ✓')]
+"""
+
+test_copy_columnar = """
+>>> target = copy_columnar(Path("data") / "sample.log")
+>>> target.name
+'sample.logcol'
+>>> for row in load(target, levels={"DEBUG"}):
+...     print(row)
+DatedLog(date=datetime.datetime(2016, 6, 15, 17, 57, 54, 715000), level='DEBUG', module='ch10_r10', message='Debugging')
+>>> target.unlink()
+"""
+
+
+def benchmark(data_path: Path, row_group_size: int) -> None:
+    start = time.perf_counter()
+    copy(data_path)
+    csv_write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    target = copy_columnar(data_path, row_group_size)
+    columnar_write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with data_path.with_suffix(".csv").open() as source:
+        csv_errors = sum(1 for row in csv.DictReader(source) if row["level"] == "ERROR")
+    csv_read = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columnar_errors = sum(1 for row in load(target, levels={"ERROR"}))
+    columnar_read = time.perf_counter() - start
+    assert csv_errors == columnar_errors
+
+    csv_size = data_path.with_suffix(".csv").stat().st_size
+    print(f"{'':10s} {'write':>8s} {'filter':>8s} {'MiB':>8s}")
+    print(f"{'csv':10s} {csv_write:8.2f} {csv_read:8.2f} {csv_size / 2**20:8.1f}")
+    print(
+        f"{'columnar':10s} {columnar_write:8.2f} {columnar_read:8.2f} "
+        f"{target.stat().st_size / 2**20:8.1f}"
+    )
+
+
+def get_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=Path)
+    parser.add_argument("-s", "--size-mb", type=int, default=100,
+        help="create a synthetic log of this size if the path doesn't exist")
+    parser.add_argument("-g", "--row-group-size", type=int, default=65_536)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from Chapter_10.ch10_mmap_log import make_synthetic_log
+
+    options = get_options(argv)
+    if not options.path.exists():
+        make_synthetic_log(options.path, options.size_mb * 2**20)
+    benchmark(options.path, options.row_group_size)
+
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
+
+if __name__ == "__main__":
+    main()
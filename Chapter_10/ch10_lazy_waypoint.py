@@ -0,0 +1,202 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 10, A waypoint with lazily computed, cached fields
+
+:class:`Chapter_10.ch10_r04.Waypoint` computes ``lat_lon``, ``ts_date``,
+``ts_time``, and ``timestamp`` in ``__post_init__()``, even when only
+``lat_lon`` is used. :class:`Chapter_10.ch10_r09.Waypoint_1` caches only
+the timestamp, and recomputes ``lat_lon`` on every use.
+
+A :class:`LazyWaypoint` keeps only the raw row when it's created. Each
+derived field is a property, computed the first time it's used, and kept
+in a slot. ``functools.cached_property`` can't be used: it needs an
+instance ``__dict__``, which a class with ``__slots__`` doesn't have.
+The slots start as ``None``; checking for ``None`` is much faster than
+catching the ``AttributeError`` of an unset slot.
+
+A malformed date or time raises the same ``ValueError`` as ``Waypoint``,
+when the field is first used instead of when the object is created.
+"""
+import argparse
+import datetime
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from Chapter_10.ch10_r04 import Raw, RawRow, Waypoint
+from Chapter_10.ch10_r09 import Waypoint_1
+from Chapter_10.ch10_waypoint_columns import EPOCH_ORDINAL, day_seconds, epoch_day
+
+
+class LazyWaypoint:
+    __slots__ = ("raw", "_lat_lon", "_ts_date", "_ts_time", "_timestamp")
+
+    def __init__(self, raw: Raw) -> None:
+        self.raw = raw
+        self._lat_lon: Optional[Tuple[float, float]] = None
+        self._ts_date: Optional[datetime.date] = None
+        self._ts_time: Optional[datetime.time] = None
+        self._timestamp: Optional[datetime.datetime] = None
+
+    @staticmethod
+    def from_source(row: Dict[str, str]) -> "LazyWaypoint":
+        """From a ``csv.DictReader`` row, like ``Waypoint_1.from_source()``."""
+        return LazyWaypoint(RawRow(row["date"], row["time"], row["lat"], row["lon"]))
+
+    @property
+    def lat_lon(self) -> Tuple[float, float]:
+        if self._lat_lon is None:
+            self._lat_lon = (float(self.raw.lat), float(self.raw.lon))
+        return self._lat_lon
+
+    @property
+    def ts_date(self) -> datetime.date:
+        if self._ts_date is None:
+            self._ts_date = datetime.date.fromordinal(
+                epoch_day(self.raw.date) + EPOCH_ORDINAL
+            )
+        return self._ts_date
+
+    @property
+    def ts_time(self) -> datetime.time:
+        if self._ts_time is None:
+            minutes, second = divmod(day_seconds(self.raw.time), 60)
+            hour, minute = divmod(minutes, 60)
+            self._ts_time = datetime.time(hour, minute, second)
+        return self._ts_time
+
+    @property
+    def timestamp(self) -> datetime.datetime:
+        if self._timestamp is None:
+            self._timestamp = datetime.datetime.combine(self.ts_date, self.ts_time)
+        return self._timestamp
+
+    @property
+    def arrival(self) -> datetime.datetime:
+        """The ``Waypoint_1`` name for the timestamp."""
+        return self.timestamp
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, LazyWaypoint):
+            return NotImplemented
+        return self.raw == other.raw
+
+    def __repr__(self) -> str:
+        return f"LazyWaypoint(raw={self.raw!r})"
+
+
+test_lazy_waypoint = """
+>>> waypoint = LazyWaypoint(RawRow("2012-11-27", "09:15:00", "32.8321666666667", "-79.9338333333333"))
+>>> waypoint
+LazyWaypoint(raw=RawRow(date='2012-11-27', time='09:15:00', lat='32.8321666666667', lon='-79.9338333333333'))
+>>> waypoint._lat_lon, waypoint._timestamp
+(None, None)
+>>> waypoint.lat_lon
+(32.8321666666667, -79.9338333333333)
+>>> waypoint.timestamp
+datetime.datetime(2012, 11, 27, 9, 15)
+>>> waypoint._timestamp is waypoint.timestamp is waypoint.arrival
+True
+>>> waypoint._lat_lon is waypoint.lat_lon
+True
+>>> hasattr(waypoint, "__dict__")
+False
+
+The fields match the eager classes.
+
+>>> import csv
+>>> from pathlib import Path
+>>> with Path("data/waypoints.csv").open() as data_file:
+...     rows = list(csv.DictReader(data_file))
+>>> for row in rows:
+...     lazy_wp = LazyWaypoint.from_source(row)
+...     eager = Waypoint(RawRow(**row))
+...     assert (lazy_wp.lat_lon, lazy_wp.ts_date, lazy_wp.ts_time, lazy_wp.timestamp) == (
+...         eager.lat_lon, eager.ts_date, eager.ts_time, eager.timestamp)
+...     assert lazy_wp.arrival == Waypoint_1.from_source(row).arrival
+>>> LazyWaypoint.from_source(rows[0]) == LazyWaypoint.from_source(rows[0])
+True
+"""
+
+test_malformed = """
+>>> def error(make):
+...     try:
+...         make()
+...     except ValueError as exception:
+...         return str(exception)
+>>> for date, time in [
+...     ("2012-11-27", "09:-1:00"), ("2012-11-27", "-1:00:00"),
+...     ("2012-11-27", "24:00:00"), ("2012-+1-27", "09:15:00"),
+... ]:
+...     raw = RawRow(date, time, "32.83", "-79.93")
+...     lazy_wp = LazyWaypoint(raw)
+...     eager = error(lambda: Waypoint(raw))
+...     print(eager == error(lambda: lazy_wp.timestamp), eager)
+True time data '09:-1:00' does not match format '%H:%M:%S'
+True time data '-1:00:00' does not match format '%H:%M:%S'
+True time data '24:00:00' does not match format '%H:%M:%S'
+True time data '2012-+1-27' does not match format '%Y-%m-%d'
+"""
+
+
+def measure(
+    name: str, make: Callable[[RawRow], Any], raws: List[RawRow],
+    use: Callable[[Any], Any],
+) -> None:
+    gc.collect()
+    start = time.perf_counter()
+    records = [make(raw) for raw in raws]
+    create = time.perf_counter() - start
+    start = time.perf_counter()
+    for record in records:
+        use(record)
+    used = time.perf_counter() - start
+    del records
+
+    sample = raws[:100_000]
+    gc.collect()
+    tracemalloc.start()
+    records = [make(raw) for raw in sample]
+    size = tracemalloc.get_traced_memory()[0] / len(sample)
+    tracemalloc.stop()
+    del records
+
+    count = len(raws)
+    print(
+        f"{name:12s} create {count / create:10,.0f}/s {size:6.0f} bytes/record, "
+        f"then lat_lon {count / used:12,.0f}/s"
+    )
+
+
+def benchmark(count: int) -> None:
+    raws = [
+        RawRow("2012-11-27", f"{n // 3600 % 24:02d}:{n // 60 % 60:02d}:{n % 60:02d}",
+               f"{32 + n / count:.6f}", f"{-79 - n / count:.6f}")
+        for n in range(count)
+    ]
+    lat_lon = lambda record: record.lat_lon
+    measure("Waypoint", Waypoint, raws, lat_lon)
+    measure(
+        "Waypoint_1",
+        lambda raw: Waypoint_1(raw.date, raw.time, raw.lat, raw.lon),
+        raws, lat_lon,
+    )
+    measure("LazyWaypoint", LazyWaypoint, raws, lat_lon)
+
+
+def get_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rows", type=int, default=10_000_000)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(argv)
+    benchmark(options.rows)
+
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
+
+if __name__ == "__main__":
+    main()
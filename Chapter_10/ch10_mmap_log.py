@@ -0,0 +1,224 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 10, Reading very large log files with mmap and a process pool.
+
+The file is memory-mapped and split into byte ranges which end on a newline.
+Each range is parsed by a worker process. The results are yielded
+in file order, with only a few ranges in flight at once.
+
+The log format is the one parsed by :func:`Chapter_10.ch10_r05.log_parser`
+and :func:`Chapter_09.ch09_r01.parse_line_iter`. As with ``parse_line_iter()``,
+lines which don't match the pattern are skipped.
+"""
+import argparse
+import collections
+import functools
+import mmap
+import re
+import time
+from pathlib import Path
+from typing import Callable, Counter, Iterator, List, Optional, Tuple, TypeVar
+
+from Chapter_07.ch07_pool import ordered_map
+from Chapter_10.ch10_r05 import LogLine, log_parser
+
+# The pattern of ch10_r05, for one line in a block of text: the spaces
+# don't match a newline, so a match can't span two lines. In the binary file,
+# a CRLF line ends with "\r" before the newline; the message stops before it,
+# as it does for a text file read by log_parser().
+line_pattern = re.compile(
+    r"^\[   (?P<date>.*?)  \][^\S\n]+"
+    r"     (?P<level>\w+)   [^\S\n]+"
+    r"in[^\S\n]+(?P<module>\S+?)"
+    r":[^\S\n]+ (?P<message>[^\r\n]+)\r?$",
+    re.X | re.M,
+)
+
+Range = Tuple[int, int]
+Fields = Tuple[str, ...]
+T = TypeVar("T")
+
+
+def chunk_ranges(path: Path, chunk_size: int = 64 * 1024 * 1024) -> Iterator[Range]:
+    """
+    Split the file into ranges of about ``chunk_size`` bytes.
+    Each range ends just after a newline, or at the end of the file.
+    """
+    with path.open("rb") as source:
+        size = path.stat().st_size
+        if size == 0:
+            return
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            while start < size:
+                end = min(start + chunk_size, size)
+                if end < size:
+                    newline = data.find(b"\n", end - 1)
+                    end = size if newline == -1 else newline + 1
+                yield start, end
+                start = end
+
+
+def parse_text(text: str) -> List[Fields]:
+    """
+    Parse all of the matching lines in a block of text.
+    Plain tuples pickle several times faster than ``LogLine`` instances,
+    so the workers return these, and the parent builds the ``LogLine`` objects.
+    """
+    return [match.groups() for match in line_pattern.finditer(text)]
+
+
+def parse_range(path: Path, byte_range: Range) -> List[Fields]:
+    """The worker: map the file and parse one range of bytes."""
+    start, end = byte_range
+    with path.open("rb") as source:
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            text = data[start:end].decode("utf-8")
+    return parse_text(text)
+
+
+def count_levels(path: Path, byte_range: Range) -> Counter[str]:
+    """A worker which summarizes a range, instead of returning each line."""
+    return collections.Counter(level for _, level, _, _ in parse_range(path, byte_range))
+
+
+def map_ranges(
+    worker: Callable[[Path, Range], T],
+    path: Path,
+    chunk_size: int = 64 * 1024 * 1024,
+    workers: Optional[int] = None,
+) -> Iterator[T]:
+    """
+    Apply the worker function to each range of the file in a process pool,
+    with :func:`Chapter_07.ch07_pool.ordered_map`. The results are yielded
+    in file order. At most two ranges per worker are pending, bounding the
+    memory used.
+
+    With one worker, there's no pool: the ranges are processed in this process.
+    """
+    return ordered_map(
+        functools.partial(worker, path), chunk_ranges(path, chunk_size), workers
+    )
+
+
+def parse_log(
+    path: Path,
+    chunk_size: int = 64 * 1024 * 1024,
+    workers: Optional[int] = None,
+) -> Iterator[LogLine]:
+    """All the LogLine records of the file, in order."""
+    for lines in map_ranges(parse_range, path, chunk_size, workers):
+        yield from map(LogLine._make, lines)
+
+
+test_parse_log = """
+>>> import tempfile
+>>> with tempfile.TemporaryDirectory() as working:
+...     path = Path(working) / "sample.log"
+...     make_synthetic_log(path, 10_000)
+...     with path.open() as source:
+...         expected = list(map(log_parser, source))
+...     ranges = list(chunk_ranges(path, chunk_size=1_000))
+...     content = path.read_bytes()
+...     actual = list(parse_log(path, chunk_size=1_000, workers=2))
+...     serial = list(parse_log(path, chunk_size=1_000, workers=1))
+...     levels = sum(map_ranges(count_levels, path, chunk_size=1_000), collections.Counter())
+>>> len(ranges)
+10
+>>> all(content[end-1:end] == b"\\n" for start, end in ranges)
+True
+>>> ranges[0][0], ranges[-1][1] == len(content)
+(0, True)
+>>> actual == expected == serial
+True
+>>> levels == collections.Counter(log.level for log in expected)
+True
+"""
+
+test_parse_text = """
+>>> list(map(LogLine._make, parse_text('''[2016-06-15 17:57:54,715] INFO in ch10_r10: Sample Message One
+... Traceback (most recent call last):
+... [2016-06-15 17:57:54,715] DEBUG in ch10_r10: Debugging
+... ''')))  # doctest: +NORMALIZE_WHITESPACE
+[LogLine(date='2016-06-15 17:57:54,715', level='INFO', module='ch10_r10', message='Sample Message One'),
+ LogLine(date='2016-06-15 17:57:54,715', level='DEBUG', module='ch10_r10', message='Debugging')]
+
+A line that's broken in two doesn't match, as it doesn't for ``log_parser()``.
+
+>>> parse_text("[2016-06-15 17:57:54,715] INFO\\nin ch10_r10: Sample Message One\\n")
+[]
+
+A CRLF file gives the same messages as the text-mode ``log_parser()``.
+
+>>> import io
+>>> crlf = "[2016-06-15 17:57:54,715] INFO in ch10_r10: Sample Message One\\r\\n"
+>>> list(map(LogLine._make, parse_text(crlf))) == [
+...     log_parser(line) for line in io.StringIO(crlf, newline=None)]
+True
+"""
+
+
+def make_synthetic_log(path: Path, size: int) -> None:
+    """Write a log file of about ``size`` bytes."""
+    levels = ["INFO", "DEBUG", "WARNING", "INFO", "ERROR"]
+    modules = ["ch10_r10", "app.server", "app.client"]
+    written = 0
+    n = 0
+    with path.open("w") as target:
+        while written < size:
+            seconds = n // 10
+            line = (
+                f"[2016-06-15 {seconds // 3600 % 24:02d}:{seconds // 60 % 60:02d}:"
+                f"{seconds % 60:02d},{n % 10 * 100:03d}] "
+                f"{levels[n % len(levels)]} in {modules[n % len(modules)]}: "
+                f"Sample message {n}\n"
+            )
+            written += target.write(line)
+            n += 1
+
+
+def benchmark(path: Path, chunk_size: int, workers: Optional[int]) -> None:
+    start = time.perf_counter()
+    with path.open() as source:
+        serial = sum(1 for _ in map(log_parser, source))
+    serial_time = time.perf_counter() - start
+
+    size_mb = path.stat().st_size / 2**20
+    print(f"{size_mb:,.0f} MiB, {serial:,d} lines")
+    print(f"{'log_parser':18s} {serial_time:6.2f} seconds {size_mb/serial_time:6.1f} MiB/s")
+
+    for label, n in ("parse_log 1 worker", 1), ("parse_log pool", workers):
+        start = time.perf_counter()
+        count = sum(1 for _ in parse_log(path, chunk_size, n))
+        elapsed = time.perf_counter() - start
+        print(f"{label:18s} {elapsed:6.2f} seconds {size_mb/elapsed:6.1f} MiB/s")
+        assert count == serial
+
+    start = time.perf_counter()
+    levels: Counter[str] = sum(map_ranges(count_levels, path, chunk_size, workers), collections.Counter())
+    elapsed = time.perf_counter() - start
+    print(f"{'count_levels pool':18s} {elapsed:6.2f} seconds {size_mb/elapsed:6.1f} MiB/s")
+    assert sum(levels.values()) == serial
+
+
+def get_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=Path)
+    parser.add_argument("-s", "--size-mb", type=int, default=2048,
+        help="create a synthetic log of this size if the path doesn't exist")
+    parser.add_argument("-c", "--chunk-mb", type=int, default=64)
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(argv)
+    if not options.path.exists():
+        make_synthetic_log(options.path, options.size_mb * 2**20)
+    benchmark(options.path, options.chunk_mb * 2**20, options.workers)
+
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
+
+if __name__ == "__main__":
+    main()
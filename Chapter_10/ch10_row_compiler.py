@@ -0,0 +1,398 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 10, Compiling a row converter for a CSV reader
+
+The CSV recipes each convert a ``csv.DictReader`` row by hand:
+:func:`Chapter_05.ch05_r04.make_history`, :func:`Chapter_10.ch10_r03.clean_row`,
+:meth:`Chapter_10.ch10_r09.Waypoint_2.from_source`, and
+:func:`Chapter_15.ch15_r05.cleanse`. Every row is a new dictionary, and
+every field is a dictionary lookup, with a ``strptime()`` call for each
+date and time.
+
+A schema maps each field of a target class to the columns it's built from
+and a conversion function. :func:`compile_row` uses the header of the file
+to turn the schema into the source of a function, like ``namedtuple()`` and
+``dataclasses`` do, with the column positions written into it. The function
+converts a ``csv.reader`` list; there's no dictionary for each row. For a
+``NamedTuple`` or a dataclass, the fields are positional arguments.
+
+The date and time converters cache the values they've parsed; a log
+repeats the same dates many times.
+"""
+import argparse
+import csv
+import dataclasses
+import datetime
+import keyword
+import random
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence,
+    Tuple, Type, TypeVar,
+)
+
+T = TypeVar("T")
+Row = List[str]
+
+
+class Column(NamedTuple):
+    """The source columns of a field and the function which combines them."""
+
+    names: Tuple[str, ...]
+    convert: Optional[Callable[..., Any]] = None
+
+
+def column(*names: str, convert: Optional[Callable[..., Any]] = None) -> Column:
+    """
+    A field from one or more columns. Without ``convert``, the field is the
+    text of one column.
+    """
+    if not names or (convert is None and len(names) != 1):
+        raise ValueError(f"a conversion is needed for columns {names!r}")
+    return Column(names, convert)
+
+
+Schema = Dict[str, Column]
+
+
+def date_parser(format: str) -> Callable[[str], datetime.date]:
+    """
+    >>> parse = date_parser("%m/%d/%y")
+    >>> parse("10/25/13"), parse("10/25/13"), parse.cache_info().hits
+    (datetime.date(2013, 10, 25), datetime.date(2013, 10, 25), 1)
+    """
+    @lru_cache(4096)
+    def parse(text: str) -> datetime.date:
+        return datetime.datetime.strptime(text, format).date()
+
+    return parse
+
+
+def time_parser(format: str) -> Callable[[str], datetime.time]:
+    @lru_cache(4096)
+    def parse(text: str) -> datetime.time:
+        return datetime.datetime.strptime(text, format).time()
+
+    return parse
+
+
+def timestamp_parser(
+    date_format: str, time_format: str
+) -> Callable[[str, str], datetime.datetime]:
+    """
+    A datetime from two columns, like ``Waypoint_2.from_source()``.
+
+    >>> timestamp_parser("%Y-%m-%d", "%H:%M:%S")("2012-11-27", "09:15:00")
+    datetime.datetime(2012, 11, 27, 9, 15)
+    """
+    combine = datetime.datetime.combine
+    parse_date, parse_time = date_parser(date_format), time_parser(time_format)
+
+    def parse(date_text: str, time_text: str) -> datetime.datetime:
+        return combine(parse_date(date_text), parse_time(time_text))
+
+    return parse
+
+
+def lat_lon(lat: str, lon: str) -> Tuple[float, float]:
+    return float(lat), float(lon)
+
+
+def positional_fields(target: Any) -> Optional[Sequence[str]]:
+    """The names of the positional fields, if the target has them in a known order."""
+    if dataclasses.is_dataclass(target):
+        return [f.name for f in dataclasses.fields(target) if f.init]
+    return getattr(target, "_fields", None)
+
+
+def row_source(
+    target: Any,
+    header: Sequence[str],
+    schema: Schema,
+    errors: Tuple[Type[Exception], ...] = (),
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    The source of the converter function, and the names it uses.
+
+    >>> source, namespace = row_source(
+    ...     dict, ["lat", "lon", "date"],
+    ...     {"date": column("date"), "lat_lon": column("lat", "lon", convert=lat_lon)},
+    ...     errors=(ValueError,),
+    ... )
+    >>> print(source)
+    def convert_row(row):
+        try:
+            return target(date=row[2], lat_lon=convert_lat_lon(row[0], row[1]))
+        except errors:
+            return None
+    >>> sorted(namespace)
+    ['convert_lat_lon', 'errors', 'target']
+    """
+    # The last of any duplicate names, as in a csv.DictReader row.
+    positions = {name: i for i, name in enumerate(header)}
+    namespace: Dict[str, Any] = {"target": target}
+    values: Dict[str, str] = {}
+    for field_name, (names, convert) in schema.items():
+        if not field_name.isidentifier() or keyword.iskeyword(field_name):
+            raise ValueError(f"field name {field_name!r} is not an identifier")
+        missing = [name for name in names if name not in positions]
+        if missing:
+            raise ValueError(f"columns {missing!r} are not in the header {list(header)!r}")
+        items = [f"row[{positions[name]}]" for name in names]
+        if convert is None:
+            values[field_name] = items[0]
+        else:
+            namespace[f"convert_{field_name}"] = convert
+            values[field_name] = f"convert_{field_name}({', '.join(items)})"
+
+    fields = positional_fields(target)
+    arguments: List[str] = []
+    if fields is not None:
+        unknown = set(values) - set(fields)
+        if unknown:
+            raise ValueError(f"{sorted(unknown)!r} are not fields of {target.__name__}")
+        for name in fields:
+            if name not in values:
+                break
+            arguments.append(values.pop(name))
+    arguments.extend(f"{name}={value}" for name, value in values.items())
+
+    body = f"return target({', '.join(arguments)})"
+    if errors:
+        namespace["errors"] = errors
+        lines = ["try:", f"    {body}", "except errors:", "    return None"]
+    else:
+        lines = [body]
+    source = "\n".join(["def convert_row(row):"] + [f"    {line}" for line in lines])
+    return source, namespace
+
+
+def compile_row(
+    target: Callable[..., T],
+    header: Sequence[str],
+    schema: Schema,
+    errors: Tuple[Type[Exception], ...] = (),
+) -> Callable[[Row], T]:
+    """
+    A function to convert a ``csv.reader`` row with the given header to
+    the target. With ``errors``, a row which raises one of them is
+    ``None``, the way ``Waypoint_2.from_source()`` rejects a row.
+    """
+    source, namespace = row_source(target, header, schema, errors)
+    exec(source, namespace)
+    return namespace["convert_row"]
+
+
+def read_rows(
+    target: Callable[..., T],
+    schema: Schema,
+    source: Iterable[str],
+    fieldnames: Optional[Sequence[str]] = None,
+    errors: Tuple[Type[Exception], ...] = (),
+    **fmtparams: Any,
+) -> Iterator[T]:
+    """
+    Convert the rows of a CSV file. The header is the first row, unless
+    ``fieldnames`` is given, as for ``csv.DictReader``. Rows rejected
+    because of ``errors`` are dropped.
+
+    A short row raises ``IndexError``, where a ``DictReader`` row would
+    have a ``None`` value.
+    """
+    reader = csv.reader(source, **fmtparams)
+    header = next(reader, None) if fieldnames is None else fieldnames
+    if header is None:
+        return iter([])
+    convert = compile_row(target, header, schema, errors)
+    if errors:
+        return (item for item in map(convert, reader) if item is not None)
+    return map(convert, reader)
+
+
+# Schemas for the recipe targets.
+
+
+def history_schema() -> Schema:
+    """For ``Chapter_05.ch05_r04.make_history()``, and ``HistoryT``."""
+    parse_date, parse_time = date_parser("%m/%d/%y"), time_parser("%H:%M:%S")
+    return {
+        "date": column("date", convert=parse_date),
+        "start_time": column("engine on", convert=parse_time),
+        "start_fuel": column("fuel height on", convert=float),
+        "end_time": column("engine off", convert=parse_time),
+        "end_fuel": column("fuel height off", convert=float),
+    }
+
+
+def clean_row_schema() -> Schema:
+    """For ``Chapter_10.ch10_r03.clean_row()``, with ``dict`` as the target."""
+    parse_date, parse_time = date_parser("%Y-%m-%d"), time_parser("%H:%M:%S")
+    combine = datetime.datetime.combine
+    return {
+        "date": column("date"),
+        "time": column("time"),
+        "lat": column("lat"),
+        "lon": column("lon"),
+        "lat_lon": column("lat", "lon", convert=lat_lon),
+        "ts_date": column("date", convert=parse_date),
+        "ts_time": column("time", convert=parse_time),
+        "timestamp": column(
+            "date", "time", convert=lambda d, t: combine(parse_date(d), parse_time(t))
+        ),
+    }
+
+
+def waypoint_2_schema() -> Schema:
+    """For ``Chapter_10.ch10_r09.Waypoint_2``; use it with ``errors=(ValueError,)``."""
+    return {
+        "arrival": column("date", "time", convert=timestamp_parser("%Y-%m-%d", "%H:%M:%S")),
+        "lat_lon": column("lat", "lon", convert=lat_lon),
+    }
+
+
+SAMPLE_HEADER = ["year", "month", "decimal_date", "average", "interpolated", "trend", "days"]
+
+
+def sample_schema() -> Schema:
+    """For ``Chapter_15.ch15_r05.Sample``; the file has no header."""
+    types = [int, int, float, float, float, float, int]
+    return {name: column(name, convert=t) for name, t in zip(SAMPLE_HEADER, types)}
+
+
+test_recipes = """
+The compiled converters match the hand-written ones.
+
+>>> from Chapter_05.ch05_r04 import HistoryT, get_fuel_use, make_history, make_history_t
+>>> fuel = Path("data/fuel2.csv")
+>>> with fuel.open() as source:
+...     history = list(read_rows(HistoryT, history_schema(), source))
+>>> history[0]
+HistoryT(date=datetime.date(2013, 10, 25), start_time=datetime.time(8, 24), start_fuel=29.0, end_time=datetime.time(13, 15), end_fuel=27.0)
+>>> history == list(make_history_t(get_fuel_use(fuel)))
+True
+>>> with fuel.open() as source:
+...     as_dict = list(read_rows(dict, history_schema(), source))
+>>> as_dict == list(make_history(get_fuel_use(fuel)))
+True
+
+>>> from Chapter_10.ch10_r03 import cleanse
+>>> from Chapter_10.ch10_r09 import Waypoint_2
+>>> waypoints = Path("data/waypoints.csv")
+>>> with waypoints.open() as source:
+...     expected = list(cleanse(csv.DictReader(source)))
+>>> with waypoints.open() as source:
+...     list(read_rows(dict, clean_row_schema(), source)) == expected
+True
+>>> with waypoints.open() as source:
+...     for waypoint in read_rows(Waypoint_2, waypoint_2_schema(), source, errors=(ValueError,)):
+...         print(waypoint)
+Waypoint_2(arrival=datetime.datetime(2012, 11, 27, 9, 15), lat_lon=(32.8321666666667, -79.9338333333333))
+Waypoint_2(arrival=datetime.datetime(2012, 11, 28, 0, 0), lat_lon=(31.6714833333333, -80.93325))
+Waypoint_2(arrival=datetime.datetime(2012, 11, 28, 11, 35), lat_lon=(30.7171666666667, -81.5525))
+
+>>> from Chapter_15.ch15_r05 import Sample, get_data, non_comment_iter
+>>> co2 = Path("data") / "co2_mm_mlo.txt"
+>>> with co2.open() as source:
+...     samples = list(read_rows(
+...         Sample, sample_schema(), non_comment_iter(source),
+...         fieldnames=SAMPLE_HEADER, delimiter=" ", skipinitialspace=True))
+>>> with co2.open() as source:
+...     samples == list(get_data(source))
+True
+"""
+
+test_errors = """
+>>> rows = ["date,time,lat,lon", "2019-09-10,11:12:13,1,2", ",,,", "2019-09-10,25:00:00,1,2"]
+>>> from Chapter_10.ch10_r09 import Waypoint_2
+>>> list(read_rows(Waypoint_2, waypoint_2_schema(), rows, errors=(ValueError,)))
+[Waypoint_2(arrival=datetime.datetime(2019, 9, 10, 11, 12, 13), lat_lon=(1.0, 2.0))]
+>>> list(read_rows(Waypoint_2, waypoint_2_schema(), rows))
+Traceback (most recent call last):
+...
+ValueError: time data '' does not match format '%Y-%m-%d'
+>>> compile_row(Waypoint_2, ["date", "time"], waypoint_2_schema())
+Traceback (most recent call last):
+...
+ValueError: columns ['lat', 'lon'] are not in the header ['date', 'time']
+>>> compile_row(Waypoint_2, ["lat", "lon"], {"position": column("lat", "lon", convert=lat_lon)})
+Traceback (most recent call last):
+...
+ValueError: ['position'] are not fields of Waypoint_2
+>>> column("lat", "lon")
+Traceback (most recent call last):
+...
+ValueError: a conversion is needed for columns ('lat', 'lon')
+>>> list(read_rows(dict, {}, []))
+[]
+
+A repeated column name means the last of those columns, as ``csv.DictReader`` does.
+
+>>> rows = ["lat,lon,lat", "1,2,3"]
+>>> list(read_rows(dict, {"lat": column("lat"), "lon": column("lon")}, rows))
+[{'lat': '3', 'lon': '2'}]
+>>> [{"lat": row["lat"], "lon": row["lon"]} for row in csv.DictReader(rows)]
+[{'lat': '3', 'lon': '2'}]
+"""
+
+
+def make_sample(path: Path, count: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    start = datetime.datetime(2012, 11, 27, 9, 15)
+    with path.open("w", newline="") as target:
+        writer = csv.writer(target)
+        writer.writerow(["date", "time", "lat", "lon"])
+        for n in range(count):
+            when = start + datetime.timedelta(seconds=30 * n)
+            writer.writerow(
+                [f"{when:%Y-%m-%d}", f"{when:%H:%M:%S}",
+                 f"{rng.uniform(25, 45):.6f}", f"{rng.uniform(-85, -65):.6f}"]
+            )
+
+
+def benchmark(path: Path) -> None:
+    from Chapter_10.ch10_r03 import cleanse
+    from Chapter_10.ch10_r09 import Waypoint_2
+
+    readers: List[Tuple[str, Callable[[Iterable[str]], Iterator[Any]]]] = [
+        ("ch10_r03.cleanse", lambda source: cleanse(csv.DictReader(source))),
+        ("clean_row_schema", lambda source: read_rows(dict, clean_row_schema(), source)),
+        (
+            "Waypoint_2.from_source",
+            lambda source: filter(None, map(Waypoint_2.from_source, csv.DictReader(source))),
+        ),
+        (
+            "waypoint_2_schema",
+            lambda source: read_rows(
+                Waypoint_2, waypoint_2_schema(), source, errors=(ValueError,)
+            ),
+        ),
+    ]
+    for name, reader in readers:
+        start = time.perf_counter()
+        with path.open(newline="") as source:
+            count = sum(1 for _ in reader(source))
+        elapsed = time.perf_counter() - start
+        print(f"{name:24s} {count / elapsed:12,.0f} rows/s")
+
+
+def get_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=Path)
+    parser.add_argument("-n", "--rows", type=int, default=1_000_000,
+        help="create a sample file of this many rows if the path doesn't exist")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(argv)
+    if not options.path.exists():
+        make_sample(options.path, options.rows)
+    benchmark(options.path)
+
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 10, Replacing several files together, with a transaction
+
+:func:`Chapter_10.ch10_r02.safe_write` and the ``@safe`` decorator write a
+``.new`` file, rename the current file to ``.old``, and then rename
+``.new`` to the current name. Between the two renames, there's no current
+file. Nothing is flushed to the disk with ``fsync()``, so after a crash,
+a renamed file can be empty. They only replace one file.
+
+A :class:`FileTransaction` stages any number of files next to their
+targets, with the permissions of the current file. On commit, each staged
+file is flushed and synced. The current file is kept with a hard link to
+a temporary backup name, so it never leaves its place; then
+``os.replace()`` puts the new file into place in one step. When all the
+files are replaced, the backups become the ``.old`` files, and the
+directories are synced. If a replacement fails, the files already
+replaced are restored from their backups, and the previous ``.old`` files
+are untouched. If the ``with`` statement raises an exception, the staged
+files are removed and the targets aren't touched.
+
+:func:`write_quotients` writes the rows of a large collection of
+:class:`Chapter_10.ch10_r02.Quotient` in batches, without ``asdict()``.
+"""
+import argparse
+import contextlib
+import csv
+import dataclasses
+import itertools
+import os
+import secrets
+import shutil
+import stat
+import tempfile
+import time
+from operator import attrgetter
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Callable, Dict, IO, Iterable, List, Optional, Type
+
+from Chapter_10.ch10_r02 import Quotient
+
+BUFFER_SIZE = 1 << 20
+
+
+def fsync_path(path: Path) -> None:
+    """Flush a file, or the entries of a directory, to the disk."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        # Windows can't open a directory.
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def old_path(path: Path) -> Path:
+    return path.with_suffix(f"{path.suffix}.old")
+
+
+class FileTransaction:
+    """
+    Stage new versions of files, then replace them all, or none.
+
+    With ``keep_old``, the previous version of each file is left as
+    ``.old``, like :func:`Chapter_10.ch10_r02.safe_write`.
+    """
+
+    def __init__(self, keep_old: bool = True) -> None:
+        self.keep_old = keep_old
+        self.staged: Dict[Path, Path] = {}
+        self.files: List[IO[Any]] = []
+
+    def stage(self, path: Path) -> Path:
+        """A new, empty file in the target's directory, to write in its place."""
+        if path in self.staged:
+            raise ValueError(f"{path} is already staged")
+        while True:
+            name = path.parent / f".{path.name}.{secrets.token_hex(4)}.new"
+            try:
+                # Like open(), the umask applies to a new file's permissions.
+                fd = os.open(name, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+            except FileExistsError:
+                continue
+            os.close(fd)
+            break
+        try:
+            os.chmod(name, stat.S_IMODE(path.stat().st_mode))
+        except FileNotFoundError:
+            pass
+        self.staged[path] = name
+        return name
+
+    def open(
+        self, path: Path, mode: str = "w", buffering: int = BUFFER_SIZE, **kwargs: Any
+    ) -> IO[Any]:
+        """
+        Open a staged file for ``path``. The file is closed by
+        :meth:`commit` or :meth:`rollback`.
+        """
+        if "b" not in mode:
+            kwargs.setdefault("newline", "")
+        staged_file = self.stage(path).open(mode, buffering, **kwargs)
+        self.files.append(staged_file)
+        return staged_file
+
+    def close_files(self) -> None:
+        for staged_file in self.files:
+            staged_file.close()
+        self.files.clear()
+
+    def commit(self) -> None:
+        self.close_files()
+        for staged in self.staged.values():
+            fsync_path(staged)
+        # The previous .old files are kept until every file is replaced.
+        backups: Dict[Path, Path] = {}
+        replaced: List[Path] = []
+        kept: List[Path] = []
+        directories = {path.parent for path in self.staged}
+        try:
+            try:
+                for path, staged in self.staged.items():
+                    if path.exists():
+                        backups[path] = backup = staged.with_suffix(".old")
+                        try:
+                            os.link(path, backup)
+                        except OSError:
+                            shutil.copy2(path, backup)
+                    replaced.append(path)
+                    os.replace(staged, path)
+            except BaseException:
+                # Even a KeyboardInterrupt puts the previous files back.
+                failed = self.restore(replaced, backups)
+                kept = [backups[path] for path in failed if path in backups]
+                raise
+            for path in self.staged:
+                previous = backups.get(path)
+                if previous is not None and self.keep_old:
+                    os.replace(previous, old_path(path))
+                else:
+                    old_path(path).unlink(missing_ok=True)
+        finally:
+            # A problem cleaning up mustn't replace the original exception.
+            for backup in backups.values():
+                if backup not in kept:
+                    with contextlib.suppress(OSError):
+                        backup.unlink(missing_ok=True)
+            with contextlib.suppress(OSError):
+                self.rollback()
+        for directory in directories:
+            fsync_path(directory)
+
+    def restore(self, replaced: List[Path], backups: Dict[Path, Path]) -> List[Path]:
+        """
+        Put back the previous versions of the files replaced so far. The
+        paths which can't be restored are returned; their backups are left
+        in place. This doesn't raise, so the caller's exception isn't hidden.
+        """
+        failed: List[Path] = []
+        for path in reversed(replaced):
+            try:
+                if path in backups:
+                    os.replace(backups[path], path)
+                else:
+                    path.unlink(missing_ok=True)
+            except OSError:
+                failed.append(path)
+        for directory in {path.parent for path in replaced}:
+            fsync_path(directory)
+        return failed
+
+    def rollback(self) -> None:
+        """Remove the staged files; the targets aren't changed."""
+        self.close_files()
+        for staged in self.staged.values():
+            staged.unlink(missing_ok=True)
+        self.staged.clear()
+
+    def __enter__(self) -> "FileTransaction":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+def write_quotients(
+    target: IO[str], data: Iterable[Quotient], batch_size: int = 10_000
+) -> int:
+    """
+    Write the header and rows, in batches, like ``ch10_r02.save_data()``.
+    Returns the number of rows.
+    """
+    names = [f.name for f in dataclasses.fields(Quotient)]
+    writer = csv.writer(target)
+    writer.writerow(names)
+    rows = map(attrgetter(*names), data)
+    count = 0
+    while batch := list(itertools.islice(rows, batch_size)):
+        writer.writerows(batch)
+        count += len(batch)
+    return count
+
+
+Writer = Callable[..., None]
+
+
+def atomic(function: Writer) -> Writer:
+    """
+    Like ``ch10_r02.safe``: the function writes to a staged path, which
+    replaces ``output_path`` when the function finishes.
+    """
+    def concrete_function(output_path: Path, *args: Any) -> None:
+        with FileTransaction() as transaction:
+            function(transaction.stage(output_path), *args)
+
+    return concrete_function
+
+
+@atomic
+def write_quotient(output_path: Path, data: Iterable[Quotient]) -> None:
+    with output_path.open("w", newline="", buffering=BUFFER_SIZE) as output_file:
+        write_quotients(output_file, data)
+
+
+test_transaction = """
+>>> working = tempfile.TemporaryDirectory()
+>>> directory = Path(working.name)
+>>> quotients, summary = directory / "quotient.csv", directory / "summary.txt"
+>>> quotients.write_text("numerator,denominator\\n355,113\\n")
+30
+>>> with FileTransaction() as transaction:
+...     write_quotients(transaction.open(quotients), [Quotient(87, 32), Quotient(22, 7)])
+...     transaction.open(summary).write("2 rows\\n")
+...     quotients.read_text()
+2
+7
+'numerator,denominator\\n355,113\\n'
+>>> quotients.read_text(), summary.read_text()
+('numerator,denominator\\n87,32\\n22,7\\n', '2 rows\\n')
+>>> old_path(quotients).read_text()
+'numerator,denominator\\n355,113\\n'
+>>> sorted(p.name for p in directory.iterdir())
+['quotient.csv', 'quotient.csv.old', 'summary.txt']
+
+An exception in the ``with`` statement leaves the files as they were.
+
+>>> with FileTransaction() as transaction:
+...     transaction.open(quotients).write("partial")
+...     raise RuntimeError("batch failed")
+Traceback (most recent call last):
+...
+RuntimeError: batch failed
+>>> quotients.read_text(), sorted(p.name for p in directory.iterdir())
+('numerator,denominator\\n87,32\\n22,7\\n', ['quotient.csv', 'quotient.csv.old', 'summary.txt'])
+
+If one file can't be replaced, the files already replaced are restored.
+
+>>> blocked = directory / "blocked"
+>>> blocked.mkdir()
+>>> (blocked / "keep").touch()
+>>> transaction = FileTransaction()
+>>> transaction.open(quotients).write("numerator,denominator\\n1,1\\n")
+26
+>>> transaction.open(blocked).write("not a directory")
+15
+>>> transaction.commit()  # doctest: +ELLIPSIS
+Traceback (most recent call last):
+...
+IsADirectoryError: ...
+>>> quotients.read_text()
+'numerator,denominator\\n87,32\\n22,7\\n'
+
+The previous ``.old`` file is kept, and the temporary backups are gone.
+
+>>> old_path(quotients).read_text()
+'numerator,denominator\\n355,113\\n'
+>>> sorted(p.name for p in directory.iterdir())
+['blocked', 'quotient.csv', 'quotient.csv.old', 'summary.txt']
+
+A staged file gets the permissions of the file it replaces, or those of
+any new file.
+
+>>> quotients.chmod(0o640)
+>>> with FileTransaction() as transaction:
+...     transaction.open(quotients).write("numerator,denominator\\n")
+...     transaction.open(directory / "new.txt").write("new")
+22
+3
+>>> oct(stat.S_IMODE(quotients.stat().st_mode))
+'0o640'
+>>> with (directory / "plain.txt").open("w"):
+...     pass
+>>> stat.S_IMODE((directory / "new.txt").stat().st_mode) == stat.S_IMODE((directory / "plain.txt").stat().st_mode)
+True
+
+A file which can't be restored is reported, not raised.
+
+>>> FileTransaction().restore([quotients], {quotients: directory / "missing.old"}) == [quotients]
+True
+>>> quotients.read_text()
+'numerator,denominator\\n'
+
+An interrupt during the replacements restores the files, too, and the
+temporary files are removed.
+
+>>> from unittest import mock
+>>> real_replace = os.replace
+>>> replacements = iter([real_replace, mock.Mock(side_effect=KeyboardInterrupt)])
+>>> transaction = FileTransaction()
+>>> transaction.open(quotients).write("numerator,denominator\\n2,2\\n")
+26
+>>> transaction.open(summary).write("interrupted\\n")
+12
+>>> try:
+...     with mock.patch("os.replace", side_effect=lambda *args: next(replacements, real_replace)(*args)):
+...         transaction.commit()
+... except KeyboardInterrupt:
+...     print("interrupted")
+interrupted
+>>> quotients.read_text(), summary.read_text()
+('numerator,denominator\\n', '2 rows\\n')
+>>> sorted(p.name for p in directory.iterdir())
+['blocked', 'new.txt', 'plain.txt', 'quotient.csv', 'quotient.csv.old', 'summary.txt']
+>>> working.cleanup()
+"""
+
+test_atomic = """
+>>> from Chapter_10.ch10_r02 import save_data
+>>> with tempfile.TemporaryDirectory() as working:
+...     target, expected = Path(working) / "quotient.csv", Path(working) / "expected.csv"
+...     save_data(expected, [Quotient(355, 113), Quotient(87, 32)])
+...     write_quotient(target, [Quotient(355, 113)])
+...     write_quotient(target, [Quotient(355, 113), Quotient(87, 32)])
+...     print(target.read_text() == expected.read_text(), repr(old_path(target).read_text()))
+...     with FileTransaction(keep_old=False) as transaction:
+...         transaction.open(target).write("numerator,denominator\\n")
+...     print(sorted(p.name for p in Path(working).iterdir()))
+True 'numerator,denominator\\n355,113\\n'
+22
+['expected.csv', 'quotient.csv']
+>>> FileTransaction().stage(Path(working) / "x.csv")
+Traceback (most recent call last):
+...
+FileNotFoundError: [Errno 2] No such file or directory: ...
+"""
+
+
+def benchmark(count: int, files: int, directory: Path) -> None:
+    from Chapter_10.ch10_r02 import safe_write
+
+    data = [Quotient(n, n % 997 + 1) for n in range(count)]
+    targets = [directory / f"quotient_{n}.csv" for n in range(files)]
+
+    start = time.perf_counter()
+    for target in targets:
+        safe_write(target, data)
+    safe_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with FileTransaction() as transaction:
+        for target in targets:
+            write_quotients(transaction.open(target), data)
+    transaction_time = time.perf_counter() - start
+
+    rows = count * files
+    print(f"ch10_r02.safe_write {rows / safe_time:12,.0f} rows/s")
+    print(f"FileTransaction     {rows / transaction_time:12,.0f} rows/s, with fsync")
+    for target in targets:
+        target.unlink()
+        old_path(target).unlink()
+
+
+def get_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rows", type=int, default=1_000_000)
+    parser.add_argument("-f", "--files", type=int, default=3)
+    parser.add_argument("-d", "--directory", type=Path, default=Path("data"))
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(argv)
+    benchmark(options.rows, options.files, options.directory)
+
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
+
+if __name__ == "__main__":
+    main()
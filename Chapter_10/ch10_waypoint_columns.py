@@ -0,0 +1,243 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 10, Loading a waypoint CSV file into typed columns
+
+:func:`Chapter_10.ch10_r04.waypoint_iter`, :func:`Chapter_10.ch10_r03.clean_row`,
+and :func:`Chapter_10.ch10_a.convert_waypoint` create an object for each
+row, with ``datetime`` objects from two ``strptime()`` calls.
+
+:func:`load_columns` reads the file into a :class:`WaypointColumns`:
+``lat`` and ``lon`` as ``array('d')``, and the timestamps as
+``array('q')`` of seconds since 1970-01-01. The timestamps are naive,
+like the file; they're not converted from any timezone.
+
+The dates and times are parsed by :func:`Chapter_09.ch09_timestamp.iso_date`
+and :func:`Chapter_09.ch09_timestamp.iso_time`, with fixed-position slices of
+digits, and the days for each distinct date are cached. Text in any other format is
+parsed with ``strptime()``, which raises the same exceptions as the
+``Waypoint`` classes. A row which can't be converted is skipped, and
+counted, as :meth:`Chapter_10.ch10_r09.Waypoint_2.from_source` does.
+
+The dataclasses are created only when they're asked for, one row at a time.
+"""
+import argparse
+import csv
+import datetime
+import random
+import time
+from array import array
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+from Chapter_09.ch09_timestamp import iso_date, iso_time
+from Chapter_10.ch10_a import Waypoint_Data
+from Chapter_10.ch10_r04 import RawRow, Waypoint
+
+EPOCH = datetime.datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+SECOND = datetime.timedelta(seconds=1)
+
+
+@lru_cache(4096)
+def epoch_day(date_text: str) -> int:
+    """
+    Days since 1970-01-01 for ``YYYY-MM-DD``.
+
+    >>> epoch_day("2012-11-27")
+    15671
+    """
+    return iso_date(date_text).toordinal() - EPOCH_ORDINAL
+
+
+def day_seconds(time_text: str) -> int:
+    """
+    Seconds since midnight for ``HH:MM:SS``.
+
+    >>> day_seconds("09:15:00")
+    33300
+    """
+    parsed = iso_time(time_text)
+    return parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+
+def epoch_seconds(date_text: str, time_text: str) -> int:
+    """
+    >>> epoch_seconds("2012-11-27", "09:15:00") == (
+    ...     datetime.datetime(2012, 11, 27, 9, 15) - EPOCH).total_seconds()
+    True
+    """
+    return epoch_day(date_text) * 86400 + day_seconds(time_text)
+
+
+@dataclass
+class WaypointColumns:
+    lat: array = field(default_factory=lambda: array("d"))
+    lon: array = field(default_factory=lambda: array("d"))
+    timestamp: array = field(default_factory=lambda: array("q"))
+    rejected: int = 0
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def arrival(self, i: int) -> datetime.datetime:
+        return EPOCH + self.timestamp[i] * SECOND
+
+    def raw_row(self, i: int) -> RawRow:
+        arrival = self.arrival(i)
+        return RawRow(
+            date=f"{arrival:%Y-%m-%d}",
+            time=f"{arrival:%H:%M:%S}",
+            lat=repr(self.lat[i]),
+            lon=repr(self.lon[i]),
+        )
+
+    def waypoint(self, i: int) -> Waypoint:
+        """The :class:`Chapter_10.ch10_r04.Waypoint` for row ``i``."""
+        return Waypoint(self.raw_row(i))
+
+    def waypoint_data(self, i: int) -> Waypoint_Data:
+        """The :class:`Chapter_10.ch10_a.Waypoint_Data` for row ``i``."""
+        return Waypoint_Data(self.lat[i], self.lon[i], self.arrival(i))
+
+    def waypoints(self) -> Iterator[Waypoint]:
+        return map(self.waypoint, range(len(self)))
+
+    def waypoint_data_iter(self) -> Iterator[Waypoint_Data]:
+        return map(self.waypoint_data, range(len(self)))
+
+
+def read_columns(source: Iterable[str]) -> WaypointColumns:
+    """Rows from a CSV file with ``lat``, ``lon``, ``date``, and ``time`` columns."""
+    reader = csv.reader(source)
+    header = next(reader)
+    lat_i, lon_i, date_i, time_i = (
+        header.index(name) for name in ("lat", "lon", "date", "time")
+    )
+    columns = WaypointColumns()
+    lat_append, lon_append = columns.lat.append, columns.lon.append
+    ts_append = columns.timestamp.append
+    for row in reader:
+        try:
+            lat, lon = float(row[lat_i]), float(row[lon_i])
+            timestamp = epoch_day(row[date_i]) * 86400 + day_seconds(row[time_i])
+        except (ValueError, IndexError):
+            columns.rejected += 1
+            continue
+        lat_append(lat)
+        lon_append(lon)
+        ts_append(timestamp)
+    return columns
+
+
+def load_columns(data_path: Path) -> WaypointColumns:
+    with data_path.open(newline="") as data_file:
+        return read_columns(data_file)
+
+
+test_load_columns = """
+>>> columns = load_columns(Path("data/waypoints.csv"))
+>>> len(columns), columns.rejected
+(3, 0)
+>>> columns.lat
+array('d', [32.8321666666667, 31.6714833333333, 30.7171666666667])
+>>> columns.timestamp
+array('q', [1354007700, 1354060800, 1354102500])
+>>> columns.waypoint_data(1)
+Waypoint_Data(lat=31.6714833333333, lon=-80.93325, timestamp=datetime.datetime(2012, 11, 28, 0, 0))
+
+The lazily created dataclasses match those of ch10_r04.
+
+>>> from Chapter_10.ch10_r04 import waypoint_iter
+>>> with Path("data/waypoints.csv").open() as data_file:
+...     eager = list(waypoint_iter(csv.DictReader(data_file)))
+>>> list(columns.waypoints()) == eager
+True
+"""
+
+test_rejected = """
+>>> columns = read_columns([
+...     "date,time,lat,lon",
+...     "2012-11-27,09:15:00,32.83,-79.93",
+...     "2012-11-27,9:15:00,32.83,-79.93",
+...     "2012-11-27,25:15:00,32.83,-79.93",
+...     "2012-13-27,09:15:00,32.83,-79.93",
+...     "2012-11-27,09:15:00,,-79.93",
+...     "2012-11-27,09:15:00",
+... ])
+>>> len(columns), columns.rejected
+(2, 4)
+>>> [columns.arrival(i) for i in range(len(columns))]
+[datetime.datetime(2012, 11, 27, 9, 15), datetime.datetime(2012, 11, 27, 9, 15)]
+
+Signs and spaces aren't digits; ``strptime()`` decides.
+
+>>> day_seconds("09:-1:00")
+Traceback (most recent call last):
+...
+ValueError: time data '09:-1:00' does not match format '%H:%M:%S'
+>>> day_seconds("-1:00:00")
+Traceback (most recent call last):
+...
+ValueError: time data '-1:00:00' does not match format '%H:%M:%S'
+>>> epoch_day("2012-+1-27")
+Traceback (most recent call last):
+...
+ValueError: time data '2012-+1-27' does not match format '%Y-%m-%d'
+>>> epoch_day("2012-11- 7") == epoch_day("2012-11-07")
+True
+"""
+
+
+def make_sample(path: Path, count: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    start = datetime.datetime(2012, 11, 27, 9, 15)
+    with path.open("w", newline="") as target:
+        writer = csv.writer(target)
+        writer.writerow(["lat", "lon", "date", "time"])
+        for n in range(count):
+            when = start + n * 30 * SECOND
+            writer.writerow(
+                [
+                    repr(rng.uniform(25, 45)), repr(rng.uniform(-85, -65)),
+                    f"{when:%Y-%m-%d}", f"{when:%H:%M:%S}",
+                ]
+            )
+
+
+def benchmark(path: Path) -> None:
+    from Chapter_10.ch10_r04 import waypoint_iter
+
+    start = time.perf_counter()
+    with path.open() as data_file:
+        count = sum(1 for _ in waypoint_iter(csv.DictReader(data_file)))
+    objects = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = load_columns(path)
+    columnar = time.perf_counter() - start
+    assert len(columns) == count
+    print(f"ch10_r04.waypoint_iter {count / objects:12,.0f} rows/s")
+    print(f"load_columns           {count / columnar:12,.0f} rows/s")
+
+
+def get_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=Path)
+    parser.add_argument("-n", "--rows", type=int, default=1_000_000,
+        help="create a sample file of this many rows if the path doesn't exist")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(argv)
+    if not options.path.exists():
+        make_sample(options.path, options.rows)
+    benchmark(options.path)
+
+
+__test__ = {n: v for n, v in locals().items() if n.startswith("test_")}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 12, ASGI implementation of the ``ch12_wsgi`` applications.
+
+The :func:`deal_cards`, :class:`DealCards`, and :class:`JSON_Filter`
+applications follow the ASGI 3.0 protocol: ``app(scope, receive, send)``.
+They can be run by any ASGI server. For a dependency-free demonstration,
+:class:`ASGIServer` is a small asyncio HTTP/1.1 server; it's suitable for
+local benchmarking, not for production use.
+
+>>> import asyncio
+>>> dealer = DealCards(hand_size=2, seed=42)
+>>> messages = []
+>>> async def receive():
+...     return {"type": "http.request", "body": b"", "more_body": False}
+>>> async def send(message):
+...     messages.append(message)
+>>> scope = {"type": "http", "method": "GET", "path": "/", "query_string": b"",
+...     "headers": [(b"accept", b"application/json")]}
+>>> asyncio.run(JSON_Filter(dealer)(scope, receive, send))
+>>> messages[0]["status"]
+200
+>>> json.loads(messages[1]["body"])  # doctest: +NORMALIZE_WHITESPACE
+[{'__class__': 'Card', '__init__': {'rank': 3, 'suit': '♡'}},
+ {'__class__': 'Card', '__init__': {'rank': 6, 'suit': '♣'}}]
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+from http import HTTPStatus
+from typing import (
+    Any, Awaitable, Callable, Dict, List, MutableMapping, Optional, Tuple
+)
+from urllib.parse import parse_qs, unquote
+
+from Chapter_12.card_model import Card, Deck
+import Chapter_12.ch12_wsgi
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApplication = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+
+async def send_response(
+    send: Send, status: HTTPStatus, content_type: str, body: bytes
+) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status.value,
+            "headers": [
+                (b"content-type", content_type.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_cards(send: Send, cards: List[Card]) -> None:
+    json_cards = list(card.serialize() for card in cards)
+    await send_response(
+        send,
+        HTTPStatus.OK,
+        "application/json;charset=utf-8",
+        json.dumps(json_cards, indent=2).encode("utf-8"),
+    )
+
+
+deck: Optional[Deck] = None
+deck_lock = threading.Lock()
+
+
+async def deal_cards(scope: Scope, receive: Receive, send: Send) -> None:
+    """Like the WSGI version, configured by environment variables."""
+    global deck
+    hand_size = int(os.environ.get("HAND_SIZE", 5))
+    with deck_lock:
+        if deck is None:
+            random.seed(os.environ.get("DEAL_APP_SEED"))
+            deck = Deck()
+        cards = deck.deal(hand_size)
+    await send_cards(send, cards)
+
+
+class DealCards:
+    """
+    Dealing is delegated to a ``ch12_wsgi.DealCards`` instance.
+    Its ``next_hand()`` method has no ``await``, so it's atomic
+    within an event loop, and its lock protects it from other threads.
+    """
+
+    def __init__(self, hand_size: int = 5, seed: Optional[int] = None) -> None:
+        self.dealer = Chapter_12.ch12_wsgi.DealCards(hand_size, seed)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send_cards(send, self.dealer.next_hand())
+
+
+class JSON_Filter:
+    def __init__(self, json_app: ASGIApplication) -> None:
+        self.json_app = json_app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        headers = dict(scope.get("headers", []))
+        if b"json" in headers.get(b"accept", b""):
+            scope["$format"] = "json"
+            return await self.json_app(scope, receive, send)
+        decoded_query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        if "$format" in decoded_query:
+            if decoded_query["$format"][0].lower() == "json":
+                scope["$format"] = "json"
+                return await self.json_app(scope, receive, send)
+        await send_response(
+            send,
+            HTTPStatus.BAD_REQUEST,
+            "text/plain;charset=utf-8",
+            "Request doesn't include ?$format=json or Accept:application/json header".encode(
+                "utf-8"
+            ),
+        )
+
+
+class ASGIServer:
+    """
+    A minimal HTTP/1.1 server for an ASGI application, with keep-alive.
+    Request bodies are read completely before the application is called.
+    Use :meth:`start` and :meth:`stop` to run it in a background thread.
+    """
+
+    def __init__(
+        self, app: ASGIApplication, host: str = "127.0.0.1", port: int = 0
+    ) -> None:
+        self.app = app
+        self.host = host
+        self.port = port
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.thread: Optional[threading.Thread] = None
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            keep_alive = True
+            while keep_alive:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers: List[Tuple[bytes, bytes]] = []
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers.append(
+                        (
+                            name.strip().lower().encode("latin-1"),
+                            value.strip().encode("latin-1"),
+                        )
+                    )
+                header_map = dict(headers)
+                length = int(header_map.get(b"content-length", b"0"))
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (
+                    version == "HTTP/1.1"
+                    and header_map.get(b"connection", b"").lower() != b"close"
+                )
+                path, _, query = target.partition("?")
+                scope = {
+                    "type": "http",
+                    "asgi": {"version": "3.0"},
+                    "http_version": version.partition("/")[2],
+                    "method": method,
+                    "scheme": "http",
+                    "path": unquote(path),
+                    "raw_path": path.encode("latin-1"),
+                    "query_string": query.encode("latin-1"),
+                    "root_path": "",
+                    "headers": headers,
+                    "client": writer.get_extra_info("peername"),
+                    "server": (self.host, self.port),
+                }
+                response = await self.run_app(scope, body, keep_alive)
+                writer.write(response)
+                await writer.drain()
+        except (ConnectionResetError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def run_app(self, scope: Scope, body: bytes, keep_alive: bool) -> bytes:
+        """Run the application; return the bytes of the HTTP response."""
+        start: Message = {}
+        chunks: List[bytes] = []
+
+        async def receive() -> Message:
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+
+        content = b"".join(chunks)
+        status = HTTPStatus(start["status"])
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}".encode("latin-1")]
+        lines.extend(
+            name + b": " + value
+            for name, value in start.get("headers", [])
+            if name.lower() != b"content-length"
+        )
+        lines.append(f"Content-Length: {len(content)}".encode("latin-1"))
+        lines.append(b"Connection: " + (b"keep-alive" if keep_alive else b"close"))
+        return b"\r\n".join(lines) + b"\r\n\r\n" + content
+
+    async def serve_forever(self) -> None:
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    def start(self, timeout: float = 10.0) -> None:
+        """
+        Run the server in a thread. An exception from binding the socket
+        is raised here, as is a ``TimeoutError`` if it doesn't start in time.
+        """
+        ready = threading.Event()
+        failure: List[BaseException] = []
+
+        def run() -> None:
+            loop = asyncio.new_event_loop()
+            try:
+                self.server = loop.run_until_complete(
+                    asyncio.start_server(self.handle, self.host, self.port)
+                )
+            except BaseException as ex:
+                failure.append(ex)
+                loop.close()
+                ready.set()
+                return
+            self.loop = loop
+            self.port = self.server.sockets[0].getsockname()[1]
+            ready.set()
+            loop.run_forever()
+            self.server.close()
+            loop.run_until_complete(self.server.wait_closed())
+            loop.close()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        if not ready.wait(timeout):
+            raise TimeoutError(f"ASGIServer didn't start in {timeout} seconds")
+        if failure:
+            self.thread.join()
+            self.thread = None
+            raise failure[0]
+
+    def stop(self) -> None:
+        if self.loop and self.thread:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+
+if __name__ == "__main__":
+    # dealer = DealCards()
+    json_wrapper = JSON_Filter(deal_cards)
+
+    httpd = ASGIServer(json_wrapper, "", 8080)
+    asyncio.run(httpd.serve_forever())
@@ -0,0 +1,322 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 12, asyncio client for the recipe 5 dealer server.
+
+The operations match the ``ch12_r04_client`` and ``ch12_r05_client``
+functions. The paths come from the OpenAPI specification via
+:func:`Chapter_12.ch12_r05_client.make_path_map`.
+
+Many requests can be in flight at once; an :class:`asyncio.Semaphore`
+bounds the concurrency, and each connection is kept alive for reuse
+when the server allows it. Every request's latency is recorded as a
+:class:`Timing`.
+
+>>> summary([Timing("get_hands", 200, 0.25), Timing("get_hands", 200, 0.5)])
+{'get_hands': {'count': 2, 'mean': 0.375, 'p50': 0.375, 'max': 0.5}}
+"""
+import asyncio
+import http.client
+import io
+import json
+import statistics
+import time
+import urllib.error
+import urllib.parse
+from collections import defaultdict
+from pprint import pprint
+from types import TracebackType
+from typing import (
+    Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Type, cast
+)
+
+from Chapter_12.ch12_r05_client import Path_Map, Player, ResponseDoc, make_path_map
+from Chapter_12.ch12_session import IDEMPOTENT
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+# Responses without a body, even on a keep-alive connection.
+NO_BODY = {204, 304}
+
+
+class Timing(NamedTuple):
+    operation: str
+    status: int
+    seconds: float
+
+
+class Response(NamedTuple):
+    status: int
+    reason: str
+    headers: http.client.HTTPMessage
+    body: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.body.decode("utf-8"))
+
+
+def summary(timings: Iterable[Timing]) -> Dict[str, Dict[str, float]]:
+    """Latency statistics for each operation."""
+    by_operation: Dict[str, List[float]] = defaultdict(list)
+    for t in timings:
+        by_operation[t.operation].append(t.seconds)
+    return {
+        operation: {
+            "count": len(seconds),
+            "mean": statistics.mean(seconds),
+            "p50": statistics.median(seconds),
+            "max": max(seconds),
+        }
+        for operation, seconds in by_operation.items()
+    }
+
+
+class AsyncDealerClient:
+    """
+    Use this as an async context manager::
+
+        async with AsyncDealerClient(spec, limit=32) as client:
+            players = await create_players(client, forms)
+    """
+
+    def __init__(
+        self, openapi_spec: ResponseDoc, limit: int = 16, timeout: float = 10.0
+    ) -> None:
+        self.openapi_spec = openapi_spec
+        self.path_map: Path_Map = make_path_map(openapi_spec)
+        base_url = urllib.parse.urlsplit(openapi_spec["servers"][0]["url"])
+        self.host = base_url.hostname or "127.0.0.1"
+        self.port = base_url.port or 80
+        self.base_path = base_url.path
+        self.limit = limit
+        self.timeout = timeout
+        self.idle: List[Connection] = []
+        self.timings: List[Timing] = []
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncDealerClient":
+        # The semaphore must be created inside the running event loop.
+        self.semaphore = asyncio.Semaphore(self.limit)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        while self.idle:
+            reader, writer = self.idle.pop()
+            writer.close()
+            await writer.wait_closed()
+
+    async def connection(self) -> Tuple[Connection, bool]:
+        """Return an idle connection, or a new one, and a flag showing reuse."""
+        if self.idle:
+            return self.idle.pop(), True
+        connection = await asyncio.open_connection(self.host, self.port)
+        return connection, False
+
+    async def send(self, method: str, selector: str, body: bytes) -> Response:
+        """
+        One request. The timeout covers the whole exchange: connecting,
+        sending, and reading the response.
+        """
+        return await asyncio.wait_for(self.exchange(method, selector, body), self.timeout)
+
+    async def exchange(self, method: str, selector: str, body: bytes) -> Response:
+        """
+        A request on a stale keep-alive connection is retried on another.
+        A request with a method that isn't idempotent, like ``POST``, is only
+        retried if it couldn't be sent; the server may have acted on it.
+        """
+        request_text = (
+            f"{method} {selector} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Accept: application/json\r\n"
+            f"Content-Type: application/json;charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"\r\n"
+        )
+        while True:
+            (reader, writer), reused = await self.connection()
+            sent = False
+            try:
+                writer.write(request_text.encode("ascii") + body)
+                await writer.drain()
+                sent = True
+                response = await self.read_response(reader)
+            except (
+                ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError
+            ):
+                writer.close()
+                if reused and (method in IDEMPOTENT or not sent):
+                    continue
+                raise
+            except BaseException:
+                # A timeout or cancellation leaves a partial response unread.
+                writer.close()
+                raise
+            if response.headers.get("Connection", "").lower() == "close":
+                writer.close()
+            else:
+                self.idle.append((reader, writer))
+            return response
+
+    async def read_response(self, reader: asyncio.StreamReader) -> Response:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        version, status, *reason = status_line.decode("iso-8859-1").split(None, 2)
+        header_lines = []
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            header_lines.append(line)
+        headers = http.client.parse_headers(io.BytesIO(b"".join(header_lines)))
+        if int(status) in NO_BODY or int(status) < 200:
+            body = b""
+        elif "chunked" in headers.get("Transfer-Encoding", ""):
+            chunks = []
+            while size := int((await reader.readline()).split(b";")[0], 16):
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            await reader.readline()
+            body = b"".join(chunks)
+        elif "Content-Length" in headers:
+            body = await reader.readexactly(int(headers["Content-Length"]))
+        else:
+            body = await reader.read()
+        return Response(int(status), " ".join(reason).strip(), headers, body)
+
+    async def request(
+        self,
+        operation_id: str,
+        path_args: Optional[Dict[str, str]] = None,
+        query: Optional[Dict[str, Any]] = None,
+        document: Optional[Any] = None,
+    ) -> Response:
+        """
+        Make the request for an ``operationId`` in the OpenAPI spec.
+        Like ``urlopen()``, a status of 400 or more raises
+        ``urllib.error.HTTPError``.
+        """
+        assert self.semaphore is not None, "Use async with AsyncDealerClient(...)"
+        path_template, operation = self.path_map[operation_id]
+        path = path_template
+        for name, value in (path_args or {}).items():
+            path = path.replace(f"{{{name}}}", urllib.parse.quote(value))
+        selector = f"{self.base_path}{path}"
+        if query:
+            selector = f"{selector}?{urllib.parse.urlencode(query)}"
+        body = b"" if document is None else json.dumps(document).encode("utf-8")
+
+        async with self.semaphore:
+            start = time.perf_counter()
+            response = await self.send(operation.upper(), selector, body)
+            self.timings.append(
+                Timing(operation_id, response.status, time.perf_counter() - start)
+            )
+        if response.status >= 400:
+            raise urllib.error.HTTPError(
+                f"http://{self.host}:{self.port}{selector}",
+                response.status,
+                response.reason,
+                response.headers,
+                io.BytesIO(response.body),
+            )
+        return response
+
+    async def create_new_deck(self, size: int = 1) -> ResponseDoc:
+        response = await self.request("make_deck", document={"decks": size})
+        assert response.status == 201, f"Error Creating Deck: {response.status}"
+        document = cast(ResponseDoc, response.json())
+        assert document["status"] == "ok"
+        return document
+
+    async def get_hands(
+        self, id: str, cards: int = 13, limit: int = 4
+    ) -> List[ResponseDoc]:
+        response = await self.request(
+            "get_hands", path_args={"id": id}, query={"$top": limit, "cards": cards}
+        )
+        assert response.status == 200, f"Error Fetching Hand: {response.status}"
+        return cast(List[ResponseDoc], response.json())
+
+    async def create_new_player(self, input_form: Player) -> ResponseDoc:
+        document = {
+            "name": input_form.player_name,
+            "email": input_form.email_address,
+            "lucky_number": input_form.other_field,
+            "twitter": input_form.handle,
+        }
+        response = await self.request("make_player", document=document)
+        assert response.status == 201, f"Error {response.status}: {response.reason}"
+        return cast(ResponseDoc, response.json())
+
+    async def get_all_players(self, page_size: Optional[int] = None) -> ResponseDoc:
+        """Any ``next`` link in a response is followed to get the rest of the players."""
+        query = {"$top": page_size} if page_size else None
+        response = await self.request("get_all_players", query=query)
+        assert response.status == 200
+        document = response.json()
+        players = document["players"]
+        while "next" in document:
+            next_url = urllib.parse.urlsplit(document["next"])
+            next_query = dict(urllib.parse.parse_qsl(next_url.query))
+            response = await self.request("get_all_players", query=next_query)
+            document = response.json()
+            players.update(document["players"])
+        return {"players": players}
+
+    async def get_one_player(self, player_id: str) -> ResponseDoc:
+        response = await self.request("get_one_player", path_args={"id": player_id})
+        return cast(ResponseDoc, response.json()["player"])
+
+
+async def create_players(
+    client: AsyncDealerClient, input_forms: Iterable[Player]
+) -> List[ResponseDoc]:
+    """Create all of the players concurrently."""
+    return await asyncio.gather(
+        *(client.create_new_player(form) for form in input_forms)
+    )
+
+
+async def deal_hands(
+    client: AsyncDealerClient, decks: int, cards: int = 13, limit: int = 4
+) -> List[List[ResponseDoc]]:
+    """Create the decks concurrently, then deal hands from each."""
+    created = await asyncio.gather(
+        *(client.create_new_deck(1) for _ in range(decks))
+    )
+    return await asyncio.gather(
+        *(client.get_hands(doc["id"], cards, limit) for doc in created)
+    )
+
+
+async def bulk_load(openapi_spec: ResponseDoc, players: int, decks: int) -> None:
+    input_forms = (
+        Player(
+            player_name=f"Player {n}",
+            email_address=f"player{n}@example.com",
+            other_field=n,
+            handle=f"https://twitter.com/player_{n}",
+        )
+        for n in range(players)
+    )
+    async with AsyncDealerClient(openapi_spec) as client:
+        await create_players(client, input_forms)
+        await deal_hands(client, decks)
+    pprint(summary(client.timings))
+
+
+def main() -> None:
+    from Chapter_12.ch12_r05_client import get_openapi_spec
+
+    spec = get_openapi_spec()
+    asyncio.run(bulk_load(spec, players=100, decks=100))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 12, Load generator for the WSGI and ASGI deal applications.
+
+The WSGI application runs under a threaded ``wsgiref`` server; the ASGI
+application runs under :class:`Chapter_12.ch12_asgi.ASGIServer`.
+Both listen on localhost. A pool of asyncio clients sends the requests,
+each on a new connection, and the latency of each one is recorded.
+
+>>> r = report("demo", [(200, 0.001 * n) for n in range(1, 101)], 2.0)
+>>> r.requests, r.errors, r.requests_per_second
+(100, 0, 50.0)
+>>> round(r.p50, 4), round(r.p99, 4)
+(0.0505, 0.099)
+"""
+import argparse
+import asyncio
+import math
+import socketserver
+import statistics
+import sys
+import threading
+import time
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import Chapter_12.ch12_asgi
+import Chapter_12.ch12_wsgi
+
+Result = Tuple[int, float]
+
+
+class LoadReport(NamedTuple):
+    name: str
+    requests: int
+    errors: int
+    seconds: float
+    requests_per_second: float
+    p50: float
+    p99: float
+
+
+def report(name: str, results: List[Result], seconds: float) -> LoadReport:
+    """
+    With fewer than two results, the percentiles are the one latency, or NaN.
+
+    >>> report("one", [(0, 0.5)], 1.0)
+    LoadReport(name='one', requests=1, errors=1, seconds=1.0, requests_per_second=1.0, p50=0.5, p99=0.5)
+    >>> report("none", [], 1.0).p99
+    nan
+    """
+    latencies = [elapsed for status, elapsed in results]
+    if len(latencies) >= 2:
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        p50, p99 = percentiles[49], percentiles[98]
+    else:
+        p50 = p99 = latencies[0] if latencies else math.nan
+    return LoadReport(
+        name=name,
+        requests=len(results),
+        errors=sum(1 for status, elapsed in results if status != 200),
+        seconds=seconds,
+        requests_per_second=len(results) / seconds,
+        p50=p50,
+        p99=p99,
+    )
+
+
+async def fetch(host: str, port: int, path: str, accept: str) -> int:
+    """
+    GET the path on a new connection; return the status code.
+    A connection error, or a response without a status line, is status 0.
+    """
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return 0
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            f"Accept: {accept}\r\n"
+            f"Connection: close\r\n"
+            f"\r\n".encode("latin-1")
+        )
+        await writer.drain()
+        response = await reader.read()
+    except OSError:
+        return 0
+    finally:
+        writer.close()
+    status_line, _, _ = response.partition(b"\r\n")
+    try:
+        return int(status_line.split()[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+async def generate_load(
+    host: str,
+    port: int,
+    path: str = "/",
+    requests: int = 1000,
+    concurrency: int = 10,
+    accept: str = "application/json",
+) -> List[Result]:
+    """Send the requests from ``concurrency`` concurrent clients."""
+    pending: Iterator[int] = iter(range(requests))
+    results: List[Result] = []
+
+    async def client() -> None:
+        for _ in pending:
+            start = time.perf_counter()
+            status = await fetch(host, port, path, accept)
+            results.append((status, time.perf_counter() - start))
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return results
+
+
+def measure(name: str, port: int, requests: int, concurrency: int) -> LoadReport:
+    start = time.perf_counter()
+    results = asyncio.run(
+        generate_load("127.0.0.1", port, requests=requests, concurrency=concurrency)
+    )
+    return report(name, results, time.perf_counter() - start)
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    # The default of 5 drops connections under load, distorting p99.
+    request_queue_size = 128
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def run_wsgi(
+    app: Chapter_12.ch12_wsgi.WSGIApplication, requests: int, concurrency: int
+) -> LoadReport:
+    httpd = make_server(
+        "127.0.0.1", 0, app,  # type: ignore [arg-type]
+        server_class=ThreadingWSGIServer,
+        handler_class=QuietHandler,
+    )
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        return measure("wsgi", httpd.server_port, requests, concurrency)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def run_asgi(
+    app: Chapter_12.ch12_asgi.ASGIApplication, requests: int, concurrency: int
+) -> LoadReport:
+    server = Chapter_12.ch12_asgi.ASGIServer(app)
+    server.start()
+    try:
+        return measure("asgi", server.port, requests, concurrency)
+    finally:
+        server.stop()
+
+
+def benchmark(
+    requests: int = 1000, concurrency: int = 10, hand_size: int = 5
+) -> List[LoadReport]:
+    wsgi_app = Chapter_12.ch12_wsgi.JSON_Filter(
+        Chapter_12.ch12_wsgi.DealCards(hand_size)
+    )
+    asgi_app = Chapter_12.ch12_asgi.JSON_Filter(
+        Chapter_12.ch12_asgi.DealCards(hand_size)
+    )
+    return [
+        run_wsgi(wsgi_app, requests, concurrency),
+        run_asgi(asgi_app, requests, concurrency),
+    ]
+
+
+def get_options(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--requests", type=int, default=1000)
+    parser.add_argument("-c", "--concurrency", type=int, default=10)
+    parser.add_argument("--hand-size", type=int, default=5)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(sys.argv[1:] if argv is None else argv)
+    reports = benchmark(options.requests, options.concurrency, options.hand_size)
+    print(
+        f"{'server':8s} {'requests':>8s} {'errors':>6s} "
+        f"{'req/s':>9s} {'p50 ms':>8s} {'p99 ms':>8s}"
+    )
+    for r in reports:
+        print(
+            f"{r.name:8s} {r.requests:8d} {r.errors:6d} {r.requests_per_second:9.1f} "
+            f"{r.p50*1000:8.2f} {r.p99*1000:8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
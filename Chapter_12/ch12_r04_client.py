@@ -10,7 +10,8 @@ import urllib.parse
 import urllib.error
 import json
 from openapi_spec_validator import validate_spec  # type: ignore
-from typing import Dict, List, Any, Union, Tuple
+from typing import Dict, List, Any, Optional, Union, Tuple
+from Chapter_12.ch12_session import Session, session_opener
 
 # General definition:
 # ResponseDoc = Union[Dict[str, Any], List[Any], int, float, str, None]
@@ -59,8 +60,10 @@ def find_path_op(openapi_spec: ResponseDoc, target: str) -> Tuple[str, str]:
     return PATH_CACHE[target]
 
 
-def create_new_deck(openapi_spec: ResponseDoc, size: int = 6) -> Dict[str, Any]:
-    """Post to create a deck."""
+def create_new_deck(
+    openapi_spec: ResponseDoc, size: int = 6, session: Optional[Session] = None
+) -> Dict[str, Any]:
+    """Post to create a deck. Uses the session's connection, if provided."""
     query = {"size": size}
     path, operation = find_path_op(openapi_spec, "make_deck")
     base_url = openapi_spec["servers"][0]["url"]
@@ -71,8 +74,9 @@ def create_new_deck(openapi_spec: ResponseDoc, size: int = 6) -> Dict[str, Any]:
         url=full_url, method="POST", headers={"Accept": "application/json",}
     )
 
+    urlopen = session_opener(session)
     try:
-        with urllib.request.urlopen(request) as response:
+        with urlopen(request) as response:
             # print(response.status)
             assert response.getcode() == 201, f"Error Creating Deck: {response.status}"
             print(response.headers)
@@ -123,7 +127,9 @@ def no_spec_create_new_deck(size: int = 6) -> Dict[str, Any]:
         raise
 
 
-def get_new_deck(openapi_spec: ResponseDoc, id: str) -> Dict[str, Any]:
+def get_new_deck(
+    openapi_spec: ResponseDoc, id: str, session: Optional[Session] = None
+) -> Dict[str, Any]:
     """GET to confirm the deck was created; a debugging request."""
 
     pattern_path, operation = find_path_op(openapi_spec, "get_deck")
@@ -135,7 +141,8 @@ def get_new_deck(openapi_spec: ResponseDoc, id: str) -> Dict[str, Any]:
         url=(full_url), method="GET", headers={"Accept": "application/json",}
     )
 
-    with urllib.request.urlopen(request) as response:
+    urlopen = session_opener(session)
+    with urlopen(request) as response:
         assert response.getcode() == 200, f"Error Fetching Deck: {response.status}"
         deck = json.loads(response.read().decode("utf-8"))
     return deck
@@ -165,9 +172,13 @@ def no_spec_get_new_deck(id: str) -> Dict[str, Any]:
 
 
 def get_hands(
-    openapi_spec: ResponseDoc, id: str, cards: int = 13, limit: int = 4
+    openapi_spec: ResponseDoc,
+    id: str,
+    cards: int = 13,
+    limit: int = 4,
+    session: Optional[Session] = None,
 ) -> Dict[str, Any]:
-    """GET to see some Hands."""
+    """GET to see some Hands. Uses the session's connection, if provided."""
 
     query = {"$top": limit, "cards": cards}
 
@@ -181,7 +192,8 @@ def get_hands(
         url=full_url, method="GET", headers={"Accept": "application/json",}
     )
 
-    with urllib.request.urlopen(request) as response:
+    urlopen = session_opener(session)
+    with urlopen(request) as response:
         assert response.getcode() == 200, f"Error Fetching Hand: {response.status}"
         hands = json.loads(response.read().decode("utf-8"))
     return hands
@@ -236,12 +248,13 @@ def main_no_spec():
 
 def main():
     spec = get_openapi_spec()
-    create_doc = create_new_deck(spec, 6)
-    print(create_doc)
-    id = create_doc["id"]
-    deck_info = get_new_deck(spec, id)
-    # print(deck_info)
-    hands = get_hands(spec, id, cards=6, limit=2)
+    with Session() as session:
+        create_doc = create_new_deck(spec, 6, session=session)
+        print(create_doc)
+        id = create_doc["id"]
+        deck_info = get_new_deck(spec, id, session=session)
+        # print(deck_info)
+        hands = get_hands(spec, id, cards=6, limit=2, session=session)
     pprint(hands)
 
 
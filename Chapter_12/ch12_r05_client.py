@@ -10,7 +10,8 @@ import urllib.request
 import urllib.parse
 import json
 from openapi_spec_validator import validate_spec  # type: ignore
-from typing import Dict, List, Any, Union, Tuple
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Union, Tuple
+from Chapter_12.ch12_session import Session, session_opener
 
 # General definition:
 # ResponseDoc = Union[Dict[str, Any], List[Any], int, float, str, None]
@@ -71,8 +72,9 @@ class Player:
 def create_new_player(
         openapi_spec: ResponseDoc,
         path_map: Path_Map,
-        input_form: Player) -> ResponseDoc:
-    """Post to create a player."""
+        input_form: Player,
+        session: Optional[Session] = None) -> ResponseDoc:
+    """Post to create a player. Uses the session's connection, if provided."""
 
     path, operation = path_map["make_player"]
     base_url = openapi_spec["servers"][0]["url"]
@@ -95,8 +97,9 @@ def create_new_player(
         data=json.dumps(document).encode("utf-8"),
     )
 
+    urlopen = session_opener(session)
     try:
-        with urllib.request.urlopen(request) as response:
+        with urlopen(request) as response:
             # print(response.getcode())
             assert (
                 response.getcode() == 201
@@ -113,28 +116,71 @@ def create_new_player(
         raise
 
 
-def get_all_players(openapi_spec: ResponseDoc, path_map: Path_Map) -> List[ResponseDoc]:
-    """GET to see the players."""
+def get_all_players(
+    openapi_spec: ResponseDoc,
+    path_map: Path_Map,
+    session: Optional[Session] = None,
+    page_size: Optional[int] = None,
+) -> ResponseDoc:
+    """
+    GET to see the players. Uses the session's connection, if provided.
+
+    With a ``page_size``, the players are fetched one page at a time.
+    Any ``next`` link in a response is followed to get the rest of the players.
+    """
+
+    path, operation = path_map["get_all_players"]
+    base_url = openapi_spec["servers"][0]["url"]
+    full_url = f"{base_url}{path}"
+    if page_size:
+        full_url = f"{full_url}?{urllib.parse.urlencode({'$top': page_size})}"
+
+    urlopen = session_opener(session)
+
+    def get_page(url: str) -> Any:
+        request = urllib.request.Request(
+            url=url, method="GET", headers={"Accept": "application/json",}
+        )
+        with urlopen(request) as response:
+            assert response.getcode() == 200
+            # print(response.headers)
+            return json.loads(response.read().decode("utf-8"))
+
+    document = get_page(full_url)
+    players = document["players"]
+    while "next" in document:
+        document = get_page(urllib.parse.urljoin(base_url, document["next"]))
+        players.update(document["players"])
+    return {"players": players}
+
+
+def iter_all_players(
+    openapi_spec: ResponseDoc, path_map: Path_Map
+) -> Iterator[Tuple[str, ResponseDoc]]:
+    """GET the players as newline-delimited JSON, yielding each as it arrives."""
 
     path, operation = path_map["get_all_players"]
     base_url = openapi_spec["servers"][0]["url"]
     full_url = f"{base_url}{path}"
 
     request = urllib.request.Request(
-        url=full_url, method="GET", headers={"Accept": "application/json",}
+        url=full_url, method="GET", headers={"Accept": "application/x-ndjson",}
     )
 
     with urllib.request.urlopen(request) as response:
         assert response.getcode() == 200
-        # print(response.headers)
-        players = json.loads(response.read().decode("utf-8"))
-    return players
+        for line in response:
+            document = json.loads(line.decode("utf-8"))
+            yield document["id"], document["player"]
 
 
 def get_one_player(
-    openapi_spec: ResponseDoc, path_map: Path_Map, player_id: str
+    openapi_spec: ResponseDoc,
+    path_map: Path_Map,
+    player_id: str,
+    session: Optional[Session] = None,
 ) -> ResponseDoc:
-    """GET to see a specific player."""
+    """GET to see a specific player. Uses the session's connection, if provided."""
 
     path_template, operation = path_map["get_one_player"]
     base_url = openapi_spec["servers"][0]["url"]
@@ -147,8 +193,9 @@ def get_one_player(
 
     from urllib.error import HTTPError
 
+    urlopen = session_opener(session)
     try:
-        with urllib.request.urlopen(request) as response:
+        with urlopen(request) as response:
             print(response.getcode())
             print(response.headers)
             player_response = json.loads(response.read().decode("utf-8"))
@@ -159,6 +206,49 @@ def get_one_player(
         raise
 
 
+BatchRequest = Tuple[str, int, int]
+
+
+def get_batch_hands(
+    openapi_spec: ResponseDoc,
+    path_map: Path_Map,
+    batch: Iterable[BatchRequest],
+    session: Optional[Session] = None,
+) -> List[ResponseDoc]:
+    """
+    POST a batch of ``(deck_id, cards, top)`` requests, and get one
+    result for each. A result's ``status`` is ``"problem"`` if its deck
+    couldn't deal all of the requested hands.
+    """
+
+    path, operation = path_map["deal_batch"]
+    base_url = openapi_spec["servers"][0]["url"]
+    full_url = f"{base_url}{path}"
+
+    document = {
+        "requests": [
+            {"deck": deck_id, "cards": cards, "top": top}
+            for deck_id, cards, top in batch
+        ]
+    }
+
+    request = urllib.request.Request(
+        url=full_url,
+        method="POST",
+        headers={
+            "Accept": "application/json",
+            "Content-Type": "application/json;charset=utf-8",
+        },
+        data=json.dumps(document).encode("utf-8"),
+    )
+
+    urlopen = session_opener(session)
+    with urlopen(request) as response:
+        assert response.getcode() == 200, f"Error Dealing Batch: {response.getcode()}"
+        results = json.loads(response.read().decode("utf-8"))["results"]
+    return results
+
+
 def main():
     spec = get_openapi_spec()
     paths = make_path_map(spec)
@@ -168,10 +258,11 @@ def main():
         other_field=7,
         handle="https://twitter.com/PacktPub",
     )
-    create_doc = create_new_player(spec, paths, input_form)
-    id = create_doc["id"]
-    get_one_player(spec, paths, id)
-    players = get_all_players(spec, paths)
+    with Session() as session:
+        create_doc = create_new_player(spec, paths, input_form, session=session)
+        id = create_doc["id"]
+        get_one_player(spec, paths, id, session=session)
+        players = get_all_players(spec, paths, session=session)
     print(players)
 
 
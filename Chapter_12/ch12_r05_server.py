@@ -7,7 +7,10 @@ import random
 import logging
 import os
 import sys
-from typing import Dict, Any, Optional
+import threading
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, Any, Iterator, List, Optional, Tuple, cast
 from http import HTTPStatus
 from flask import Flask, jsonify, request, abort, url_for, Response
 import yaml
@@ -101,7 +104,10 @@ paths:
           default: 1
       - name: $skip
         in: query
-        description: number of hands to skip before starting to deal
+        description: >
+          number of hands to skip before starting to deal.
+          The hands are counted from the top of the deck; this view
+          doesn't use or change the position of `deal_batch`.
         schema:
           type: integer
           default: 0
@@ -125,7 +131,41 @@ paths:
         "404":
           description: ID not found.
           content: {}
-          
+
+  /hands:
+    post:
+      operationId: deal_batch
+      description: >
+        Deal hands from many decks in one request.
+        Each request deals `top` hands of `cards` cards from a deck.
+        Requests for the same deck get successive hands.
+        Dealing is atomic for each deck: if a deck is unknown or doesn't
+        have enough cards for all of its requests, none of them are dealt,
+        and each gets a result with a `problem` status.
+        The deck remembers where the last batch stopped, and the next batch
+        continues from there. This position is independent of `get_hands`,
+        which always counts its `$skip` hands from the top of the deck.
+      requestBody:
+        content:
+          application/json:
+            schema:
+              $ref: '#/components/schemas/BatchRequest'
+      responses:
+        "200":
+          description: One result for each request, in the same order.
+          content:
+            application/json:
+              schema:
+                type: object
+                properties:
+                  results:
+                    type: array
+                    items:
+                      $ref: '#/components/schemas/BatchResult'
+        "400":
+          description: Request invalid
+          content: {}
+
   /players:
     post:
       operationId: make_player
@@ -153,18 +193,49 @@ paths:
           
     get:
       operationId: get_all_players
+      parameters:
+      - name: $top
+        in: query
+        description: number of players in a page; all players if omitted
+        schema:
+          type: integer
+          minimum: 1
+      - name: $skip
+        in: query
+        description: number of players to skip before starting the page
+        schema:
+          type: integer
+          minimum: 0
+          default: 0
       responses:
         "200":
-          description: One hand of cards for each `hand` ID in the query string
+          description: >
+            The players, keyed by player ID. A page which is followed by
+            more players has a `next` link for the following page.
+            An `Accept: application/x-ndjson` request gets one line per player.
           content:
             application/json:
               schema:
                 type: object
                 properties:
                   players:
-                    type: array
-                    items: 
+                    type: object
+                    additionalProperties:
                       $ref: "#/components/schemas/Player"
+                  next:
+                    type: string
+                    format: uri-reference
+            application/x-ndjson:
+              schema:
+                type: object
+                properties:
+                  id:
+                    type: string
+                  player:
+                    $ref: "#/components/schemas/Player"
+        "400":
+          description: Invalid $top or $skip
+          content: {}
 
   /players/{id}:
     get:
@@ -226,6 +297,54 @@ components:
           format: uri
         lucky_number:
           type: integer
+    BatchRequest:
+      type: object
+      properties:
+        requests:
+          type: array
+          maxItems: 1000
+          items:
+            type: object
+            properties:
+              deck:
+                description: deck_id from make_deck
+                type: string
+              cards:
+                description: number of cards in each hand
+                type: integer
+                minimum: 1
+                default: 13
+              top:
+                description: number of hands to deal
+                type: integer
+                minimum: 1
+                default: 1
+            required:
+            - deck
+      required:
+      - requests
+    BatchResult:
+      type: object
+      properties:
+        deck:
+          type: string
+        status:
+          type: string
+          enum: ["ok", "problem"]
+        error:
+          description: Present when the status is problem
+          type: string
+        hands:
+          type: array
+          items:
+            type: object
+            properties:
+              hand:
+                type: integer
+              cards:
+                type: array
+                items:
+                  $ref: "#/components/schemas/Card"
   parameters:
     deck_id:
       name: id
@@ -331,10 +450,38 @@ def make_player() -> Response:
     return response
 
 
+def page_query() -> Tuple[int, Optional[int]]:
+    """The $skip and $top values. Without $top, the page is all the rest."""
+    try:
+        skip = int(request.args.get("$skip", 0))
+        top = request.args.get("$top")
+        top_n = None if top is None else int(top)
+        if skip < 0 or (top_n is not None and top_n < 1):
+            raise ValueError(f"$skip={skip}, $top={top_n}")
+    except ValueError:
+        abort(HTTPStatus.BAD_REQUEST, description="Invalid $skip or $top")
+    return skip, top_n
+
+
 @dealer.route("/dealer/players", methods=["GET"])
 def get_all_players() -> Response:
     players = get_players()
-    response = make_response(jsonify(players=players))
+    skip, top = page_query()
+    stop = None if top is None else skip + top
+    # Only the IDs are copied; new players don't disturb a streamed response.
+    page = list(islice(players, skip, stop))
+
+    if "application/x-ndjson" in request.headers.get("Accept", ""):
+        def player_lines() -> Iterator[str]:
+            for id in page:
+                yield json.dumps({"id": id, "player": players[id]}) + "\n"
+        return Response(player_lines(), mimetype="application/x-ndjson")
+
+    document: Dict[str, Any] = {"players": {id: players[id] for id in page}}
+    if stop is not None and stop < len(players):
+        document["next"] = url_for(
+            "get_all_players", **cast(Dict[str, Any], {"$top": top, "$skip": stop}))
+    response = make_response(jsonify(document))
     response.headers["Content-Type"] = "application/json;charset=utf-8"
     return response
 
@@ -413,6 +560,68 @@ def get_hands(id: str) -> Response:
     return response
 
 
+# Serializes dealing, so each batch sees a consistent offset in every deck.
+# get_hands() doesn't use the offset: it slices deck.cards by $skip, so
+# its hands can repeat cards already dealt by a batch.
+deal_lock = threading.Lock()
+
+
+@dealer.route("/dealer/hands", methods=["POST"])
+def deal_batch() -> Response:
+    try:
+        document = request.get_json()
+    except Exception:
+        abort(HTTPStatus.BAD_REQUEST)
+    batch_schema = specification["components"]["schemas"]["BatchRequest"]
+    try:
+        validate(document, batch_schema)
+    except ValidationError as ex:
+        abort(HTTPStatus.BAD_REQUEST, description=ex.message)
+
+    batch = [
+        (r["deck"], r.get("cards", 13), r.get("top", 1))
+        for r in document["requests"]
+    ]
+    needed: Dict[str, int] = defaultdict(int)
+    for id, cards, top in batch:
+        needed[id] += cards * top
+
+    decks = get_decks()
+    hands: List[Optional[List[List[Card]]]] = []
+    with deal_lock:
+        problems = {}
+        for id, count in needed.items():
+            if id not in decks:
+                problems[id] = f"deck {id!r} not found"
+            elif decks[id].offset + count > len(decks[id]):
+                remaining = len(decks[id]) - decks[id].offset
+                problems[id] = f"deck {id!r} has {remaining} cards, {count} needed"
+        for id, cards, top in batch:
+            if id in problems:
+                hands.append(None)
+            else:
+                hands.append([decks[id].deal(cards) for _ in range(top)])
+
+    results: List[JSON_Doc] = []
+    for (id, cards, top), dealt in zip(batch, hands):
+        if dealt is None:
+            results.append({"deck": id, "status": "problem", "error": problems[id]})
+        else:
+            results.append(
+                {
+                    "deck": id,
+                    "status": "ok",
+                    "hands": [
+                        {"hand": i, "cards": [card.serialize() for card in hand]}
+                        for i, hand in enumerate(dealt)
+                    ],
+                }
+            )
+    response = jsonify(results=results)
+    response.headers["Content-Type"] = "application/json;charset=utf-8"
+    return response
+
+
 if __name__ == "__main__":
     logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
     dealer.run(use_reloader=True, threaded=False)
@@ -10,12 +10,13 @@ This requires ``demo.cert`` and ``demo.key`` in the local working directory.
 import base64
 import json
 from pprint import pprint
-from typing import Dict, List, Any, Union, Tuple
+from typing import Dict, Iterator, List, Any, Optional, Union, Tuple
 import urllib.request
 import urllib.parse
 import ssl
 
 from openapi_spec_validator import validate_spec  # type: ignore
+from Chapter_12.ch12_session import Session
 
 # General definition:
 # ResponseDoc = Union[Dict[str, Any], List[Any], int, float, str, None]
@@ -23,9 +24,11 @@ from openapi_spec_validator import validate_spec  # type: ignore
 
 ResponseDoc = Dict[str, Any]
 
+# A Session can replace the OpenerDirector to keep the TLS connection open.
+Opener = Union[urllib.request.OpenerDirector, Session]
 
 
-def get_openapi_spec(opener: urllib.request.OpenerDirector) -> ResponseDoc:
+def get_openapi_spec(opener: Opener) -> ResponseDoc:
     """Get the OpenAPI specification."""
 
     openapi_request = urllib.request.Request(
@@ -66,7 +69,7 @@ def make_path_map(openapi_spec: ResponseDoc) -> Path_Map:
 
 
 def create_new_player(
-        opener: urllib.request.OpenerDirector,
+        opener: Opener,
         openapi_spec: ResponseDoc,
         path_map: Path_Map,
         document: Dict[str, Any]
@@ -92,7 +95,7 @@ def create_new_player(
             # print(response.getcode())
             assert (
                 response.getcode() == 201
-            ), f"Error {response.getcode()}: {response.text}"
+            ), f"Error {response.getcode()}: {response.reason}"
             print(response.headers)
             document = json.loads(response.read().decode("utf-8"))
 
@@ -107,12 +110,58 @@ def create_new_player(
 
 
 def get_all_players(
-        opener: urllib.request.OpenerDirector,
+        opener: Opener,
+        openapi_spec: ResponseDoc,
+        path_map: Path_Map,
+        credentials: Tuple[str, str],
+        page_size: Optional[int] = None,
+) -> ResponseDoc:
+    """
+    GET to see the players.
+
+    With a ``page_size``, the players are fetched one page at a time.
+    Any ``next`` link in a response is followed to get the rest of the players.
+    """
+
+    path, operation = path_map["get_all_players"]
+    base_url = openapi_spec["servers"][0]["url"]
+    full_url = f"{base_url}{path}"
+    if page_size:
+        full_url = f"{full_url}?{urllib.parse.urlencode({'$top': page_size})}"
+
+    b64credentials = base64.b64encode(
+        f"{credentials[0]}:{credentials[1]}".encode("utf-8")
+    )
+
+    def get_page(url: str) -> Any:
+        request = urllib.request.Request(
+            url=url,
+            method="GET",
+            headers={
+                "Accept": "application/json",
+                "Authorization": f"BASIC {b64credentials.decode('ascii')}",
+            },
+        )
+        with opener.open(request) as response:
+            assert response.getcode() == 200
+            # print(response.headers)
+            return json.loads(response.read().decode("utf-8"))
+
+    document = get_page(full_url)
+    players = document["players"]
+    while "next" in document:
+        document = get_page(urllib.parse.urljoin(base_url, document["next"]))
+        players.update(document["players"])
+    return {"players": players}
+
+
+def iter_all_players(
+        opener: Opener,
         openapi_spec: ResponseDoc,
         path_map: Path_Map,
         credentials: Tuple[str, str]
-) -> List[ResponseDoc]:
-    """GET to see the players."""
+) -> Iterator[Tuple[str, ResponseDoc]]:
+    """GET the players as newline-delimited JSON, yielding each as it arrives."""
 
     path, operation = path_map["get_all_players"]
     base_url = openapi_spec["servers"][0]["url"]
@@ -125,20 +174,20 @@ def get_all_players(
         url=full_url,
         method="GET",
         headers={
-            "Accept": "application/json",
+            "Accept": "application/x-ndjson",
             "Authorization": f"BASIC {b64credentials.decode('ascii')}",
         },
     )
 
     with opener.open(request) as response:
         assert response.getcode() == 200
-        # print(response.headers)
-        players = json.loads(response.read().decode("utf-8"))
-    return players
+        for line in response:
+            document = json.loads(line.decode("utf-8"))
+            yield document["id"], document["player"]
 
 
 def get_one_player(
-        opener: urllib.request.OpenerDirector,
+        opener: Opener,
         openapi_spec: ResponseDoc,
         path_map: Path_Map,
         credentials: Tuple[str, str],
@@ -182,27 +231,24 @@ def main():
     context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
     context.check_hostname = False
     context.verify_mode = ssl.CERT_NONE
-    opener = urllib.request.build_opener(
-        urllib.request.HTTPSHandler(context=context)
-    )
-
-    spec = get_openapi_spec(opener)
-    paths = make_path_map(spec)
-
-    player = {
-        "name": "Noriko",
-        "email": "nori@example.com",
-        "lucky_number": 7,
-        "twitter": "https://twitter.com/PacktPub",
-        "password": "OpenSesame",
-    }
-
-    create_doc = create_new_player(opener, spec, paths, player)
-    id = create_doc["id"]
-    credentials = (id, "OpenSesame")
-    get_one_player(opener, spec, paths, credentials, id)
-    players = get_all_players(opener, spec, paths, credentials)
-    print(players)
+    with Session(context=context) as opener:
+        spec = get_openapi_spec(opener)
+        paths = make_path_map(spec)
+
+        player = {
+            "name": "Noriko",
+            "email": "nori@example.com",
+            "lucky_number": 7,
+            "twitter": "https://twitter.com/PacktPub",
+            "password": "OpenSesame",
+        }
+
+        create_doc = create_new_player(opener, spec, paths, player)
+        id = create_doc["id"]
+        credentials = (id, "OpenSesame")
+        get_one_player(opener, spec, paths, credentials, id)
+        players = get_all_players(opener, spec, paths, credentials)
+        print(players)
 
 
 if __name__ == "__main__":
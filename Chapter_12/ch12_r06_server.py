@@ -11,7 +11,8 @@ import logging
 import random
 import os
 import sys
-from typing import Dict, Optional, Any, Callable, Union, cast
+from itertools import islice
+from typing import Dict, Optional, Any, Callable, Iterator, Tuple, Union, cast
 
 from http import HTTPStatus
 from flask import Flask, jsonify, request, abort, url_for, Response
@@ -115,9 +116,29 @@ paths:
       operationId: get_all_players
       security: 
       - http: []
+      parameters:
+      - name: $top
+        in: query
+        description: number of players in a page; all players if omitted
+        schema:
+          type: integer
+          minimum: 1
+      - name: $skip
+        in: query
+        description: number of players to skip before starting the page
+        schema:
+          type: integer
+          minimum: 0
+          default: 0
       responses:
         "200":
-          description: All of the players defined so far
+          description: >
+            All of the players defined so far, keyed by player ID.
+            A page which is followed by more players has a `next` link.
+            An `Accept: application/x-ndjson` request gets one line per player.
+          content: {}
+        "400":
+          description: Invalid $top or $skip
           content: {}
     post:
       operationId: make_player
@@ -375,17 +396,47 @@ def make_player() -> Response:
     return response
 
 
+def page_query() -> Tuple[int, Optional[int]]:
+    """The $skip and $top values. Without $top, the page is all the rest."""
+    try:
+        skip = int(request.args.get("$skip", 0))
+        top = request.args.get("$top")
+        top_n = None if top is None else int(top)
+        if skip < 0 or (top_n is not None and top_n < 1):
+            raise ValueError(f"$skip={skip}, $top={top_n}")
+    except ValueError:
+        abort(
+            HTTPStatus.BAD_REQUEST,
+            description="Invalid $skip or $top"
+        )
+    return skip, top_n
+
+
 @dealer.route("/dealer/players", methods=["GET"])
 @authorization_required
 def get_players() -> Response:
     user_database = get_users()
-    response = make_response(
-        jsonify(
-            players={
-                k: redacted_asdict(v)
-                for k, v in user_database.items()}
-        )
-    )
+    skip, top = page_query()
+    stop = None if top is None else skip + top
+    # Only the IDs are copied; each User is redacted as it's needed.
+    page = list(islice(user_database, skip, stop))
+
+    if "application/x-ndjson" in request.headers.get("Accept", ""):
+        def player_lines() -> Iterator[str]:
+            for k in page:
+                player = redacted_asdict(user_database[k])
+                yield json.dumps({"id": k, "player": player}) + "\n"
+        return Response(player_lines(), mimetype="application/x-ndjson")
+
+    document: Dict[str, Any] = {
+        "players": {
+            k: redacted_asdict(user_database[k])
+            for k in page}
+    }
+    if stop is not None and stop < len(user_database):
+        document["next"] = url_for(
+            "get_players", **cast(Dict[str, Any], {"$top": top, "$skip": stop}))
+    response = make_response(jsonify(document))
     response.headers["Content-Type"] = "application/json;charset=utf-8"
     return response
 
@@ -0,0 +1,218 @@
+"""Python Cookbook 2nd ed.
+
+Chapter 12, Keep-alive HTTP connections for the urllib-based clients.
+
+The ``urllib.request.urlopen()`` function opens a new TCP (and TLS) connection
+for every request. A :class:`Session` keeps one persistent
+``http.client`` connection per scheme, host, and port, and reuses it
+for each request.
+
+The :meth:`Session.open` method accepts a ``urllib.request.Request``
+and returns an object that behaves like the ``urlopen()`` response.
+This means a session can be used anywhere an ``OpenerDirector`` is used.
+
+>>> session = Session()
+>>> session.key("http", "127.0.0.1:5000")
+('http', '127.0.0.1', 5000)
+>>> session.key("https", "example.com")
+('https', 'example.com', 443)
+"""
+import http.client
+import io
+import ssl
+import urllib.error
+import urllib.parse
+import urllib.request
+from types import TracebackType
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Type
+
+# The exceptions that indicate a reused connection was closed by the server.
+STALE_CONNECTION = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+# The methods which can be sent twice without a second effect on the server.
+IDEMPOTENT = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+
+ConnectionKey = Tuple[str, str, int]
+
+
+class SessionResponse:
+    """
+    The body of the response has already been read, leaving the
+    connection ready for the next request.
+
+    >>> response = SessionResponse(200, "OK", http.client.HTTPMessage(), b'{}')
+    >>> with response as r:
+    ...     print(r.getcode(), r.read())
+    200 b'{}'
+    """
+
+    def __init__(
+        self,
+        status: int,
+        reason: str,
+        headers: http.client.HTTPMessage,
+        body: bytes
+    ) -> None:
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def getcode(self) -> int:
+        return self.status
+
+    def read(self) -> bytes:
+        return self.body
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(io.BytesIO(self.body))
+
+    def __enter__(self) -> "SessionResponse":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        return None
+
+
+class Session:
+    """
+    A pool of persistent connections.
+
+    A reused connection may have been closed by the server while it was idle.
+    A request that fails this way is retried on a fresh connection,
+    up to ``retries`` times. A failure on a fresh connection is not retried.
+
+    A request with a method that isn't idempotent, like ``POST``, is only
+    retried if it couldn't be sent. If it was sent, the server may have
+    acted on it before the connection failed.
+    """
+
+    def __init__(
+        self,
+        context: Optional[ssl.SSLContext] = None,
+        timeout: float = 10.0,
+        retries: int = 1,
+    ) -> None:
+        self.context = context
+        self.timeout = timeout
+        self.retries = retries
+        self.connections: Dict[ConnectionKey, http.client.HTTPConnection] = {}
+        self.connects = 0
+        self.requests = 0
+
+    def key(self, scheme: str, netloc: str) -> ConnectionKey:
+        url = urllib.parse.urlsplit(f"{scheme}://{netloc}")
+        default_port = 443 if scheme == "https" else 80
+        return (scheme, url.hostname or "", url.port or default_port)
+
+    def connection(
+        self, key: ConnectionKey
+    ) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return a connection, and a flag showing if it was reused."""
+        if key in self.connections:
+            return self.connections[key], True
+        scheme, host, port = key
+        connection: http.client.HTTPConnection
+        if scheme == "https":
+            connection = http.client.HTTPSConnection(
+                host, port, timeout=self.timeout, context=self.context
+            )
+        else:
+            connection = http.client.HTTPConnection(
+                host, port, timeout=self.timeout
+            )
+        self.connections[key] = connection
+        self.connects += 1
+        return connection, False
+
+    def discard(self, key: ConnectionKey) -> None:
+        connection = self.connections.pop(key, None)
+        if connection is not None:
+            connection.close()
+
+    def open(self, request: urllib.request.Request) -> SessionResponse:
+        """
+        Send the request on a persistent connection.
+
+        Like ``urlopen()``, a status of 400 or more raises
+        ``urllib.error.HTTPError``.
+        """
+        url = urllib.parse.urlsplit(request.full_url)
+        key = self.key(url.scheme, url.netloc)
+        headers = dict(request.header_items())
+        method = request.get_method()
+        attempt = 0
+        while True:
+            connection, reused = self.connection(key)
+            sent = False
+            try:
+                connection.request(
+                    method,
+                    request.selector,
+                    body=request.data,  # type: ignore [arg-type]
+                    headers=headers,
+                )
+                sent = True
+                response = connection.getresponse()
+                body = response.read()
+            except STALE_CONNECTION:
+                self.discard(key)
+                if not reused or attempt >= self.retries:
+                    raise
+                if sent and method not in IDEMPOTENT:
+                    raise
+                attempt += 1
+                continue
+            except Exception:
+                self.discard(key)
+                raise
+            break
+        self.requests += 1
+        if response.will_close:
+            self.discard(key)
+
+        if response.status >= 400:
+            raise urllib.error.HTTPError(
+                request.full_url,
+                response.status,
+                response.reason,
+                response.headers,
+                io.BytesIO(body),
+            )
+        return SessionResponse(
+            response.status, response.reason, response.headers, body
+        )
+
+    def close(self) -> None:
+        for key in list(self.connections):
+            self.discard(key)
+
+    def __enter__(self) -> "Session":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+def session_opener(
+    session: Optional[Session],
+) -> Callable[[urllib.request.Request], Any]:
+    """The session's ``open()``, or ``urllib.request.urlopen`` without a session."""
+    if session:
+        return session.open
+    return urllib.request.urlopen
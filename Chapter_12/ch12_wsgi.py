@@ -2,6 +2,7 @@
 
 Chapter 12, WSGI implementation.
 """
+import threading
 from typing import  (
     Dict,
     Any,
@@ -34,17 +35,19 @@ WSGIApplication = Callable[[WSGIEnvironment, StartResponse], Iterable[bytes]]
 from http import HTTPStatus
 
 deck: Optional[Deck] = None
+deck_lock = threading.Lock()
 
 
 def deal_cards(
     environ: Dict[str, Any], start_response: StartResponse
 ) -> Iterable[bytes]:
     global deck
-    if deck is None:
-        random.seed(environ.get("DEAL_APP_SEED"))
-        deck = Deck()
     hand_size = int(environ.get("HAND_SIZE", 5))
-    cards = deck.deal(hand_size)
+    with deck_lock:
+        if deck is None:
+            random.seed(environ.get("DEAL_APP_SEED"))
+            deck = Deck()
+        cards = deck.deal(hand_size)
     status = f"{HTTPStatus.OK.value} {HTTPStatus.OK.phrase}"
     headers = [("Content-Type", "application/json;charset=utf-8")]
     start_response(status, headers)
@@ -58,15 +61,22 @@ class DealCards:
         random.seed(seed)
         self.deck = Deck()
         self.offset = 0
+        self.lock = threading.Lock()
+
+    def next_hand(self) -> List[Card]:
+        """The lock keeps offset and deck consistent for a threaded server."""
+        with self.lock:
+            if self.offset + self.hand_size >= len(self.deck):
+                self.deck = Deck()
+                self.offset = 0
+            cards = self.deck[self.offset : self.offset + self.hand_size]
+            self.offset += self.hand_size
+        return cards
 
     def __call__(
         self, environ: Dict[str, Any], start_response: StartResponse
     ) -> Iterable[bytes]:
-        if self.offset + self.hand_size >= len(self.deck):
-            self.deck = Deck()
-            self.offset = 0
-        cards = self.deck[self.offset : self.offset + self.hand_size]
-        self.offset += self.hand_size
+        cards = self.next_hand()
         status = f"{HTTPStatus.OK.value} {HTTPStatus.OK.phrase}"
         headers = [("Content-Type", "application/json;charset=utf-8")]
         start_response(status, headers)
@@ -0,0 +1,131 @@
+"""Python Cookbook 2nd ed.
+
+Tests for ch12_asgi
+"""
+import asyncio
+import http.client
+import json
+import socket
+from pytest import *  # type: ignore
+import Chapter_12.ch12_asgi
+
+
+def call(app, scope):
+    """Run an ASGI app for one request; return the messages it sent."""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+def http_scope(headers=(), query_string=b""):
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "query_string": query_string,
+        "headers": list(headers),
+    }
+
+
+expected_hand = [
+    {"__class__": "Card", "__init__": {"rank": 3, "suit": "♡"}},
+    {"__class__": "Card", "__init__": {"rank": 6, "suit": "♣"}},
+    {"__class__": "Card", "__init__": {"rank": 7, "suit": "♡"}},
+    {"__class__": "Card", "__init__": {"rank": 1, "suit": "♣"}},
+    {"__class__": "Card", "__init__": {"rank": 6, "suit": "♡"}},
+    {"__class__": "Card", "__init__": {"rank": 10, "suit": "♢"}},
+]
+
+
+def test_deal_cards(monkeypatch):
+    monkeypatch.setattr(Chapter_12.ch12_asgi, "deck", None)
+    monkeypatch.setenv("HAND_SIZE", "6")
+    monkeypatch.setenv("DEAL_APP_SEED", "42")
+    start, body = call(Chapter_12.ch12_asgi.deal_cards, http_scope())
+    assert start["status"] == 200
+    assert (b"content-type", b"application/json;charset=utf-8") in start["headers"]
+    assert len(json.loads(body["body"])) == 6
+
+
+def test_json_filter_good():
+    dealer = Chapter_12.ch12_asgi.DealCards(hand_size=6, seed=42)
+    json_wrapper = Chapter_12.ch12_asgi.JSON_Filter(dealer)
+    start, body = call(json_wrapper, http_scope(query_string=b"$format=json"))
+    assert start["status"] == 200
+    assert json.loads(body["body"]) == expected_hand
+
+
+def test_json_filter_reject():
+    dealer = Chapter_12.ch12_asgi.DealCards(hand_size=6, seed=42)
+    json_wrapper = Chapter_12.ch12_asgi.JSON_Filter(dealer)
+    start, body = call(json_wrapper, http_scope(headers=[(b"accept", b"*/*")]))
+    assert start["status"] == 400
+    assert (
+        body["body"]
+        == b"Request doesn't include ?$format=json or Accept:application/json header"
+    )
+
+
+def test_concurrent_deal_cards():
+    """Ten concurrent requests get ten different hands from one deck."""
+    dealer = Chapter_12.ch12_asgi.DealCards(hand_size=5, seed=42)
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        await asyncio.sleep(0)
+        messages.append(message)
+
+    async def run():
+        await asyncio.gather(*(dealer(http_scope(), receive, send) for _ in range(10)))
+
+    asyncio.run(run())
+    cards = [
+        json.dumps(card, sort_keys=True)
+        for m in messages if m["type"] == "http.response.body"
+        for card in json.loads(m["body"])
+    ]
+    assert len(cards) == 50
+    assert len(set(cards)) == 50
+    assert dealer.dealer.offset == 50
+
+
+def test_asgi_server():
+    dealer = Chapter_12.ch12_asgi.DealCards(hand_size=6, seed=42)
+    server = Chapter_12.ch12_asgi.ASGIServer(Chapter_12.ch12_asgi.JSON_Filter(dealer))
+    server.start()
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.port)
+        connection.request("GET", "/", headers={"Accept": "application/json"})
+        response = connection.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read()) == expected_hand
+        # The same connection is kept alive for a second request.
+        connection.request("GET", "/?$format=json")
+        response = connection.getresponse()
+        assert response.status == 200
+        assert len(json.loads(response.read())) == 6
+        connection.close()
+    finally:
+        server.stop()
+
+
+def test_asgi_server_bind_error():
+    dealer = Chapter_12.ch12_asgi.DealCards(hand_size=6, seed=42)
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        port = taken.getsockname()[1]
+        server = Chapter_12.ch12_asgi.ASGIServer(dealer, port=port)
+        with raises(OSError):
+            server.start(timeout=5.0)
+    server.stop()
@@ -0,0 +1,157 @@
+"""Python Cookbook 2nd ed.
+
+Tests for ch12_async_client, using a local Flask server.
+"""
+import asyncio
+import copy
+import threading
+import urllib.error
+from pytest import *  # type: ignore
+from werkzeug.serving import make_server
+import Chapter_12.ch12_r05_server
+from Chapter_12.ch12_async_client import (
+    AsyncDealerClient, create_players, deal_hands, summary
+)
+from Chapter_12.ch12_r05_client import Player
+
+
+@fixture  # type: ignore
+def r05_server(monkeypatch):
+    monkeypatch.setattr(Chapter_12.ch12_r05_server, "decks", None)
+    monkeypatch.setattr(Chapter_12.ch12_r05_server, "players", None)
+    server = make_server(
+        "127.0.0.1", 0, Chapter_12.ch12_r05_server.dealer, threaded=True
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    local_spec = copy.deepcopy(Chapter_12.ch12_r05_server.specification)
+    local_spec["servers"] = [
+        {"url": f"http://127.0.0.1:{server.server_port}/dealer"}
+    ]
+    yield local_spec
+    server.shutdown()
+    server.server_close()
+
+
+def test_bulk_players(r05_server):
+    forms = [
+        Player(
+            player_name=f"Async {n}",
+            email_address=f"async{n}@example.com",
+            other_field=n,
+            handle=f"https://twitter.com/async_{n}",
+        )
+        for n in range(50)
+    ]
+
+    async def run():
+        async with AsyncDealerClient(r05_server, limit=8) as client:
+            created = await create_players(client, forms)
+            one = await client.get_one_player(created[0]["id"])
+            everyone = await client.get_all_players(page_size=7)
+        return client, created, one, everyone
+
+    client, created, one, everyone = asyncio.run(run())
+    assert len(created) == 50
+    assert one["name"] == "Async 0"
+    assert {doc["id"] for doc in created} <= set(everyone["players"])
+    stats = summary(client.timings)
+    assert stats["make_player"]["count"] == 50
+    assert stats["get_one_player"]["count"] == 1
+    assert stats["get_all_players"]["count"] == 8
+
+
+def test_bulk_hands(r05_server):
+    async def run():
+        async with AsyncDealerClient(r05_server, limit=4) as client:
+            hands = await deal_hands(client, decks=20, cards=5, limit=2)
+        return client, hands
+
+    client, hands = asyncio.run(run())
+    assert len(hands) == 20
+    assert all([h["hand"] for h in deck] == [0, 1] for deck in hands)
+    assert all(t.status in (200, 201) for t in client.timings)
+    assert len(client.timings) == 40
+
+
+def test_not_found(r05_server):
+    async def run():
+        async with AsyncDealerClient(r05_server) as client:
+            await client.get_one_player("no-such-player")
+
+    with raises(urllib.error.HTTPError) as error:
+        asyncio.run(run())
+    assert error.value.code == 404
+
+
+def test_no_body_keep_alive():
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"HTTP/1.1 204 No Content\r\nServer: test\r\n\r\n")
+        client = AsyncDealerClient(Chapter_12.ch12_r05_server.specification)
+        # There's no EOF: reading to the end of the stream would wait forever.
+        return await asyncio.wait_for(client.read_response(reader), 1.0)
+
+    response = asyncio.run(run())
+    assert (response.status, response.body) == (204, b"")
+
+
+def test_timeout_closes_connection():
+    async def run():
+        closed = asyncio.Event()
+
+        async def silent(reader, writer):
+            await reader.read()
+            closed.set()
+            writer.close()
+
+        server = await asyncio.start_server(silent, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        spec = copy.deepcopy(Chapter_12.ch12_r05_server.specification)
+        spec["servers"] = [{"url": f"http://127.0.0.1:{port}/dealer"}]
+        async with server:
+            async with AsyncDealerClient(spec, timeout=0.1) as client:
+                with raises(asyncio.TimeoutError):
+                    await client.get_one_player("slow")
+                assert client.idle == []
+            await asyncio.wait_for(closed.wait(), 1.0)
+
+    asyncio.run(run())
+
+
+def test_post_not_retried():
+    async def run():
+        seen = []
+
+        async def drop_some(reader, writer):
+            # Reads the second and fourth requests, and closes without a reply.
+            while line := await reader.readline():
+                seen.append(line.decode().strip())
+                length = 0
+                while (header := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = header.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                if len(seen) in (2, 4):
+                    break
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+                await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(drop_some, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        spec = copy.deepcopy(Chapter_12.ch12_r05_server.specification)
+        spec["servers"] = [{"url": f"http://127.0.0.1:{port}/dealer"}]
+        async with server:
+            async with AsyncDealerClient(spec, timeout=5.0) as client:
+                await client.send("POST", "/dealer/players", b"{}")
+                with raises((ConnectionResetError, asyncio.IncompleteReadError)):
+                    await client.send("POST", "/dealer/players", b"{}")
+                await client.send("GET", "/dealer/players", b"")
+                response = await client.send("GET", "/dealer/players", b"")
+        return seen, response
+
+    seen, response = asyncio.run(run())
+    assert response.body == b"{}"
+    assert [line.split()[0] for line in seen] == ["POST", "POST", "GET", "GET", "GET"]
@@ -0,0 +1,36 @@
+"""Python Cookbook 2nd ed.
+
+Tests for ch12_benchmark
+"""
+import asyncio
+import socket
+import Chapter_12.ch12_benchmark
+
+
+def test_benchmark(capsys):
+    wsgi, asgi = Chapter_12.ch12_benchmark.benchmark(requests=50, concurrency=5)
+    assert (wsgi.name, asgi.name) == ("wsgi", "asgi")
+    for report in wsgi, asgi:
+        assert report.requests == 50
+        assert report.errors == 0
+        assert report.requests_per_second > 0
+        assert 0 < report.p50 <= report.p99
+
+
+def test_main(capsys):
+    Chapter_12.ch12_benchmark.main(["--requests", "20", "--concurrency", "2"])
+    out, err = capsys.readouterr()
+    lines = out.splitlines()
+    assert lines[0].split() == ["server", "requests", "errors", "req/s", "p50", "ms", "p99", "ms"]
+    assert [line.split()[0] for line in lines[1:]] == ["wsgi", "asgi"]
+
+
+def test_connection_errors_are_counted():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+    results = asyncio.run(
+        Chapter_12.ch12_benchmark.generate_load("127.0.0.1", port, requests=3, concurrency=2)
+    )
+    report = Chapter_12.ch12_benchmark.report("refused", results, 1.0)
+    assert (report.requests, report.errors) == (3, 3)
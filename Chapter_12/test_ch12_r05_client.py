@@ -123,3 +123,94 @@ def test_get_all_players(mock_urllib):
             }
         ]
     }
+
+
+def test_get_all_players_follows_next(monkeypatch):
+    pages = {
+        "http://127.0.0.1:5000/dealer/players?%24top=1": {
+            "players": {"id_1": {"name": "one"}},
+            "next": "/dealer/players?%24top=1&%24skip=1",
+        },
+        "http://127.0.0.1:5000/dealer/players?%24top=1&%24skip=1": {
+            "players": {"id_2": {"name": "two"}},
+        },
+    }
+
+    def response_maker(request, *args, **kwargs):
+        document = pages[request.full_url]
+        return Mock(
+            __enter__=Mock(return_value=Mock(
+                read=Mock(return_value=json.dumps(document).encode("utf-8")),
+                getcode=Mock(return_value=200),
+            )),
+            __exit__=Mock(return_value=None),
+        )
+
+    mock_urllib_request = Mock(
+        wraps=urllib.request, urlopen=Mock(side_effect=response_maker)
+    )
+    monkeypatch.setattr(
+        Chapter_12.ch12_r05_client.urllib, "request", mock_urllib_request
+    )
+    paths = Chapter_12.ch12_r05_client.make_path_map(specification)
+    response = Chapter_12.ch12_r05_client.get_all_players(
+        specification, paths, page_size=1
+    )
+    assert response == {
+        "players": {"id_1": {"name": "one"}, "id_2": {"name": "two"}}
+    }
+
+
+def test_iter_all_players(monkeypatch):
+    lines = [
+        b'{"id": "id_1", "player": {"name": "one"}}\n',
+        b'{"id": "id_2", "player": {"name": "two"}}\n',
+    ]
+    response = Mock(getcode=Mock(return_value=200), __iter__=Mock(return_value=iter(lines)))
+    mock_urllib_request = Mock(
+        wraps=urllib.request,
+        urlopen=Mock(return_value=Mock(
+            __enter__=Mock(return_value=response), __exit__=Mock(return_value=None)
+        )),
+    )
+    monkeypatch.setattr(
+        Chapter_12.ch12_r05_client.urllib, "request", mock_urllib_request
+    )
+    paths = Chapter_12.ch12_r05_client.make_path_map(specification)
+    players = list(Chapter_12.ch12_r05_client.iter_all_players(specification, paths))
+    assert players == [("id_1", {"name": "one"}), ("id_2", {"name": "two"})]
+
+
+def test_get_batch_hands(monkeypatch):
+    results = [
+        {"deck": "mock_id", "status": "ok", "hands": [{"hand": 0, "cards": []}]},
+        {"deck": "bad_id", "status": "problem", "error": "deck 'bad_id' not found"},
+    ]
+
+    def response_maker(request, *args, **kwargs):
+        assert request.selector.endswith("/hands") and request.method == "POST"
+        assert json.loads(request.data) == {
+            "requests": [
+                {"deck": "mock_id", "cards": 5, "top": 1},
+                {"deck": "bad_id", "cards": 5, "top": 1},
+            ]
+        }
+        return Mock(
+            __enter__=Mock(return_value=Mock(
+                read=Mock(return_value=json.dumps({"results": results}).encode("utf-8")),
+                getcode=Mock(return_value=200),
+            )),
+            __exit__=Mock(return_value=None),
+        )
+
+    mock_urllib_request = Mock(
+        wraps=urllib.request, urlopen=Mock(side_effect=response_maker)
+    )
+    monkeypatch.setattr(
+        Chapter_12.ch12_r05_client.urllib, "request", mock_urllib_request
+    )
+    paths = Chapter_12.ch12_r05_client.make_path_map(specification)
+    response = Chapter_12.ch12_r05_client.get_batch_hands(
+        specification, paths, [("mock_id", 5, 1), ("bad_id", 5, 1)]
+    )
+    assert response == results
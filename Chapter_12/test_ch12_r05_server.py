@@ -97,3 +97,129 @@ def test_player_sequence(dealer_client):
     assert response_document["players"] == {
         "79dcaabe80c651157e6c67dcef7812b0": expected_player
     }
+
+
+def test_players_paged(dealer_client, monkeypatch):
+    monkeypatch.setattr(Chapter_12.ch12_r05_server, "players", None)
+    for n in range(5):
+        response = dealer_client.post(
+            path="/dealer/players",
+            json={
+                "email": f"page{n}@example.com",
+                "name": f"Page {n}",
+                "twitter": f"https://twitter.com/page_{n}",
+                "lucky_number": n,
+            },
+            headers={"Accept": "application/json"},
+        )
+        assert response.status_code == 201
+
+    names = []
+    path = "/dealer/players?$top=2"
+    pages = 0
+    while path:
+        response = dealer_client.get(path, headers={"Accept": "application/json"})
+        assert response.status_code == 200
+        document = response.get_json()
+        assert len(document["players"]) <= 2
+        names.extend(p["name"] for p in document["players"].values())
+        path = document.get("next")
+        pages += 1
+    assert pages == 3
+    assert sorted(names) == [f"Page {n}" for n in range(5)]
+
+    response = dealer_client.get(
+        "/dealer/players", query_string={"$skip": 3},
+        headers={"Accept": "application/json"}
+    )
+    assert "next" not in response.get_json()
+    assert len(response.get_json()["players"]) == 2
+
+    for bad_query in {"$top": 0}, {"$skip": -1}, {"$skip": "x"}:
+        response = dealer_client.get(
+            "/dealer/players", query_string=bad_query,
+            headers={"Accept": "application/json"}
+        )
+        assert response.status_code == 400
+
+
+def test_players_ndjson(dealer_client, monkeypatch):
+    monkeypatch.setattr(Chapter_12.ch12_r05_server, "players", None)
+    for n in range(3):
+        dealer_client.post(
+            path="/dealer/players",
+            json={
+                "email": f"stream{n}@example.com",
+                "name": f"Stream {n}",
+                "twitter": f"https://twitter.com/stream_{n}",
+                "lucky_number": n,
+            },
+            headers={"Accept": "application/json"},
+        )
+    response = dealer_client.get(
+        "/dealer/players", headers={"Accept": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data().splitlines()]
+    assert [line["player"]["name"] for line in lines] == [
+        "Stream 0", "Stream 1", "Stream 2"
+    ]
+
+
+def test_deal_batch(dealer_client):
+    deck_ids = []
+    for _ in range(2):
+        response = dealer_client.post(
+            path="/dealer/decks", json={"decks": 1},
+            headers={"Accept": "application/json"}
+        )
+        deck_ids.append(response.get_json()["id"])
+    a, b = deck_ids
+
+    response = dealer_client.post(
+        path="/dealer/hands",
+        json={
+            "requests": [
+                {"deck": a, "cards": 5, "top": 2},
+                {"deck": b, "cards": 13, "top": 4},
+                {"deck": a, "cards": 5},
+                {"deck": "no-such-deck", "cards": 5},
+                {"deck": b, "cards": 1},
+            ]
+        },
+        headers={"Accept": "application/json"},
+    )
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [r["status"] for r in results] == ["ok", "problem", "ok", "problem", "problem"]
+    assert [len(h["cards"]) for h in results[0]["hands"]] == [5, 5]
+    assert results[3]["error"] == "deck 'no-such-deck' not found"
+    # Deck b needed 53 cards; none of its requests were dealt.
+    assert results[1]["error"] == results[4]["error"] == "deck %r has 52 cards, 53 needed" % b
+    # Successive requests for deck a get different cards.
+    dealt = [
+        json.dumps(card, sort_keys=True)
+        for r in (results[0], results[2]) for h in r["hands"] for card in h["cards"]
+    ]
+    assert len(set(dealt)) == 15
+    # get_hands counts from the top of the deck, not from the batch position.
+    response = dealer_client.get(
+        f"/dealer/decks/{a}/hands", query_string={"cards": 5},
+        headers={"Accept": "application/json"},
+    )
+    assert response.get_json()[0]["cards"] == results[0]["hands"][0]["cards"]
+
+    response = dealer_client.post(
+        path="/dealer/hands",
+        json={"requests": [{"deck": b, "cards": 13, "top": 4}]},
+        headers={"Accept": "application/json"},
+    )
+    assert [r["status"] for r in response.get_json()["results"]] == ["ok"]
+
+    response = dealer_client.post(
+        path="/dealer/hands",
+        json={"requests": [{"deck": a, "cards": 0}]},
+        headers={"Accept": "application/json"},
+    )
+    assert response.status_code == 400
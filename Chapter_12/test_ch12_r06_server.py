@@ -200,3 +200,47 @@ def test_bad_credentials(dealer_client):
     assert response2.status_code == 401
     response_document = response2.get_json()
     assert response_document == {'error': '401 Unauthorized: Invalid credentials'}
+
+
+def test_players_paged_and_streamed(dealer_client, monkeypatch):
+    monkeypatch.setattr(Chapter_12.ch12_r06_server, "user_database", None)
+    ids = []
+    for n in range(3):
+        response = dealer_client.post(
+            path="/dealer/players",
+            json={
+                "email": f"page{n}@example.com",
+                "name": f"Page {n}",
+                "twitter": f"https://twitter.com/page_{n}",
+                "lucky_number": n,
+                "password": "OpenSesame",
+            },
+            headers={"Accept": "application/json"},
+        )
+        assert response.status_code == 201
+        ids.append(response.get_json()["id"])
+    credentials = base64.b64encode(f"{ids[0]}:OpenSesame".encode("utf-8"))
+    authorization = f"BASIC {credentials.decode('ascii')}"
+
+    response = dealer_client.get(
+        "/dealer/players", query_string={"$top": 2},
+        headers={"Accept": "application/json", "Authorization": authorization},
+    )
+    assert response.status_code == 200
+    document = response.get_json()
+    assert set(document["players"]) == set(ids[:2])
+    response = dealer_client.get(
+        document["next"],
+        headers={"Accept": "application/json", "Authorization": authorization},
+    )
+    document = response.get_json()
+    assert list(document["players"]) == ids[2:]
+    assert "next" not in document
+
+    response = dealer_client.get(
+        "/dealer/players",
+        headers={"Accept": "application/x-ndjson", "Authorization": authorization},
+    )
+    lines = [json.loads(line) for line in response.get_data().splitlines()]
+    assert [line["id"] for line in lines] == ids
+    assert all("password" not in line["player"] for line in lines)
@@ -0,0 +1,202 @@
+"""Python Cookbook 2nd ed.
+
+Tests for ch12_session, using a local Flask server.
+"""
+import copy
+import http.client
+import socket
+import socketserver
+import threading
+import time
+import urllib.request
+from wsgiref.simple_server import (
+    ServerHandler, WSGIRequestHandler, WSGIServer, make_server
+)
+from pytest import *  # type: ignore
+import Chapter_12.ch12_r04_client
+import Chapter_12.ch12_r04_server
+import Chapter_12.ch12_r05_client
+import Chapter_12.ch12_r05_server
+from Chapter_12.ch12_session import Session as HTTPSession
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """
+    The Flask development server always sends ``Connection: close``.
+    This handler serves many requests on one HTTP/1.1 connection.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        self.close_connection = False
+        while not self.close_connection:
+            self.raw_requestline = self.rfile.readline(65537)
+            if not self.raw_requestline or not self.parse_request():
+                return
+            handler = ServerHandler(
+                self.rfile, self.wfile, self.get_stderr(), self.get_environ(),
+                multithread=True,
+            )
+            handler.request_handler = self
+            handler.http_version = "1.1"
+            handler.run(self.server.get_app())
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def local_server(app, specification):
+    """Start a threaded server on a free port; yield a spec with the local URL."""
+    server = make_server(
+        "127.0.0.1", 0, app,
+        server_class=ThreadingWSGIServer,
+        handler_class=KeepAliveRequestHandler,
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    local_spec = copy.deepcopy(specification)
+    local_spec["servers"] = [
+        {"url": f"http://127.0.0.1:{server.server_port}/dealer"}
+    ]
+    yield local_spec
+    server.shutdown()
+    server.server_close()
+
+
+@fixture  # type: ignore
+def r04_server(monkeypatch):
+    monkeypatch.setattr(Chapter_12.ch12_r04_server, "decks", None)
+    yield from local_server(
+        Chapter_12.ch12_r04_server.dealer,
+        Chapter_12.ch12_r04_server.specification,
+    )
+
+
+@fixture  # type: ignore
+def r05_server(monkeypatch):
+    monkeypatch.setattr(Chapter_12.ch12_r05_server, "decks", None)
+    monkeypatch.setattr(Chapter_12.ch12_r05_server, "players", None)
+    yield from local_server(
+        Chapter_12.ch12_r05_server.dealer,
+        Chapter_12.ch12_r05_server.specification,
+    )
+
+
+def test_session_get_hands(r04_server):
+    client = Chapter_12.ch12_r04_client
+    with HTTPSession() as session:
+        deck = client.create_new_deck(r04_server, 1, session=session)
+        hands = client.get_hands(r04_server, deck["id"], cards=5, limit=2, session=session)
+        assert [h["hand"] for h in hands] == [0, 1]
+        assert all(len(h["cards"]) == 5 for h in hands)
+        assert session.connects == 1
+        assert session.requests == 2
+
+
+def test_session_players(r05_server):
+    client = Chapter_12.ch12_r05_client
+    paths = client.make_path_map(r05_server)
+    player = client.Player(
+        player_name="Session",
+        email_address="session@example.com",
+        other_field=42,
+        handle="https://twitter.com/session_test",
+    )
+    with HTTPSession() as session:
+        document = client.create_new_player(r05_server, paths, player, session=session)
+        one = client.get_one_player(r05_server, paths, document["id"], session=session)
+        assert one["name"] == "Session"
+        everyone = client.get_all_players(r05_server, paths, session=session)
+        assert document["id"] in everyone["players"]
+        assert session.connects == 1
+
+
+def test_session_stale_retry(r04_server):
+    client = Chapter_12.ch12_r04_client
+    with HTTPSession() as session:
+        deck = client.create_new_deck(r04_server, 1, session=session)
+        # Simulate a keep-alive connection the server has dropped.
+        (connection,) = session.connections.values()
+        connection.sock.shutdown(socket.SHUT_RDWR)
+        hands = client.get_hands(r04_server, deck["id"], cards=5, limit=1, session=session)
+        assert len(hands) == 1
+        assert session.connects == 2
+
+
+def test_session_benchmark(r04_server):
+    """Compare a new connection per request with a persistent connection."""
+    client = Chapter_12.ch12_r04_client
+    requests = 100
+    deck = client.create_new_deck(r04_server, 1)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get_hands(r04_server, deck["id"], cards=1, limit=1)
+    urlopen_time = time.perf_counter() - start
+
+    with HTTPSession() as session:
+        start = time.perf_counter()
+        for _ in range(requests):
+            client.get_hands(r04_server, deck["id"], cards=1, limit=1, session=session)
+        session_time = time.perf_counter() - start
+        assert session.connects == 1
+    assert session_time < urlopen_time
+
+
+def drop_second_request():
+    """
+    A server which answers every request except the second: it reads
+    that one, and closes the connection. Yields the URL and the list of
+    request lines it has read.
+    """
+    listener = socket.create_server(("127.0.0.1", 0))
+    seen = []
+
+    def serve():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            with connection, connection.makefile("rb") as stream:
+                while line := stream.readline():
+                    seen.append(line.decode().strip())
+                    length = 0
+                    while (header := stream.readline()) not in (b"\r\n", b""):
+                        name, _, value = header.decode().partition(":")
+                        if name.lower() == "content-length":
+                            length = int(value)
+                    stream.read(length)
+                    if len(seen) == 2:
+                        break
+                    connection.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{listener.getsockname()[1]}/", seen
+    listener.close()
+
+
+def test_session_post_not_retried():
+    for url, seen in drop_second_request():
+        with HTTPSession() as session:
+            post = urllib.request.Request(url, data=b"{}", method="POST")
+            assert session.open(post).read() == b"{}"
+            with raises(http.client.RemoteDisconnected):
+                session.open(post)
+        assert seen == ["POST / HTTP/1.1", "POST / HTTP/1.1"]
+
+
+def test_session_get_retried():
+    for url, seen in drop_second_request():
+        with HTTPSession() as session:
+            get = urllib.request.Request(url)
+            assert session.open(get).read() == b"{}"
+            assert session.open(get).read() == b"{}"
+            assert session.connects == 2
+        assert seen == ["GET / HTTP/1.1"] * 3
@@ -95,3 +95,26 @@ def test_json_filter_good_2():
         {"__class__": "Card", "__init__": {"rank": 6, "suit": "♡"}},
         {"__class__": "Card", "__init__": {"rank": 10, "suit": "♢"}},
     ]
+
+
+import threading
+
+
+def test_DealCards_threads():
+    """Concurrent threads each get a different hand from one deck."""
+    dealer = Chapter_12.ch12_wsgi.DealCards(hand_size=5, seed=42)
+    hands = []
+
+    def deal():
+        for _ in range(2):
+            hands.append(dealer.next_hand())
+
+    threads = [threading.Thread(target=deal) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cards = [card for hand in hands for card in hand]
+    assert len(cards) == 50
+    assert len(set(cards)) == 50
+    assert dealer.offset == 50
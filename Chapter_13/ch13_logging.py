@@ -0,0 +1,304 @@
+"""Python Cookbook
+
+Chapter 13, Queued, batched logging handlers for the recipe 6 configuration
+
+With DEBUG enabled, ``ch13_r06.gather_stats()`` writes a log line for each
+game, and the ``logging.FileHandler`` writes and flushes each line before
+the next game can be processed.
+
+A :class:`BatchQueueHandler` formats the record and puts it on a queue.
+A listener thread takes the records from the queue in batches, and passes
+them to a target handler. A plain ``StreamHandler`` or ``FileHandler``
+target gets one write and one flush per batch; any other target handles
+each record itself. The target is
+described by a nested dictionary in the configuration; a
+``logging.handlers.RotatingFileHandler`` or ``TimedRotatingFileHandler``
+target rotates the file by size or time.
+
+In the YAML configuration, the handler is built by a ``()`` factory::
+
+    handlers:
+        file:
+            (): Chapter_13.ch13_logging.BatchQueueHandler
+            formatter: timestamp
+            batch_size: 1000
+            target:
+                class: logging.handlers.RotatingFileHandler
+                filename: data/write.log
+                maxBytes: 1048576
+                backupCount: 3
+"""
+import argparse
+import copy
+import importlib
+import logging
+import logging.config
+import logging.handlers
+import queue
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from textwrap import dedent
+from typing import IO, Any, Dict, List, Optional, Union, cast
+
+import yaml
+
+import Chapter_13.ch13_r05
+import Chapter_13.ch13_r06
+
+
+def resolve(name: str) -> Any:
+    """Import a dotted name, like ``logging.handlers.RotatingFileHandler``."""
+    module_name, _, attribute = name.rpartition(".")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def make_handler(config: Dict[str, Any]) -> logging.Handler:
+    """Build a handler from a ``{"class": ..., **kwargs}`` dictionary."""
+    kwargs = dict(config)
+    handler_class = resolve(kwargs.pop("class"))
+    for key, value in kwargs.items():
+        if isinstance(value, str) and value.startswith("ext://"):
+            kwargs[key] = resolve(value[len("ext://") :])
+    return handler_class(**kwargs)
+
+
+Marker = threading.Event
+Item = Union[List[logging.LogRecord], Marker, None]
+
+
+class BatchQueueHandler(logging.handlers.QueueHandler):
+    """
+    A queue in front of a ``target`` handler, written by a listener thread.
+
+    Records are collected in a list; a full batch of ``batch_size`` records
+    is one item on the queue. When the queue is idle for ``flush_interval``
+    seconds, the listener takes a partial batch, too. Each batch is written,
+    then the target is flushed once.
+    """
+
+    def __init__(
+        self,
+        target: Union[Dict[str, Any], logging.Handler],
+        batch_size: int = 1000,
+        flush_interval: float = 1.0,
+        queue_size: int = 0,
+    ) -> None:
+        self.batches: "queue.Queue[Item]" = queue.Queue(queue_size)
+        super().__init__(self.batches)
+        self.target = target if isinstance(target, logging.Handler) else make_handler(target)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer: List[logging.LogRecord] = []
+        self.written = 0
+        self.thread = threading.Thread(target=self.listen, daemon=True)
+        self.thread.start()
+
+    def setFormatter(self, fmt: Optional[logging.Formatter]) -> None:
+        """The configured formatter is used by the target."""
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        A copy, with the arguments merged into the message now, in case
+        they change, and the traceback as text. Other handlers still see
+        the original record. The copy stays in this process, so it isn't
+        formatted.
+        """
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            formatter = self.target.formatter or logging.Formatter()
+            exc_text = formatter.formatException(record.exc_info)
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        record.exc_text = exc_text
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Handler.handle() holds self.lock.
+        try:
+            self.buffer.append(self.prepare(record))
+            if len(self.buffer) >= self.batch_size:
+                self.batches.put(self.buffer)
+                self.buffer = []
+        except Exception:
+            self.handleError(record)
+
+    def take_buffer(self) -> List[logging.LogRecord]:
+        self.acquire()
+        try:
+            records, self.buffer = self.buffer, []
+        finally:
+            self.release()
+        return records
+
+    def listen(self) -> None:
+        timeout = self.flush_interval or None
+        while True:
+            try:
+                item = self.batches.get(timeout=timeout)
+            except queue.Empty:
+                item = self.take_buffer()
+            if item is None:
+                return
+            if isinstance(item, Marker):
+                item.set()
+            elif item:
+                self.write(item)
+
+    def write(self, records: List[logging.LogRecord]) -> None:
+        """
+        Write the batch. A plain ``StreamHandler`` or ``FileHandler`` target
+        gets one ``write()`` of all the lines, and one ``flush()``. Any other
+        target, like a rotating file, handles each record.
+        """
+        target = self.target
+        # Logger.callHandlers() checks the level before Handler.handle().
+        records = [record for record in records if record.levelno >= target.level]
+        if type(target) not in (logging.StreamHandler, logging.FileHandler):
+            for record in records:
+                target.handle(record)
+        elif records := [record for record in records if target.filter(record)]:
+            self.write_lines(cast(logging.StreamHandler, target), records)
+        self.written += 1
+
+    def write_lines(
+        self, target: logging.StreamHandler, records: List[logging.LogRecord]
+    ) -> None:
+        """StreamHandler.emit(), with one write and one flush for all the records."""
+        target.acquire()
+        try:
+            if target.stream is None:
+                # A FileHandler with delay=True opens its file in emit().
+                target.emit(records[0])
+                records = records[1:]
+            # emit() may have opened the stream.
+            stream = cast(IO[str], target.stream)
+            stream.write(
+                "".join(target.format(record) + target.terminator for record in records)
+            )
+            target.flush()
+        except Exception:
+            target.handleError(records[0] if records else logging.makeLogRecord({}))
+        finally:
+            target.release()
+
+    def flush(self) -> None:
+        """Wait until everything logged so far is written."""
+        if self.thread.is_alive():
+            self.batches.put(self.take_buffer())
+            marker = Marker()
+            self.batches.put(marker)
+            marker.wait()
+
+    def close(self) -> None:
+        if self.thread.is_alive():
+            self.batches.put(self.take_buffer())
+            self.batches.put(None)
+            self.thread.join()
+        self.target.close()
+        super().close()
+
+
+file_config_yaml = dedent(
+    """\
+    version: 1
+    disable_existing_loggers: false
+    formatters:
+        timestamp:
+            style: "{"
+            format: "{asctime}//{levelname}//{name}//{message}"
+    handlers:
+        file:
+            class: logging.FileHandler
+            filename: {log_path}
+            formatter: timestamp
+    loggers:
+        overview_stats.detail:
+            handlers:
+            -   file
+    root:
+        level: DEBUG
+    """
+)
+
+queue_config_yaml = dedent(
+    """\
+    version: 1
+    disable_existing_loggers: false
+    formatters:
+        timestamp:
+            style: "{"
+            format: "{asctime}//{levelname}//{name}//{message}"
+    handlers:
+        file:
+            (): Chapter_13.ch13_logging.BatchQueueHandler
+            formatter: timestamp
+            batch_size: 1000
+            target:
+                class: logging.handlers.RotatingFileHandler
+                filename: {log_path}
+                maxBytes: 67108864
+                backupCount: 2
+    loggers:
+        overview_stats.detail:
+            handlers:
+            -   file
+    root:
+        level: DEBUG
+    """
+)
+
+
+def configure(config_yaml: str, log_path: Path) -> None:
+    text = config_yaml.replace("{log_path}", str(log_path))
+    logging.config.dictConfig(yaml.load(text, Loader=yaml.SafeLoader))
+
+
+def unconfigure() -> None:
+    """Close and remove the handlers of the detail logger."""
+    logger = Chapter_13.ch13_r06.detail_log
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def benchmark(games: int, seed: int = 42) -> Dict[str, float]:
+    """Games per second for gather_stats() with each configuration."""
+    game_list = list(Chapter_13.ch13_r05.roll_iter(games, seed))
+    results = {}
+    with tempfile.TemporaryDirectory() as working:
+        for name, config_yaml in ("file", file_config_yaml), ("queue", queue_config_yaml):
+            log_path = Path(working) / f"{name}.log"
+            configure(config_yaml, log_path)
+            start = time.perf_counter()
+            Chapter_13.ch13_r06.gather_stats(game_list)
+            in_loop = time.perf_counter() - start
+            unconfigure()
+            total = time.perf_counter() - start
+            results[name] = games / in_loop
+            print(
+                f"{name:6s} {games / in_loop:10,.0f} games/s in gather_stats, "
+                f"{games / total:10,.0f} games/s including the final flush"
+            )
+    return results
+
+
+def get_options(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-g", "--games", type=int, default=100_000)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    options = get_options(sys.argv[1:] if argv is None else argv)
+    benchmark(options.games)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Python Cookbook
+
+Chapter 13, Queued, batched logging handlers
+"""
+import logging
+import logging.config
+import logging.handlers
+from pathlib import Path
+from pytest import *  # type: ignore
+import Chapter_13.ch13_logging
+from Chapter_13.ch13_logging import BatchQueueHandler
+
+
+@fixture  # type: ignore
+def test_logger():
+    logger = logging.getLogger("test_ch13_logging")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    yield logger
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def test_batches_in_order(tmpdir, test_logger):
+    log_path = Path(tmpdir) / "batch.log"
+    handler = BatchQueueHandler(
+        {"class": "logging.FileHandler", "filename": str(log_path)},
+        batch_size=10,
+        flush_interval=0,
+    )
+    handler.setFormatter(logging.Formatter("{levelname}:{message}", style="{"))
+    test_logger.addHandler(handler)
+    for n in range(25):
+        test_logger.debug("line %d", n)
+    handler.flush()
+    assert log_path.read_text().splitlines() == [f"DEBUG:line {n}" for n in range(25)]
+    assert handler.written == 3
+    handler.close()
+    assert not handler.thread.is_alive()
+
+
+def test_mutable_args(tmpdir, test_logger):
+    log_path = Path(tmpdir) / "args.log"
+    handler = BatchQueueHandler({"class": "logging.FileHandler", "filename": str(log_path)})
+    test_logger.addHandler(handler)
+    game = [[1, 2]]
+    test_logger.info("game %r", game)
+    game.append([3, 4])
+    handler.close()
+    assert log_path.read_text() == "game [[1, 2]]\n"
+
+
+def test_rotation(tmpdir, test_logger):
+    log_path = Path(tmpdir) / "rotate.log"
+    handler = BatchQueueHandler(
+        {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": str(log_path),
+            "maxBytes": 100,
+            "backupCount": 2,
+        },
+        batch_size=1000,
+    )
+    test_logger.addHandler(handler)
+    for n in range(30):
+        test_logger.info("message %03d", n)
+    handler.close()
+    files = [log_path.with_name("rotate.log.2"), log_path.with_name("rotate.log.1"), log_path]
+    lines = [line for path in files for line in path.read_text().splitlines()]
+    assert lines == [f"message {n:03d}" for n in range(8, 30)]
+    assert all(path.stat().st_size <= 100 for path in files)
+
+
+def test_level_filter(tmpdir, test_logger):
+    log_path = Path(tmpdir) / "level.log"
+    handler = BatchQueueHandler(
+        {"class": "logging.FileHandler", "filename": str(log_path), "delay": True}
+    )
+    handler.target.setLevel(logging.INFO)
+    test_logger.addHandler(handler)
+    test_logger.debug("hidden")
+    test_logger.info("shown")
+    handler.close()
+    assert log_path.read_text() == "shown\n"
+
+
+def test_exception(tmpdir, test_logger):
+    log_path = Path(tmpdir) / "exception.log"
+    handler = BatchQueueHandler({"class": "logging.FileHandler", "filename": str(log_path)})
+    handler.setFormatter(logging.Formatter("{levelname}:{message}", style="{"))
+    test_logger.addHandler(handler)
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        test_logger.exception("first line\nsecond line")
+    handler.close()
+    lines = log_path.read_text().splitlines()
+    assert lines[:3] == ["ERROR:first line", "second line", "Traceback (most recent call last):"]
+    assert lines[-1] == "ZeroDivisionError: division by zero"
+    assert log_path.read_text().count("second line") == 1
+
+
+def test_record_not_changed(tmpdir, test_logger):
+    seen = []
+
+    class Keep(logging.Handler):
+        def emit(self, record):
+            seen.append((record.msg, record.args, record.exc_info is not None))
+
+    handler = BatchQueueHandler({"class": "logging.FileHandler", "filename": str(Path(tmpdir) / "keep.log")})
+    test_logger.addHandler(handler)
+    test_logger.addHandler(Keep())
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        test_logger.exception("game %r", [1, 2])
+    handler.close()
+    assert seen == [("game %r", ([1, 2],), True)]
+
+
+def test_target_filter(tmpdir, test_logger):
+    for target_class in "logging.FileHandler", "logging.handlers.RotatingFileHandler":
+        log_path = Path(tmpdir) / f"{target_class}.log"
+        handler = BatchQueueHandler({"class": target_class, "filename": str(log_path)})
+        handler.target.addFilter(lambda record: "secret" not in record.getMessage())
+        test_logger.addHandler(handler)
+        test_logger.info("shown")
+        test_logger.info("a secret")
+        test_logger.removeHandler(handler)
+        handler.close()
+        assert log_path.read_text() == "shown\n"
+
+
+def test_dict_config(tmpdir):
+    log_path = Path(tmpdir) / "write.log"
+    Chapter_13.ch13_logging.configure(Chapter_13.ch13_logging.queue_config_yaml, log_path)
+    detail_log = logging.getLogger("overview_stats.detail")
+    try:
+        (handler,) = detail_log.handlers
+        assert isinstance(handler, BatchQueueHandler)
+        assert isinstance(handler.target, logging.handlers.RotatingFileHandler)
+        detail_log.debug("game %r -> event %r", [[3, 4]], ("win", 1))
+        handler.flush()
+        assert log_path.read_text().endswith(
+            "//DEBUG//overview_stats.detail//game [[3, 4]] -> event ('win', 1)\n"
+        )
+    finally:
+        Chapter_13.ch13_logging.unconfigure()
+        logging.config.dictConfig({"version": 1, "disable_existing_loggers": False})
+        logging.getLogger().setLevel(logging.WARNING)